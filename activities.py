@@ -0,0 +1,116 @@
+from sqlalchemy import select, union_all, literal, null, column, and_, or_, String, DateTime, Integer
+from models import db, Student, Course, Enrollment, Payment
+from pagination import PaginationError, encode_cursor, decode_cursor
+
+# Tipos de actividad disponibles en el feed
+ACTIVITY_TYPES = ('enrollment', 'payment')
+
+# Clave de orden del feed: fecha descendente y, con la misma fecha, tipo e id
+CURSOR_COLUMNS = (column('date', DateTime), column('type', String), column('id', Integer))
+
+
+def activity_cursor(activity):
+    """Cursor opaco que apunta justo después de ``activity``"""
+    return encode_cursor([activity['date'], activity['type'], activity['id']])
+
+
+def decode_activity_cursor(cursor):
+    """Posición (fecha, tipo, id) de un cursor de activity_cursor"""
+    values = decode_cursor(cursor, CURSOR_COLUMNS)
+    if None in values or values[1] not in ACTIVITY_TYPES:
+        raise PaginationError('Cursor inválido')
+    return tuple(values)
+
+
+def _before(activity_type, date_column, id_column, position):
+    """Filas de ``activity_type`` que van después de ``position`` en el feed.
+
+    ``position`` es (fecha, tipo, id), o (fecha, None, None) para todo lo
+    anterior a una fecha. Con la misma fecha, los tipos van en orden
+    alfabético y dentro de cada tipo por id descendente.
+    """
+    before_date, cursor_type, cursor_id = position
+    if cursor_type == activity_type:
+        return or_(date_column < before_date, and_(date_column == before_date, id_column < cursor_id))
+    if cursor_type is not None and activity_type > cursor_type:
+        return date_column <= before_date
+    return date_column < before_date
+
+
+def _enrollment_activities(before, limit):
+    query = select(
+        literal('enrollment').label('type'),
+        Enrollment.id.label('id'),
+        Enrollment.enrollment_date.label('date'),
+        Enrollment.student_id.label('student_id'),
+        Student.name.label('student_name'),
+        Course.name.label('course_name'),
+        null().label('amount')
+    ).outerjoin(Student, Student.id == Enrollment.student_id
+    ).outerjoin(Course, Course.id == Enrollment.course_id)
+    if before:
+        query = query.where(_before('enrollment', Enrollment.enrollment_date, Enrollment.id, before))
+    return query.order_by(Enrollment.enrollment_date.desc(), Enrollment.id.desc()).limit(limit)
+
+
+def _payment_activities(before, limit):
+    query = select(
+        literal('payment').label('type'),
+        Payment.id.label('id'),
+        Payment.date.label('date'),
+        Payment.student_id.label('student_id'),
+        Student.name.label('student_name'),
+        null().label('course_name'),
+        Payment.amount.label('amount')
+    ).outerjoin(Student, Student.id == Payment.student_id)
+    if before:
+        query = query.where(_before('payment', Payment.date, Payment.id, before))
+    return query.order_by(Payment.date.desc(), Payment.id.desc()).limit(limit)
+
+
+def _message(row):
+    student_name = row.student_name or 'Estudiante eliminado'
+    if row.type == 'enrollment':
+        return f'{student_name} se matriculó en {row.course_name or "un curso eliminado"}'
+    return f'{student_name} realizó un pago de ${row.amount}'
+
+
+def _as_dict(row):
+    return {
+        'type': row.type,
+        'id': row.id,
+        'message': _message(row),
+        'date': row.date.isoformat() if row.date else None,
+        'student_id': row.student_id
+    }
+
+
+# Consulta de cada tipo de actividad y su modelo
+BRANCHES = {
+    'enrollment': (_enrollment_activities, Enrollment),
+    'payment': (_payment_activities, Payment)
+}
+
+
+def recent_activities(limit=10, before=None, types=ACTIVITY_TYPES):
+    """Feed de actividades (matrículas y pagos) en una sola consulta UNION ALL.
+
+    Cada rama lee como máximo ``limit`` filas en orden de fecha descendente
+    con los nombres ya unidos, así que el costo no depende del historial.
+    ``before`` es la posición (fecha, tipo, id) de decode_activity_cursor o
+    (fecha, None, None) para empezar antes de una fecha.
+    """
+    selects = [BRANCHES[t][0](before, limit).subquery().select() for t in types]
+    feed = union_all(*selects).subquery() if len(selects) > 1 else selects[0].subquery()
+
+    rows = db.session.execute(
+        select(feed).order_by(feed.c.date.desc(), feed.c.type, feed.c.id.desc()).limit(limit)
+    )
+    return [_as_dict(row) for row in rows]
+
+
+def activity(activity_type, activity_id):
+    """Una actividad del feed por tipo e id, con el mismo formato que recent_activities"""
+    branch, model = BRANCHES[activity_type]
+    row = db.session.execute(branch(None, 1).where(model.id == activity_id)).first()
+    return _as_dict(row) if row else None
@@ -0,0 +1,134 @@
+from sqlalchemy import bindparam, case, func, select
+from models import db, Student, Enrollment, Attendance, Class
+
+# Columna del contador para cada estado de asistencia (los demás estados solo cuentan en el total)
+COUNTER_COLUMNS = {
+    'presente': 'attendance_present',
+    'ausente': 'attendance_absent',
+    'justificado': 'attendance_justified',
+    'tardanza': 'attendance_late'
+}
+
+
+def _rate(present, total):
+    """Porcentaje de asistencia (solo 'presente'), nulo si no hay registros"""
+    return case((total > 0, present * 100.0 / total), else_=None)
+
+
+def _increments(table):
+    """SET contador = contador + :d_contador, y la tasa calculada con los valores nuevos"""
+    values = {column: table.c[column] + bindparam(f'd_{column}') for column in COUNTER_COLUMNS.values()}
+    values['attendance_total'] = table.c.attendance_total + bindparam('d_attendance_total')
+    values['attendance_rate'] = _rate(values['attendance_present'], values['attendance_total'])
+    return values
+
+
+def apply_attendance_counts(course_id, deltas_by_student):
+    """Aplicar cambios netos por estudiante ({id: {'presente': 1, 'ausente': -1}}) en una clase del curso.
+
+    Los contadores de Student y de la matrícula del curso se incrementan en
+    la base de datos con un UPDATE por tabla (executemany), así que varios
+    workers pueden registrar asistencia del mismo estudiante sin carreras.
+    """
+    params = []
+    for student_id, deltas in deltas_by_student.items():
+        row = {f'd_{column}': deltas.get(status, 0) for status, column in COUNTER_COLUMNS.items()}
+        row['d_attendance_total'] = sum(deltas.values())
+        if any(row.values()):
+            params.append(dict(row, b_student_id=student_id, b_course_id=course_id))
+    if not params:
+        return
+
+    student = Student.__table__
+    db.session.execute(student.update().where(
+        student.c.id == bindparam('b_student_id')
+    ).values(_increments(student)), params)
+
+    enrollment = Enrollment.__table__
+    db.session.execute(enrollment.update().where(
+        enrollment.c.student_id == bindparam('b_student_id'),
+        enrollment.c.course_id == bindparam('b_course_id')
+    ).values(_increments(enrollment)), params)
+
+
+def record_student_attendance(attendance, course_id):
+    """Sumar un registro de asistencia a los contadores (en la transacción actual)"""
+    apply_attendance_counts(course_id, {attendance.student_id: {attendance.status: 1}})
+
+
+def _counter_updates(table, matches, criteria):
+    """UPDATEs que recalculan los contadores de ``table`` con subconsultas correlacionadas sobre Attendance"""
+    def count(status=None):
+        query = select(func.count(Attendance.id)).select_from(Attendance).join(Class, Attendance.class_id == Class.id)
+        query = query.where(*matches)
+        if status is not None:
+            query = query.where(Attendance.status == status)
+        return query.scalar_subquery()
+
+    values = {column: count(status) for status, column in COUNTER_COLUMNS.items()}
+    values['attendance_total'] = count()
+    return [
+        table.update().where(*criteria).values(values),
+        table.update().where(*criteria).values(
+            attendance_rate=_rate(table.c.attendance_present, table.c.attendance_total))
+    ]
+
+
+def student_counter_updates(*criteria):
+    student = Student.__table__
+    return _counter_updates(student, [Attendance.student_id == student.c.id], criteria)
+
+
+def enrollment_counter_updates(*criteria):
+    enrollment = Enrollment.__table__
+    return _counter_updates(enrollment, [Attendance.student_id == enrollment.c.student_id,
+                                         Class.course_id == enrollment.c.course_id], criteria)
+
+
+def recompute_attendance_counters(*criteria):
+    """Recalcular desde Attendance los contadores de las matrículas que cumplen ``criteria``"""
+    for statement in enrollment_counter_updates(*criteria):
+        db.session.execute(statement)
+
+
+def rebuild_attendance_counters(session=None):
+    """Recalcular todos los contadores de estudiantes y matrículas (parte de rebuild_rollups)"""
+    session = session or db.session
+    for statement in student_counter_updates() + enrollment_counter_updates():
+        session.execute(statement)
+
+
+def _parse_threshold(args):
+    try:
+        threshold = float(args['attendance_below'])
+    except ValueError:
+        threshold = None
+    if threshold is None or not 0 <= threshold <= 100:
+        raise ValueError('El parámetro attendance_below debe ser un porcentaje entre 0 y 100')
+    return threshold
+
+
+def student_attendance_filters(args):
+    """Criterios de ?attendance_below= para el listado de estudiantes (índice ix_student_attendance_rate)"""
+    if not args.get('attendance_below'):
+        return []
+    return [Student.attendance_rate < _parse_threshold(args)]
+
+
+def enrollment_attendance_filters(args):
+    """Criterios de ?course_id=&student_id=&attendance_below= para el listado de matrículas.
+
+    Con ``course_id`` y ``attendance_below`` se resuelve con el índice
+    ix_enrollment_course_attendance_rate. Lanza ValueError si algún
+    parámetro es inválido.
+    """
+    criteria = []
+    for name, column in (('course_id', Enrollment.course_id), ('student_id', Enrollment.student_id)):
+        if args.get(name):
+            try:
+                criteria.append(column == int(args[name]))
+            except ValueError:
+                raise ValueError(f'El parámetro {name} debe ser un entero')
+    if args.get('attendance_below'):
+        criteria.append(Enrollment.attendance_rate < _parse_threshold(args))
+    return criteria
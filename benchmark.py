@@ -0,0 +1,342 @@
+"""Benchmark de las rutas /api/*.
+
+Ejecuta cada ruta GET (y algunos escenarios de escritura idempotentes) con
+el cliente de pruebas de Flask o contra un servidor local, y guarda
+latencias p50/p95/p99, throughput, consultas SQL por petición y RSS máximo
+en un archivo JSON para comparar corridas.
+
+    DATABASE_URL=sqlite:///crm_educativo.db python benchmark.py --requests 50
+    python benchmark.py --base-url http://localhost:8000 --concurrency 8 --server-pid 1234
+    python benchmark.py --compare benchmark_results/anterior.json
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import resource
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from urllib.parse import quote
+
+# Parámetros de consulta por endpoint; cada elemento es una variante medida por separado
+ROUTE_QUERIES = {
+    'api.get_students': ['', '?limit=50'],
+    'api.get_courses': ['', '?limit=50'],
+    'api.get_classes': ['', '?limit=50'],
+    'api.get_enrollments': ['', '?limit=50'],
+    'api.get_payments': ['', '?limit=50'],
+    'api.get_attendance': ['', '?limit=50'],
+    'api.get_grades': ['', '?limit=50'],
+    'api.get_users': ['?limit=50'],
+    'api.get_financial_report': ['', '?granularity=week'],
+    'api.export_data': ['?format=ndjson&date_from={recent}'],
+    'api.search_students': ['?q={search_prefix}', '?q={search_word}&limit=50'],
+}
+
+# Endpoints que no se miden (modifican datos, no son parte del tráfico normal o, como el
+# stream SSE, no terminan hasta SSE_STREAM_TIMEOUT)
+SKIPPED_ENDPOINTS = {'api.prometheus_metrics', 'api.stream_dashboard'}
+
+METRIC_LINE = re.compile(r'^(\w+)\{(.*)\} ([0-9.eE+-]+)$')
+
+
+class TestClientTarget:
+    """Peticiones en el mismo proceso con app.test_client()"""
+
+    mode = 'test_client'
+
+    def __init__(self, app):
+        self.app = app
+        self.local = threading.local()
+
+    def request(self, method, path, headers=None, body=None):
+        client = getattr(self.local, 'client', None)
+        if client is None:
+            client = self.local.client = self.app.test_client()
+        response = client.open(path, method=method, headers=headers, json=body)
+        data = response.get_data()
+        response.close()
+        return response.status_code, data
+
+
+class HttpTarget:
+    """Peticiones HTTP contra un servidor (ej. gunicorn local)"""
+
+    mode = 'http'
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+
+    def request(self, method, path, headers=None, body=None):
+        headers = dict(headers or {})
+        data = None
+        if body is not None:
+            data = json.dumps(body).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        req = urllib.request.Request(self.base_url + path, data=data, headers=headers, method=method)
+        try:
+            with urllib.request.urlopen(req) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def scrape_metrics(target, headers):
+    """Leer /api/metrics y devolver {(métrica, endpoint): valor} de los contadores usados"""
+    status, body = target.request('GET', '/api/metrics', headers)
+    if status != 200:
+        return {}
+    values = {}
+    for line in body.decode('utf-8').splitlines():
+        match = METRIC_LINE.match(line)
+        if not match or match.group(1) not in ('db_statements_total', 'http_request_duration_seconds_count'):
+            continue
+        endpoint = re.search(r'endpoint="([^"]*)"', match.group(2))
+        if endpoint:
+            key = (match.group(1), endpoint.group(1))
+            values[key] = values.get(key, 0) + float(match.group(3))
+    return values
+
+
+def peak_rss_mb(pids):
+    """RSS máximo (VmHWM) de los procesos indicados y sus hijos, o del proceso actual"""
+    if not pids:
+        return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    seen = set()
+    pending = list(pids)
+    total_kb = 0
+    while pending:
+        pid = pending.pop()
+        if pid in seen:
+            continue
+        seen.add(pid)
+        try:
+            with open(f'/proc/{pid}/status') as f:
+                for line in f:
+                    if line.startswith('VmHWM:'):
+                        total_kb += int(line.split()[1])
+            with open(f'/proc/{pid}/task/{pid}/children') as f:
+                pending.extend(int(child) for child in f.read().split())
+        except OSError:
+            continue
+    return round(total_kb / 1024, 1)
+
+
+def build_scenarios(app, sample):
+    """(nombre, endpoint, método, ruta, cuerpo) de cada petición a medir"""
+    scenarios = []
+    for rule in sorted(app.url_map.iter_rules(), key=lambda r: r.rule):
+        if not rule.rule.startswith('/api/') or 'GET' not in rule.methods or rule.endpoint in SKIPPED_ENDPOINTS:
+            continue
+        try:
+            path = rule.rule
+            for argument in rule.arguments:
+                path = re.sub(rf'<(?:\w+:)?{argument}>', str(sample[argument]), path)
+        except KeyError:
+            continue
+        for query in ROUTE_QUERIES.get(rule.endpoint, ['']):
+            query = query.format(**sample)
+            scenarios.append((f'GET {path}{query}', rule.endpoint, 'GET', path + query, None))
+
+    scenarios.append(('POST /api/auth/login', 'api.login', 'POST', '/api/auth/login', sample['credentials']))
+    if sample.get('roll_call'):
+        path = f"/api/classes/{sample['class_id']}/attendance"
+        scenarios.append((f'POST {path}', 'api.record_class_attendance', 'POST', path, sample['roll_call']))
+    return scenarios
+
+
+def sample_values(app, credentials):
+    """IDs existentes para completar las rutas con parámetros"""
+    from models import db, User, Student, Course, Class, Enrollment
+    with app.app_context():
+        first = lambda model: db.session.query(db.func.min(model.id)).scalar()
+        student_name = db.session.query(Student.name).order_by(Student.id).limit(1).scalar() or 'a'
+        search_word = student_name.split()[0].lower()
+        class_row = db.session.query(Class.id, Class.course_id, Class.schedule).order_by(Class.id).first()
+        roll_call = None
+        if class_row:
+            students = [s for (s,) in db.session.query(Enrollment.student_id).filter(
+                Enrollment.course_id == class_row.course_id).limit(30)]
+            roll_call = {
+                'date': class_row.schedule.date().isoformat(),
+                'records': [{'student_id': s, 'status': 'presente'} for s in students]
+            }
+        return {
+            'student_id': first(Student),
+            'course_id': first(Course),
+            'class_id': class_row.id if class_row else None,
+            'user_id': first(User),
+            'entity': 'payments',
+            'recent': (datetime.utcnow() - timedelta(days=30)).date().isoformat(),
+            'search_prefix': quote(search_word[:3]),
+            'search_word': quote(search_word),
+            'credentials': credentials,
+            'roll_call': roll_call
+        }
+
+
+def run_scenario(target, headers, method, path, body, count, concurrency):
+    durations = []
+    errors = 0
+    statuses = {}
+    lock = threading.Lock()
+
+    def one(_):
+        nonlocal errors
+        started = time.perf_counter()
+        try:
+            status, _ = target.request(method, path, headers, body)
+        except Exception:
+            status = 'error'
+        elapsed = time.perf_counter() - started
+        with lock:
+            durations.append(elapsed)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+            if status == 'error' or status >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(one, range(count)))
+    else:
+        for i in range(count):
+            one(i)
+    wall = time.perf_counter() - started
+
+    ms = lambda value: round(value * 1000, 2) if value is not None else None
+    return {
+        'requests': count,
+        'errors': errors,
+        'statuses': statuses,
+        'p50_ms': ms(percentile(durations, 0.50)),
+        'p95_ms': ms(percentile(durations, 0.95)),
+        'p99_ms': ms(percentile(durations, 0.99)),
+        'mean_ms': ms(sum(durations) / len(durations)) if durations else None,
+        'throughput_rps': round(count / wall, 1) if wall else None
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(previous, current):
+    old = {route['name']: route for route in previous['routes']}
+    print(f"\n{'ruta':60} {'p50 antes':>10} {'p50 ahora':>10} {'p95 antes':>10} {'p95 ahora':>10} {'cambio p95':>10}")
+    for route in current['routes']:
+        before = old.get(route['name'])
+        if not before or not before['p95_ms'] or route['p95_ms'] is None:
+            continue
+        change = (route['p95_ms'] - before['p95_ms']) / before['p95_ms'] * 100
+        print(f"{route['name'][:60]:60} {before['p50_ms']:>10} {route['p50_ms']:>10} "
+              f"{before['p95_ms']:>10} {route['p95_ms']:>10} {change:>+9.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de las rutas /api/*')
+    parser.add_argument('--base-url', help='URL del servidor; sin ella se usa el cliente de pruebas de Flask')
+    parser.add_argument('--requests', type=int, default=50, help='Peticiones por ruta')
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--routes', help='Expresión regular para filtrar rutas por nombre')
+    parser.add_argument('--email', default='levi@crm.edu')
+    parser.add_argument('--password', default='Leaguejinx1310-')
+    parser.add_argument('--metrics-token', default=os.environ.get('METRICS_TOKEN', ''))
+    parser.add_argument('--server-pid', type=int, action='append', default=[],
+                        help='PID del servidor (se suman sus procesos hijos) para el RSS máximo')
+    parser.add_argument('--no-response-cache', action='store_true',
+                        help='Desactivar la caché de respuestas (solo con el cliente de pruebas)')
+    parser.add_argument('--output', help='Archivo JSON de resultados (por defecto benchmark_results/<fecha>.json)')
+    parser.add_argument('--compare', help='Resultados anteriores para comparar')
+    args = parser.parse_args()
+
+    from app import create_app
+    app = create_app()
+    credentials = {'email': args.email, 'password': args.password}
+    if args.base_url:
+        target = HttpTarget(args.base_url)
+    else:
+        target = TestClientTarget(app)
+        # Los logs de cada petición se mezclarían con el reporte en stdout
+        logging.getLogger().setLevel(logging.WARNING)
+        if args.no_response_cache:
+            from http_cache import response_cache
+            response_cache.max_bytes = 0
+
+    status, body = target.request('POST', '/api/auth/login', body=credentials)
+    if status != 200:
+        sys.exit(f'No se pudo iniciar sesión ({status}): {body[:200]!r}')
+    headers = {'Authorization': f"Bearer {json.loads(body)['token']}"}
+    # Sin METRICS_TOKEN, /api/metrics acepta la sesión de un administrador
+    metrics_headers = {'Authorization': f'Bearer {args.metrics_token}'} if args.metrics_token else headers
+
+    scenarios = build_scenarios(app, sample_values(app, credentials))
+    if args.routes:
+        scenarios = [s for s in scenarios if re.search(args.routes, s[0])]
+
+    metrics_before = scrape_metrics(target, metrics_headers)
+    started_at = datetime.utcnow()
+    routes = []
+    for name, endpoint, method, path, body in scenarios:
+        result = run_scenario(target, headers, method, path, body, args.requests, args.concurrency)
+        routes.append(dict(name=name, endpoint=endpoint, **result))
+        print(f"{name[:70]:70} p50={result['p50_ms']}ms p95={result['p95_ms']}ms "
+              f"p99={result['p99_ms']}ms {result['throughput_rps']} req/s errores={result['errors']}")
+
+    if args.base_url:
+        # Los demás workers publican sus métricas cada METRICS_FLUSH_INTERVAL segundos
+        time.sleep(6)
+    metrics_after = scrape_metrics(target, metrics_headers)
+    for route in routes:
+        endpoint = route['endpoint']
+        served = (metrics_after.get(('http_request_duration_seconds_count', endpoint), 0)
+                  - metrics_before.get(('http_request_duration_seconds_count', endpoint), 0))
+        statements = (metrics_after.get(('db_statements_total', endpoint), 0)
+                      - metrics_before.get(('db_statements_total', endpoint), 0))
+        # Promedio por endpoint (las variantes de una misma ruta comparten el valor)
+        route['queries_per_request'] = round(statements / served, 2) if served else None
+
+    results = {
+        'started_at': started_at.isoformat(),
+        'mode': target.mode,
+        'target': args.base_url or os.environ.get('DATABASE_URL', 'sqlite:///crm_educativo.db'),
+        'git_revision': git_revision(),
+        'requests_per_route': args.requests,
+        'concurrency': args.concurrency,
+        'response_cache': not args.no_response_cache,
+        'peak_rss_mb': peak_rss_mb(args.server_pid),
+        'routes': routes
+    }
+
+    output = args.output or os.path.join('benchmark_results', f'{started_at:%Y%m%d-%H%M%S}.json')
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print(f"\nRSS máximo: {results['peak_rss_mb']} MB. Resultados guardados en {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
+
+
+if __name__ == '__main__':
+    main()
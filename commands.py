@@ -0,0 +1,144 @@
+import click
+from models import db, User
+
+# Usuarios creados por bootstrap si no existen: (email, contraseña, nombre, rol)
+DEFAULT_USERS = [
+    ('levi@crm.edu', 'Leaguejinx1310-', 'Levi Villarreal', 'superadmin'),
+    ('admin@crm.edu', 'admin123', 'Administrador', 'admin'),
+]
+
+
+def bootstrap_database():
+    """Crear tablas, aplicar migraciones pendientes y crear los usuarios por defecto.
+
+    Se ejecuta una vez por despliegue (``flask bootstrap``), no al arrancar
+    cada worker. Devuelve las migraciones aplicadas y los usuarios creados.
+    """
+    from migrations import run_migrations
+    from passwords import hash_password
+    # Solo el primario; las réplicas reciben el esquema por replicación
+    db.create_all(bind_key=None)
+    applied = run_migrations()
+
+    created = []
+    for email, password, name, role in DEFAULT_USERS:
+        if User.query.filter_by(email=email).first():
+            continue
+        db.session.add(User(email=email, password_hash=hash_password(password), name=name, role=role))
+        db.session.commit()
+        created.append(email)
+    return applied, created
+
+
+def register_commands(app):
+    """Registrar los comandos de mantenimiento en ``flask``"""
+
+    @app.cli.command('bootstrap')
+    def bootstrap_command():
+        """Crear el esquema, aplicar migraciones y crear los usuarios por defecto"""
+        applied, created = bootstrap_database()
+        if applied:
+            print(f"Migraciones aplicadas: {', '.join(str(v) for v in applied)}")
+        for email in created:
+            print(f"Usuario creado: {email}")
+        print("Base de datos lista")
+
+    @app.cli.command('rebuild-rollups')
+    def rebuild_rollups_command():
+        """Reconstruir las tablas de resumen del dashboard desde los datos originales"""
+        from rollups import rebuild_rollups
+        from http_cache import bump_versions
+        result = rebuild_rollups()
+        bump_versions('payment', 'attendance')
+        print(f"Rollups reconstruidos: {result['attendance_days']} filas de asistencia, {result['income_days']} filas de ingresos")
+
+    @app.cli.command('recompute-grades')
+    @click.option('--check', is_flag=True, help='Solo verificar; termina con código 1 si hay diferencias')
+    def recompute_grades_command(check):
+        """Verificar las notas finales acumuladas contra las calificaciones y reparar las diferencias"""
+        from final_grades import verify_final_grades
+        from http_cache import bump_versions
+        checked, mismatched = verify_final_grades(repair=not check)
+        print(f"Matrículas revisadas: {checked}, con diferencias: {len(mismatched)}")
+        if mismatched and check:
+            print(f"  ids: {', '.join(str(i) for i in mismatched[:20])}{' ...' if len(mismatched) > 20 else ''}")
+            raise SystemExit(1)
+        if mismatched:
+            bump_versions('enrollment')
+            print("Diferencias reparadas")
+
+    @app.cli.command('migrate')
+    def migrate_command():
+        """Aplicar las migraciones de esquema pendientes"""
+        from migrations import run_migrations
+        applied = run_migrations()
+        if applied:
+            print(f"Migraciones aplicadas: {', '.join(str(v) for v in applied)}")
+        else:
+            print("El esquema ya está actualizado")
+
+    @app.cli.command('import-data')
+    @click.argument('entity')
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    def import_data_command(entity, path):
+        """Importar estudiantes, matrículas o pagos desde un archivo CSV o NDJSON"""
+        from imports import IMPORTERS, detect_format, iter_records, import_records
+        from http_cache import bump_versions
+        if entity not in IMPORTERS:
+            raise click.BadParameter(f"use {', '.join(IMPORTERS)}", param_hint='entity')
+        fmt = detect_format(path)
+        if not fmt:
+            raise click.BadParameter('el archivo debe ser .csv, .ndjson o .jsonl', param_hint='path')
+        with open(path, 'rb') as stream:
+            report = import_records(entity, iter_records(stream, fmt))
+        if report.inserted:
+            bump_versions(IMPORTERS[entity][0].__tablename__)
+        print(f"Procesadas: {report.processed}, insertadas: {report.inserted}, con errores: {report.error_count}")
+        for error in report.errors:
+            print(f"  fila {error['row']}: {error['error']}")
+
+    @app.cli.command('run-worker')
+    @click.option('--once', is_flag=True, help='Procesar los trabajos pendientes y terminar')
+    def run_worker_command(once):
+        """Procesar la cola de trabajos: repartos de notificaciones y emails por lotes"""
+        from jobs import run_worker
+        run_worker(once=once, progress=lambda totals: print(
+            f"Repartos: {totals['jobs']}, emails enviados: {totals['emails_sent']}, "
+            f"con error: {totals['emails_failed']}", flush=True))
+
+    @app.cli.command('seed-data')
+    @click.option('--teachers', type=click.IntRange(min=1), default=10, show_default=True)
+    @click.option('--courses', type=click.IntRange(min=1), default=20, show_default=True)
+    @click.option('--students', type=click.IntRange(min=0), default=1000, show_default=True)
+    @click.option('--classes-per-course', type=click.IntRange(min=0), default=40, show_default=True)
+    @click.option('--attendance', type=click.IntRange(min=0), default=50000, show_default=True)
+    @click.option('--payments', type=click.IntRange(min=0), default=10000, show_default=True)
+    @click.option('--grades', type=click.IntRange(min=0), default=20000, show_default=True)
+    @click.option('--teacher-password', default='profesor123', show_default=True)
+    @click.option('--seed', type=int, default=None, help='Semilla para generar los mismos datos')
+    def seed_data_command(teacher_password, seed, **volumes):
+        """Llenar la base de datos con datos sintéticos (ej. --students 50000 --attendance 2000000)"""
+        import time
+        from seed import seed_database
+        from passwords import hash_password
+        from http_cache import bump_versions
+        started = time.perf_counter()
+        counts = seed_database(hash_password(teacher_password), volumes, seed=seed,
+                               progress=lambda entity, count: print(f"{entity}: {count} filas"))
+        bump_versions('user', 'course', 'class', 'student', 'enrollment', 'attendance', 'payment', 'grade')
+        if counts['attendance'] < volumes['attendance']:
+            print("Aviso: la asistencia está limitada por matrículas × clases pasadas; aumenta --classes-per-course")
+        print(f"Datos generados en {time.perf_counter() - started:.1f} s ({sum(counts.values())} filas)")
+
+    @app.cli.command('check-indexes')
+    def check_indexes_command():
+        """Verificar con EXPLAIN que las consultas principales usan sus índices"""
+        from migrations import explain_hot_queries
+        failed = False
+        for description, index_name, uses_index, plan in explain_hot_queries():
+            print(f"[{'OK' if uses_index else 'FALTA'}] {description} ({index_name})")
+            if not uses_index:
+                failed = True
+                print(plan)
+        if failed:
+            raise SystemExit(1)
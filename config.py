@@ -0,0 +1,98 @@
+import os
+from datetime import timedelta
+from dotenv import load_dotenv
+from sqlalchemy.pool import StaticPool
+
+# Cargar variables de entorno
+load_dotenv()
+
+
+class Config:
+    """Configuración por defecto, leída de las variables de entorno"""
+
+    SECRET_KEY = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///crm_educativo.db')
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Motor de base de datos: pool de conexiones (archivo SQLite y PostgreSQL) y PRAGMAs de SQLite
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+    DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes')
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000))
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+
+    # Réplicas de lectura (URLs separadas por comas), segundos leyendo del primario tras
+    # una escritura propia y segundos antes de reintentar una réplica que falló
+    DATABASE_REPLICA_URLS = os.environ.get('DATABASE_REPLICA_URLS', '')
+    REPLICA_READ_YOUR_WRITES = float(os.environ.get('REPLICA_READ_YOUR_WRITES', 5))
+    REPLICA_RETRY_INTERVAL = float(os.environ.get('REPLICA_RETRY_INTERVAL', 30))
+
+    JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY', 'jwt-secret-key-change-in-production')
+    JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=24)
+    JWT_ERROR_MESSAGE_KEY = 'error'
+    BCRYPT_LOG_ROUNDS = int(os.environ.get('BCRYPT_LOG_ROUNDS', 12))
+    # Hilos de bcrypt y operaciones que pueden esperar turno; sin PASSWORD_HASH_QUEUE, la espera
+    # se ajusta para que bcrypt ocupe como máximo la cuarta parte de los WEB_THREADS del worker
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_HASH_QUEUE = int(os.environ['PASSWORD_HASH_QUEUE']) if os.environ.get('PASSWORD_HASH_QUEUE') else None
+    WEB_THREADS = int(os.environ.get('WEB_THREADS', 12))
+    USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', 1024))
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', 60))
+    USER_CACHE_CHECK_INTERVAL = float(os.environ.get('USER_CACHE_CHECK_INTERVAL', 1))
+    RESPONSE_CACHE_MAX_BYTES = int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+
+    # Logs estructurados: nivel global, nivel mínimo y muestreo por endpoint ("endpoint=valor,...")
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+    LOG_ROUTE_LEVELS = os.environ.get('LOG_ROUTE_LEVELS', '')
+    LOG_ROUTE_SAMPLING = os.environ.get(
+        'LOG_ROUTE_SAMPLING', 'api.verify_token=0.1,api.get_profile=0.1,api.health_check=0.01,api.server_status=0.01')
+
+    # Stream SSE del dashboard: streams abiertos por worker (cada uno ocupa un hilo de gunicorn;
+    # sin SSE_MAX_STREAMS, la tercera parte de WEB_THREADS), segundos entre consultas al registro
+    # de eventos, entre heartbeats y antes de cerrar el stream (el navegador reconecta solo),
+    # espera antes de reconectar y retención de eventos
+    SSE_MAX_STREAMS = int(os.environ['SSE_MAX_STREAMS']) if os.environ.get('SSE_MAX_STREAMS') else None
+    SSE_POLL_INTERVAL = float(os.environ.get('SSE_POLL_INTERVAL', 1))
+    SSE_HEARTBEAT_INTERVAL = float(os.environ.get('SSE_HEARTBEAT_INTERVAL', 15))
+    SSE_STREAM_TIMEOUT = float(os.environ.get('SSE_STREAM_TIMEOUT', 300))
+    SSE_RETRY_MS = int(os.environ.get('SSE_RETRY_MS', 3000))
+    SSE_EVENT_RETENTION = int(os.environ.get('SSE_EVENT_RETENTION', 3600))
+
+    # Métricas: directorio compartido entre workers, token de /api/metrics (sin él, solo administradores)
+    # y token opcional del perfilado
+    METRICS_DIR = os.environ.get('METRICS_DIR', '')
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+    PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN', '')
+
+    # Configuración de email (en desarrollo, un servidor SMTP local: MAIL_SERVER=localhost MAIL_PORT=1025 MAIL_USE_TLS=false)
+    MAIL_SERVER = os.environ.get('MAIL_SERVER', 'smtp.gmail.com')
+    MAIL_PORT = int(os.environ.get('MAIL_PORT', 587))
+    MAIL_USE_TLS = os.environ.get('MAIL_USE_TLS', 'true').lower() in ('1', 'true', 'yes')
+    MAIL_USERNAME = os.environ.get('MAIL_USERNAME', '')
+    MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD', '')
+    MAIL_DEFAULT_SENDER = os.environ.get('MAIL_DEFAULT_SENDER', MAIL_USERNAME or 'no-reply@crm.edu')
+
+    # Cola de trabajos (flask run-worker): emails por conexión SMTP, segundos entre consultas
+    # sin trabajo, intentos y espera base de los reintentos (se duplica en cada uno), segundos
+    # antes de retomar un trabajo de un worker caído y días que se guardan los terminados
+    JOB_BATCH_SIZE = int(os.environ.get('JOB_BATCH_SIZE', 50))
+    JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', 2))
+    JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 5))
+    JOB_RETRY_DELAY = int(os.environ.get('JOB_RETRY_DELAY', 30))
+    JOB_LOCK_TIMEOUT = int(os.environ.get('JOB_LOCK_TIMEOUT', 600))
+    JOB_RETENTION_DAYS = int(os.environ.get('JOB_RETENTION_DAYS', 7))
+
+
+class TestingConfig(Config):
+    """Base en memoria y bcrypt con el costo mínimo para pruebas rápidas"""
+
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    # Una sola conexión compartida: cada conexión nueva a sqlite:// sería otra base vacía
+    SQLALCHEMY_ENGINE_OPTIONS = {'poolclass': StaticPool, 'connect_args': {'check_same_thread': False}}
+    BCRYPT_LOG_ROUNDS = 4
+    LOG_LEVEL = 'WARNING'
@@ -0,0 +1,157 @@
+import threading
+import time
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+from models import db
+from metrics import registry
+from replicas import REPLICA_BIND_PREFIX
+
+# Límites (segundos) del histograma de espera por una conexión del pool
+POOL_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+SQLITE_JOURNAL_MODES = ('DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF')
+SQLITE_SYNCHRONOUS = ('OFF', 'NORMAL', 'FULL', 'EXTRA')
+
+
+def dialect_insert(table):
+    """insert() del dialecto activo (SQLite o PostgreSQL), con soporte para ON CONFLICT"""
+    if db.session.get_bind().dialect.name == 'postgresql':
+        return postgresql.insert(table)
+    return sqlite.insert(table)
+
+
+class PoolWaitStats:
+    """Checkouts, espera acumulada y máxima, y timeouts del pool en este worker"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.timeouts = 0
+
+    def observe(self, wait, timed_out=False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_seconds += wait
+            self.max_wait_seconds = max(self.max_wait_seconds, wait)
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'checkouts': self.checkouts,
+                'wait_seconds': round(self.wait_seconds, 4),
+                'avg_wait_seconds': round(self.wait_seconds / self.checkouts, 6) if self.checkouts else 0,
+                'max_wait_seconds': round(self.max_wait_seconds, 4),
+                'timeouts': self.timeouts
+            }
+
+
+pool_wait_stats = PoolWaitStats()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool que mide cuánto espera cada checkout por una conexión.
+
+    La espera incluye abrir la conexión cuando el pool todavía no está lleno.
+    """
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            wait = time.perf_counter() - started
+            pool_wait_stats.observe(wait, timed_out=True)
+            registry.inc('db_pool_timeouts_total', {})
+            raise
+        wait = time.perf_counter() - started
+        pool_wait_stats.observe(wait)
+        registry.observe('db_pool_wait_seconds', {}, wait, POOL_WAIT_BUCKETS)
+        return connection
+
+
+def _is_sqlite_memory(url):
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+
+def engine_options(config, uri=None):
+    """Opciones de create_engine según la base configurada (o ``uri``, para las réplicas).
+
+    SQLite en memoria conserva el pool por defecto (una sola conexión); las
+    bases en archivo y PostgreSQL usan un QueuePool instrumentado, y en
+    PostgreSQL además se valida cada conexión y se recicla periódicamente.
+    """
+    url = make_url(uri or config['SQLALCHEMY_DATABASE_URI'])
+    if _is_sqlite_memory(url):
+        return {}
+    options = {
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': config.get('DB_POOL_SIZE', 5),
+        'max_overflow': config.get('DB_MAX_OVERFLOW', 10),
+        'pool_timeout': config.get('DB_POOL_TIMEOUT', 30)
+    }
+    if url.get_backend_name() == 'postgresql':
+        options['pool_pre_ping'] = config.get('DB_POOL_PRE_PING', True)
+        options['pool_recycle'] = config.get('DB_POOL_RECYCLE', 1800)
+    return options
+
+
+def replica_binds(config):
+    """SQLALCHEMY_BINDS de las réplicas de DATABASE_REPLICA_URLS (separadas por comas)"""
+    urls = [url.strip() for url in (config.get('DATABASE_REPLICA_URLS') or '').split(',') if url.strip()]
+    return {f'{REPLICA_BIND_PREFIX}{i}': dict(engine_options(config, url), url=url) for i, url in enumerate(urls)}
+
+
+def configure_engine(app):
+    """Aplicar los PRAGMAs de SQLite en cada conexión nueva (WAL, synchronous, busy_timeout, mmap)
+
+    Se registran en todos los engines (primaria y réplicas de SQLALCHEMY_BINDS).
+    """
+    with app.app_context():
+        engines = list(db.engines.values())
+    engines = [engine for engine in engines
+               if engine.dialect.name == 'sqlite' and not _is_sqlite_memory(engine.url)]
+    if not engines:
+        return
+
+    journal_mode = app.config.get('SQLITE_JOURNAL_MODE', 'WAL').upper()
+    synchronous = app.config.get('SQLITE_SYNCHRONOUS', 'NORMAL').upper()
+    if journal_mode not in SQLITE_JOURNAL_MODES:
+        raise ValueError(f'SQLITE_JOURNAL_MODE inválido: {journal_mode}')
+    if synchronous not in SQLITE_SYNCHRONOUS:
+        raise ValueError(f'SQLITE_SYNCHRONOUS inválido: {synchronous}')
+    busy_timeout = int(app.config.get('SQLITE_BUSY_TIMEOUT', 5000))
+    mmap_size = int(app.config.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f'PRAGMA journal_mode={journal_mode}')
+        cursor.execute(f'PRAGMA synchronous={synchronous}')
+        cursor.execute(f'PRAGMA busy_timeout={busy_timeout}')
+        cursor.execute(f'PRAGMA mmap_size={mmap_size}')
+        cursor.close()
+
+    for engine in engines:
+        event.listen(engine, 'connect', set_sqlite_pragmas)
+
+
+def pool_status():
+    """Uso actual del pool de este worker y sus tiempos de espera"""
+    pool = db.engine.pool
+    status = {'pool': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            'size': pool.size(),
+            'checked_out': pool.checkedout(),
+            'checked_in': pool.checkedin(),
+            'overflow': max(pool.overflow(), 0)
+        })
+    status.update(pool_wait_stats.to_dict())
+    return status
@@ -0,0 +1,221 @@
+import json
+import logging
+import threading
+import time
+from collections import deque, namedtuple
+from datetime import datetime, timedelta
+from sqlalchemy import func, select
+from sqlalchemy.exc import SQLAlchemyError
+from models import db, DashboardEvent, Course
+from activities import activity
+
+# Eventos recientes que cada worker guarda en memoria para sus streams
+EVENT_BUFFER_SIZE = 1000
+
+# Eventos leídos por consulta al registro
+EVENT_READ_LIMIT = 500
+
+# Segundos que se espera a que se confirme un id saltado antes de darlo por perdido
+# (en PostgreSQL dos transacciones pueden confirmar sus eventos en otro orden que sus ids)
+EVENT_GAP_WAIT = 2
+
+# Sin SSE_MAX_STREAMS, cada worker acepta streams en la tercera parte de sus hilos de gunicorn
+SSE_WEB_THREADS = 12
+SSE_THREAD_SHARE = 3
+
+logger = logging.getLogger(__name__)
+
+Event = namedtuple('Event', 'id type data')
+
+
+def publish_event(event_type, data):
+    """Registrar un evento en la transacción actual: se publica solo si la escritura se confirma"""
+    db.session.add(DashboardEvent(type=event_type, data=json.dumps(data, ensure_ascii=False)))
+
+
+def publish_stats(**deltas):
+    """Cambios en los totales del dashboard (ej. total_students=1)"""
+    deltas = {name: value for name, value in deltas.items() if value}
+    if deltas:
+        publish_event('stats', {'stats': deltas})
+
+
+def publish_activity(activity_type, row, stats=None):
+    """Nueva actividad del feed (matrícula o pago), con sus cambios en los totales"""
+    data = {'activity': activity(activity_type, row.id)}
+    if stats:
+        data['stats'] = stats
+    publish_event(activity_type, data)
+
+
+def publish_payment(payment):
+    stats = None
+    if payment.status == 'pagado' and payment.date.date() >= datetime.now().date().replace(day=1):
+        stats = {'monthly_income': payment.amount}
+    publish_activity('payment', payment, stats)
+
+
+def publish_class(class_session, previous_status=None):
+    """Clase nueva o con otro estado (``previous_status``), con el cambio en las clases programadas"""
+    course_name = db.session.query(Course.name).filter(Course.id == class_session.course_id).scalar()
+    scheduled = (class_session.status == 'programada') - (previous_status == 'programada')
+    publish_event('class', {
+        'class': {
+            'id': class_session.id,
+            'course_id': class_session.course_id,
+            'course_name': course_name,
+            'title': class_session.title,
+            'schedule': class_session.schedule.isoformat(),
+            'room': class_session.room,
+            'status': class_session.status
+        },
+        'stats': {'total_classes': scheduled} if scheduled else {}
+    })
+
+
+def publish_attendance(course_id, deltas):
+    """Asistencia registrada en un curso, como conteo neto por estado"""
+    deltas = {status: count for status, count in deltas.items() if count}
+    if deltas:
+        publish_event('attendance', {'course_id': course_id, 'counts': deltas})
+
+
+def latest_event_id():
+    return db.session.query(func.coalesce(func.max(DashboardEvent.id), 0)).scalar()
+
+
+def read_events(after_id, limit=EVENT_READ_LIMIT):
+    """Eventos con id mayor que ``after_id`` en orden, sin saltarse ids que aún pueden confirmarse"""
+    rows = db.session.execute(
+        select(DashboardEvent.id, DashboardEvent.type, DashboardEvent.data, DashboardEvent.created_at)
+        .where(DashboardEvent.id > after_id).order_by(DashboardEvent.id).limit(limit)
+    ).all()
+    settled = datetime.utcnow() - timedelta(seconds=EVENT_GAP_WAIT)
+    events = []
+    expected = after_id + 1
+    for row in rows:
+        if row.id != expected and row.created_at > settled:
+            break
+        events.append(Event(row.id, row.type, row.data))
+        expected = row.id + 1
+    return events
+
+
+def replay_available(after_id):
+    """Si el registro aún tiene todos los eventos posteriores a ``after_id`` (ni borrados ni de otra base)"""
+    oldest, latest = db.session.query(func.min(DashboardEvent.id), func.max(DashboardEvent.id)).one()
+    if latest is None or after_id == latest:
+        return after_id <= (latest or 0)
+    return oldest <= after_id + 1 and after_id < latest
+
+
+def prune_events(retention):
+    """Borrar los eventos con más de ``retention`` segundos (mantenimiento de flask run-worker)"""
+    cutoff = datetime.utcnow() - timedelta(seconds=retention)
+    deleted = DashboardEvent.query.filter(DashboardEvent.created_at < cutoff).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
+
+
+def format_event(event):
+    """Evento en formato text/event-stream"""
+    return f'id: {event.id}\nevent: {event.type}\ndata: {event.data}\n\n'
+
+
+class EventBroker:
+    """Reparte los eventos nuevos del registro entre los streams SSE de este worker.
+
+    Un solo hilo por worker consulta ``dashboard_event`` cada
+    ``SSE_POLL_INTERVAL`` segundos mientras haya streams abiertos y guarda
+    los últimos EVENT_BUFFER_SIZE eventos en memoria; cada stream espera en
+    una condición en lugar de consultar la base de datos. Así los eventos
+    escritos por cualquier worker llegan a todos los workers con una
+    consulta por intervalo, sin importar cuántos navegadores estén abiertos.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.poll_interval = 1.0
+        self.max_streams = None
+        self._condition = threading.Condition()
+        self._events = deque()
+        self._floor = None  # los eventos con id mayor que este están en _events
+        self._last_id = None
+        self._streams = 0
+        self._thread = None
+
+    def init_app(self, app):
+        self.app = app
+        self.poll_interval = app.config.get('SSE_POLL_INTERVAL', self.poll_interval)
+        self.max_streams = app.config.get('SSE_MAX_STREAMS')
+        if self.max_streams is None:
+            # Un stream ocupa su hilo durante minutos: el resto queda para las peticiones y bcrypt
+            self.max_streams = max(app.config.get('WEB_THREADS', SSE_WEB_THREADS) // SSE_THREAD_SHARE, 1)
+
+    def subscribe(self):
+        """Registrar un stream; False si el worker ya atiende SSE_MAX_STREAMS"""
+        with self._condition:
+            if self._streams >= self.max_streams:
+                return False
+            self._streams += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='sse-broker', daemon=True)
+                self._thread.start()
+            self._condition.notify_all()
+            return True
+
+    def unsubscribe(self):
+        with self._condition:
+            self._streams -= 1
+
+    def wait(self, after_id, timeout):
+        """Eventos posteriores a ``after_id``, esperando hasta ``timeout`` segundos.
+
+        Devuelve None si ya no están en memoria (el stream quedó atrás) y hay
+        que leerlos del registro con read_events.
+        """
+        with self._condition:
+            self._condition.wait_for(
+                lambda: self._last_id is not None and self._last_id > after_id, timeout)
+            if self._floor is None or after_id < self._floor:
+                return None
+            return [event for event in self._events if event.id > after_id]
+
+    def _append(self, events):
+        with self._condition:
+            for event in events:
+                if len(self._events) >= EVENT_BUFFER_SIZE:
+                    self._floor = self._events.popleft().id
+                self._events.append(event)
+                self._last_id = event.id
+            self._condition.notify_all()
+
+    def _poll(self):
+        if self._last_id is None:
+            start = latest_event_id()
+            with self._condition:
+                self._events.clear()
+                self._floor = self._last_id = start
+        events = read_events(self._last_id)
+        if events:
+            self._append(events)
+
+    def _run(self):
+        with self.app.app_context():
+            while True:
+                with self._condition:
+                    if not self._condition.wait_for(lambda: self._streams > 0, 60):
+                        # Sin streams no se siguen los eventos: al volver se parte del último
+                        self._last_id = self._floor = None
+                        continue
+                try:
+                    self._poll()
+                except SQLAlchemyError as e:
+                    logger.warning('No se pudieron leer los eventos del dashboard', extra={'error': str(e)})
+                finally:
+                    # No dejar una transacción (y su snapshot) abierta entre consultas
+                    db.session.remove()
+                time.sleep(self.poll_interval)
+
+
+event_broker = EventBroker()
@@ -0,0 +1,75 @@
+import csv
+import io
+import json
+from models import db, Student, Class, Enrollment, Payment, Attendance, Grade
+from pagination import serialize_value
+
+EXPORT_FORMATS = ('csv', 'ndjson')
+
+# Filas leídas por viaje al cursor del servidor y escritas por chunk de la respuesta
+EXPORT_BATCH_SIZE = 1000
+
+MIMETYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson'
+}
+
+
+def _course_attendance(filters):
+    return Attendance.class_id.in_(db.session.query(Class.id).filter(Class.course_id == filters.course_id))
+
+
+# Entidad exportable: (modelo, columna de fecha para date_from/date_to, criterio por curso)
+EXPORTS = {
+    'payments': (Payment, Payment.date, lambda f: Payment.student_id.in_(f.enrolled_students())),
+    'attendance': (Attendance, Attendance.date, _course_attendance),
+    'grades': (Grade, Grade.date, lambda f: Grade.course_id == f.course_id),
+    'enrollments': (Enrollment, Enrollment.enrollment_date, lambda f: Enrollment.course_id == f.course_id),
+    'students': (Student, Student.enrollment_date, lambda f: Student.id.in_(f.enrolled_students())),
+}
+
+
+def export_columns(entity):
+    """Columnas exportables de la entidad, en el orden de la tabla"""
+    model = EXPORTS[entity][0]
+    return [c.key for c in model.__table__.columns]
+
+
+def export_query(entity, filters, fields):
+    """Consulta de solo columnas, filtrada y ordenada por ID (índice de la clave primaria)"""
+    model, date_column, course_criterion = EXPORTS[entity]
+    query = db.session.query(*[getattr(model, f) for f in fields]).filter(*filters.date_range(date_column))
+    if filters.course_id:
+        query = query.filter(course_criterion(filters))
+    return query.order_by(model.id)
+
+
+def iter_export(entity, filters, fields, fmt, batch_size=EXPORT_BATCH_SIZE):
+    """Generar el archivo de exportación por chunks de ``batch_size`` filas.
+
+    Las filas se leen con ``yield_per`` (cursor del servidor en PostgreSQL),
+    así que la memoria del worker no depende del tamaño de la tabla.
+    """
+    query = export_query(entity, filters, fields).yield_per(batch_size)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if fmt == 'csv' else None
+    if writer:
+        writer.writerow(fields)
+
+    pending = 0
+    for row in query:
+        values = [serialize_value(value) for value in row]
+        if writer:
+            writer.writerow(values)
+        else:
+            buffer.write(json.dumps(dict(zip(fields, values)), ensure_ascii=False))
+            buffer.write('\n')
+        pending += 1
+        if pending >= batch_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+
+    if buffer.tell():
+        yield buffer.getvalue()
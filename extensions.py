@@ -0,0 +1,10 @@
+from flask_jwt_extended import JWTManager
+from flask_bcrypt import Bcrypt
+from flask_cors import CORS
+from flask_mail import Mail
+
+# Extensiones sin aplicación; create_app las inicializa con init_app
+jwt = JWTManager()
+bcrypt = Bcrypt()
+mail = Mail()
+cors = CORS()
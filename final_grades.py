@@ -0,0 +1,116 @@
+from sqlalchemy import and_, case, func, select
+from models import db, Enrollment, Grade
+
+# Pesos acumulados menores que esto se consideran cero (ej. calificaciones con peso 0)
+WEIGHT_EPSILON = 1e-9
+
+# Diferencia máxima aceptada al verificar los acumulados contra las calificaciones
+VERIFY_TOLERANCE = 1e-6
+
+# Matrículas recalculadas por sentencia al reparar
+REPAIR_BATCH_SIZE = 500
+
+
+def _weight(column):
+    """Los pesos nulos cuentan como 1, igual que en los reportes"""
+    return func.coalesce(column, 1.0)
+
+
+def apply_grade(student_id, course_id, grade, weight):
+    """Sumar una calificación a la nota final de la matrícula.
+
+    Es un UPDATE con incrementos calculados en la base de datos, dentro de la
+    transacción actual, así que dos calificaciones simultáneas del mismo
+    estudiante no se pisan.
+    """
+    weight = 1.0 if weight is None else float(weight)
+    weighted = float(grade) * weight
+    table = Enrollment.__table__
+    new_sum = table.c.grade_weighted_sum + weighted
+    new_total = table.c.grade_weight_total + weight
+    db.session.execute(table.update().where(
+        table.c.student_id == student_id,
+        table.c.course_id == course_id
+    ).values(
+        grade_weighted_sum=new_sum,
+        grade_weight_total=new_total,
+        final_grade=case((func.abs(new_total) < WEIGHT_EPSILON, None), else_=new_sum / new_total)
+    ))
+
+
+def record_grade(grade):
+    apply_grade(grade.student_id, grade.course_id, grade.grade, grade.weight)
+
+
+def final_grade_update(*criteria):
+    """UPDATE que recalcula desde Grade los acumulados de las matrículas (todas, o las de ``criteria``)"""
+    enrollment = Enrollment.__table__
+    grade = Grade.__table__
+    weight = _weight(grade.c.weight)
+
+    def per_enrollment(expression):
+        return select(expression).where(
+            grade.c.student_id == enrollment.c.student_id,
+            grade.c.course_id == enrollment.c.course_id
+        ).scalar_subquery()
+
+    return enrollment.update().where(*criteria).values(
+        grade_weighted_sum=per_enrollment(func.coalesce(func.sum(grade.c.grade * weight), 0)),
+        grade_weight_total=per_enrollment(func.coalesce(func.sum(weight), 0)),
+        final_grade=per_enrollment(func.sum(grade.c.grade * weight) / func.nullif(func.sum(weight), 0))
+    )
+
+
+def recompute_final_grades(*criteria):
+    """Recalcular en la transacción actual (ej. matrículas nuevas de estudiantes con calificaciones)"""
+    db.session.execute(final_grade_update(*criteria))
+
+
+def recompute_enrollment_rows(rows):
+    """Acción tras importar matrículas: inicializar sus acumulados con las calificaciones existentes"""
+    recompute_final_grades(Enrollment.student_id.in_({row['student_id'] for row in rows}))
+
+
+def _differs(stored, expected):
+    if stored is None or expected is None:
+        return stored is not expected
+    return abs(stored - expected) > VERIFY_TOLERANCE
+
+
+def verify_final_grades(repair=False, batch_size=1000):
+    """Comparar los acumulados de cada matrícula con un recorrido completo de Grade.
+
+    Devuelve (matrículas revisadas, ids con diferencias). Con ``repair`` las
+    matrículas con diferencias se recalculan y se confirma la transacción.
+    """
+    weight = _weight(Grade.weight)
+    totals = db.session.query(
+        Grade.student_id, Grade.course_id,
+        func.sum(Grade.grade * weight).label('weighted_sum'),
+        func.sum(weight).label('weight_total')
+    ).group_by(Grade.student_id, Grade.course_id).subquery()
+
+    rows = db.session.query(
+        Enrollment.id, Enrollment.grade_weighted_sum, Enrollment.grade_weight_total, Enrollment.final_grade,
+        totals.c.weighted_sum, totals.c.weight_total
+    ).outerjoin(totals, and_(
+        totals.c.student_id == Enrollment.student_id,
+        totals.c.course_id == Enrollment.course_id
+    )).yield_per(batch_size)
+
+    checked = 0
+    mismatched = []
+    for row in rows:
+        checked += 1
+        expected_sum = row.weighted_sum or 0
+        expected_total = row.weight_total or 0
+        expected_final = expected_sum / expected_total if abs(expected_total) >= WEIGHT_EPSILON else None
+        if (_differs(row.grade_weighted_sum, expected_sum) or _differs(row.grade_weight_total, expected_total)
+                or _differs(row.final_grade, expected_final)):
+            mismatched.append(row.id)
+
+    if repair and mismatched:
+        for start in range(0, len(mismatched), REPAIR_BATCH_SIZE):
+            recompute_final_grades(Enrollment.id.in_(mismatched[start:start + REPAIR_BATCH_SIZE]))
+        db.session.commit()
+    return checked, mismatched
@@ -0,0 +1,131 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import date
+from functools import wraps
+from flask import request, current_app, Response
+from models import db, RollupCounter
+from rollups import increment_counter
+
+# Tamaño máximo (bytes) de los cuerpos guardados por proceso
+RESPONSE_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+# Headers de la respuesta original que se conservan en la caché
+CACHED_HEADERS = ('Link',)
+
+
+class ResponseCache:
+    """Cuerpos serializados por ETag con desalojo LRU acotado por tamaño total"""
+
+    def __init__(self, max_bytes=RESPONSE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, etag):
+        with self._lock:
+            entry = self._entries.get(etag)
+            if entry is not None:
+                self._entries.move_to_end(etag)
+            return entry
+
+    def set(self, etag, body, mimetype, headers):
+        # Un cuerpo que ocupa más de la cuarta parte de la caché desalojaría todo lo demás
+        if len(body) > self.max_bytes // 4:
+            return
+        with self._lock:
+            if etag in self._entries:
+                return
+            self._entries[etag] = (body, mimetype, headers)
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, (old_body, _, _) = self._entries.popitem(last=False)
+                self.size -= len(old_body)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+response_cache = ResponseCache()
+
+
+def configure_response_cache(app):
+    response_cache.max_bytes = app.config.get('RESPONSE_CACHE_MAX_BYTES', RESPONSE_CACHE_MAX_BYTES)
+
+
+def _counter_name(table):
+    return f'version:{table}'
+
+
+def table_versions(tables):
+    """Versión actual de cada tabla en una sola consulta a rollup_counter"""
+    names = [_counter_name(t) for t in tables]
+    rows = db.session.execute(
+        db.select(RollupCounter.name, RollupCounter.value).where(RollupCounter.name.in_(names)))
+    versions = dict(rows.all())
+    return [int(versions.get(name, 0)) for name in names]
+
+
+def bump_versions(*tables):
+    """Invalidar las respuestas que dependen de estas tablas (en todos los workers)"""
+    for table in tables:
+        increment_counter(_counter_name(table))
+    db.session.commit()
+
+
+def invalidates(*tables):
+    """Decorador para rutas de escritura: sube la versión de las tablas si la respuesta fue exitosa.
+
+    Se sube después del commit de la ruta; así una lectura concurrente nunca
+    asocia la versión nueva con datos anteriores.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code < 400:
+                bump_versions(*tables)
+            return response
+        return wrapper
+    return decorator
+
+
+def _etag(tables):
+    key = f'{request.full_path}|{date.today().isoformat()}|{table_versions(tables)}'
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:24]
+
+
+def conditional(*tables):
+    """Decorador para rutas de lectura con ETag débil derivado de las versiones de ``tables``.
+
+    Con un If-None-Match vigente responde 304 sin ejecutar la ruta; si el
+    cuerpo ya está en caché lo devuelve sin consultar los modelos. La fecha
+    forma parte del ETag para las rutas que dependen del día (ej. ingresos del mes).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            etag = _etag(tables)
+            if request.if_none_match.contains_weak(etag):
+                response = Response(status=304)
+            else:
+                cached = response_cache.get(etag)
+                if cached:
+                    body, mimetype, headers = cached
+                    response = Response(body, mimetype=mimetype, headers=headers)
+                else:
+                    response = current_app.make_response(view(*args, **kwargs))
+                    if response.status_code != 200:
+                        return response
+                    if not response.is_streamed:
+                        headers = {h: response.headers[h] for h in CACHED_HEADERS if h in response.headers}
+                        response_cache.set(etag, response.get_data(), response.mimetype, headers)
+
+            response.set_etag(etag, weak=True)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
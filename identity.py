@@ -0,0 +1,112 @@
+import threading
+import time
+from collections import OrderedDict
+from http_cache import table_versions
+from models import db, User
+
+# Tamaño y vigencia (segundos) por defecto de la caché de usuarios por proceso
+USER_CACHE_SIZE = 1024
+USER_CACHE_TTL = 60
+# Cada cuántos segundos se compara la caché con la versión compartida de la tabla user
+USER_CACHE_CHECK_INTERVAL = 1
+
+
+class CachedUser:
+    """Datos del usuario autenticado que usan las rutas (sin el hash de la contraseña)"""
+
+    __slots__ = ('id', 'email', 'name', 'role', 'is_active', 'created_at')
+
+    def __init__(self, row):
+        for field in self.__slots__:
+            setattr(self, field, getattr(row, field))
+
+
+class UserCache:
+    """Caché LRU con vencimiento por tiempo, segura entre hilos.
+
+    Cada worker tiene su propia copia. Se vacía cuando cambia la versión
+    ``version:user`` que mantiene http_cache (la sube cada escritura sobre
+    usuarios), consultada como mucho cada ``check_interval`` segundos: los
+    cambios hechos en otro worker se ven tras ese intervalo, y ``ttl`` queda
+    como límite para los cambios que no pasan por la API.
+    """
+
+    def __init__(self, maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL, check_interval=USER_CACHE_CHECK_INTERVAL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.check_interval = check_interval
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+        self._checked_at = None
+
+    def needs_check(self):
+        with self._lock:
+            return self._checked_at is None or time.monotonic() - self._checked_at >= self.check_interval
+
+    def sync(self, version):
+        """Vaciar la caché si la versión compartida de los usuarios cambió"""
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+            self._checked_at = time.monotonic()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            expires_at, user = entry
+            if expires_at < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return user
+
+    def set(self, user_id, user):
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl, user)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def evict(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._version = None
+            self._checked_at = None
+
+
+user_cache = UserCache()
+
+
+def configure_user_cache(app):
+    user_cache.maxsize = app.config.get('USER_CACHE_SIZE', USER_CACHE_SIZE)
+    user_cache.ttl = app.config.get('USER_CACHE_TTL', USER_CACHE_TTL)
+    user_cache.check_interval = app.config.get('USER_CACHE_CHECK_INTERVAL', USER_CACHE_CHECK_INTERVAL)
+
+
+def load_user(user_id):
+    """Usuario por ID desde la caché, o desde la base de datos si no está, venció o cambió"""
+    if user_cache.needs_check():
+        user_cache.sync(table_versions(['user'])[0])
+    user = user_cache.get(user_id)
+    if user is not None:
+        return user
+
+    row = db.session.query(*[getattr(User, f) for f in CachedUser.__slots__]).filter(User.id == user_id).first()
+    if row is None:
+        return None
+    user = CachedUser(row)
+    user_cache.set(user_id, user)
+    return user
+
+
+def invalidate_user(user_id):
+    """Descartar el usuario de la caché tras modificarlo o eliminarlo"""
+    user_cache.evict(user_id)
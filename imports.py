@@ -0,0 +1,301 @@
+import csv
+import io
+import json
+import re
+from datetime import datetime
+from email_validator import validate_email, EmailNotValidError
+from sqlalchemy.exc import IntegrityError
+from models import db, Student, Course, Enrollment, Payment
+from rollups import record_payment_rows
+from final_grades import recompute_enrollment_rows
+from attendance_counters import recompute_attendance_counters
+from search import index_student_rows
+
+# Filas por lote (un commit por lote) y máximo de errores detallados en el reporte
+CHUNK_SIZE = 500
+MAX_REPORTED_ERRORS = 1000
+
+IMPORT_FORMATS = ('csv', 'ndjson')
+
+STUDENT_STATUSES = ('activo', 'inactivo', 'graduado')
+ENROLLMENT_STATUSES = ('activo', 'completado', 'cancelado')
+PAYMENT_TYPES = ('matricula', 'mensualidad', 'material', 'otro')
+PAYMENT_STATUSES = ('pendiente', 'pagado', 'cancelado')
+
+
+def detect_format(filename=None, content_type=None):
+    """Deducir el formato desde la extensión del archivo o el Content-Type"""
+    name = (filename or '').lower()
+    content_type = (content_type or '').lower()
+    if name.endswith('.csv') or 'csv' in content_type:
+        return 'csv'
+    if name.endswith(('.ndjson', '.jsonl')) or 'ndjson' in content_type or 'jsonl' in content_type:
+        return 'ndjson'
+    return None
+
+
+# Bytes que no son UTF-8 válido, conservados como sustitutos por surrogateescape
+_UNDECODABLE = re.compile('[\udc80-\udcff]')
+ENCODING_ERROR = 'La fila no es texto UTF-8 válido'
+
+
+def iter_records(stream, fmt):
+    """Leer registros uno a uno desde un stream binario (CSV con encabezado o NDJSON).
+
+    Las filas con bytes que no son UTF-8 se entregan como un ValueError, así
+    que se reportan como error de esa fila en lugar de cortar la importación.
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', errors='surrogateescape', newline='')
+    if fmt == 'csv':
+        for record in csv.DictReader(text):
+            if any(_UNDECODABLE.search(value) for value in record.values() if isinstance(value, str)):
+                yield ValueError(ENCODING_ERROR)
+                continue
+            yield {key.strip(): value for key, value in record.items() if key}
+        return
+
+    for line in text:
+        line = line.strip()
+        if not line:
+            continue
+        if _UNDECODABLE.search(line):
+            yield ValueError(ENCODING_ERROR)
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield ValueError('JSON inválido')
+            continue
+        yield record if isinstance(record, dict) else ValueError('Cada línea debe ser un objeto JSON')
+
+
+# ==================== VALIDACIÓN POR FILA ====================
+
+def _text(record, field, required=False, max_length=None):
+    value = record.get(field)
+    if isinstance(value, str):
+        value = value.strip()
+    if value in (None, ''):
+        if required:
+            raise ValueError(f'El campo {field} es requerido')
+        return None
+    value = str(value)
+    if max_length and len(value) > max_length:
+        raise ValueError(f'El campo {field} excede {max_length} caracteres')
+    return value
+
+
+def _choice(record, field, choices, default):
+    value = _text(record, field) or default
+    if value not in choices:
+        raise ValueError(f'Valor inválido para {field}: {value}')
+    return value
+
+
+def _integer(record, field):
+    value = _text(record, field, required=True)
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f'El campo {field} debe ser un entero')
+
+
+def _date(record, field, with_time=False):
+    value = _text(record, field)
+    if value is None:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'El campo {field} debe tener formato ISO 8601')
+    return parsed if with_time else parsed.date()
+
+
+def parse_student(record):
+    try:
+        email = validate_email(_text(record, 'email', required=True), check_deliverability=False).normalized
+    except EmailNotValidError as e:
+        raise ValueError(f'Email inválido: {e}')
+    return {
+        'name': _text(record, 'name', required=True, max_length=100),
+        'email': email,
+        'phone': _text(record, 'phone', max_length=20),
+        'parent_phone': _text(record, 'parent_phone', max_length=20),
+        'address': _text(record, 'address'),
+        'birth_date': _date(record, 'birth_date'),
+        'status': _choice(record, 'status', STUDENT_STATUSES, 'activo'),
+        'notes': _text(record, 'notes')
+    }
+
+
+def parse_enrollment(record):
+    return {
+        'student_id': _integer(record, 'student_id'),
+        'course_id': _integer(record, 'course_id'),
+        'enrollment_date': _date(record, 'enrollment_date', with_time=True) or datetime.utcnow(),
+        'status': _choice(record, 'status', ENROLLMENT_STATUSES, 'activo'),
+        'notes': _text(record, 'notes')
+    }
+
+
+def parse_payment(record):
+    try:
+        amount = float(_text(record, 'amount', required=True))
+    except ValueError:
+        raise ValueError('El campo amount debe ser numérico')
+    return {
+        'student_id': _integer(record, 'student_id'),
+        'amount': amount,
+        'type': _choice(record, 'type', PAYMENT_TYPES, None),
+        'description': _text(record, 'description', max_length=200),
+        'date': _date(record, 'date', with_time=True) or datetime.utcnow(),
+        'status': _choice(record, 'status', PAYMENT_STATUSES, 'pendiente'),
+        'payment_method': _text(record, 'payment_method', max_length=50),
+        'reference': _text(record, 'reference', max_length=100)
+    }
+
+
+# ==================== VALIDACIÓN POR LOTE ====================
+
+def _existing_ids(model, ids):
+    return {id_ for (id_,) in db.session.query(model.id).filter(model.id.in_(ids))}
+
+
+def _email_key(email):
+    return email.strip().lower()
+
+
+def check_students(chunk):
+    """Descartar emails ya registrados (una consulta por lote) o repetidos en el lote.
+
+    La comparación ignora mayúsculas y espacios en ambos lados (usa ix_student_email_normalized).
+    """
+    stored = db.func.lower(db.func.trim(Student.email))
+    registered = {email for (email,) in db.session.query(stored).filter(
+        stored.in_({_email_key(row['email']) for _, row in chunk}))}
+    for _, row in chunk:
+        key = _email_key(row['email'])
+        if key in registered:
+            yield 'El email ya está registrado'
+        else:
+            registered.add(key)
+            yield None
+
+
+def check_student_references(chunk):
+    students = _existing_ids(Student, {row['student_id'] for _, row in chunk})
+    for _, row in chunk:
+        yield None if row['student_id'] in students else 'Estudiante no encontrado'
+
+
+def check_enrollments(chunk):
+    students = _existing_ids(Student, {row['student_id'] for _, row in chunk})
+    courses = _existing_ids(Course, {row['course_id'] for _, row in chunk})
+    for _, row in chunk:
+        if row['student_id'] not in students:
+            yield 'Estudiante no encontrado'
+        elif row['course_id'] not in courses:
+            yield 'Curso no encontrado'
+        else:
+            yield None
+
+
+def initialize_enrollments(rows):
+    """Acción tras importar matrículas: acumulados de calificaciones y contadores de asistencia existentes"""
+    recompute_enrollment_rows(rows)
+    recompute_attendance_counters(Enrollment.student_id.in_({row['student_id'] for row in rows}))
+
+
+# Entidad importable: (modelo, validación por fila, validación por lote, acción tras insertar)
+IMPORTERS = {
+    'students': (Student, parse_student, check_students, index_student_rows),
+    'enrollments': (Enrollment, parse_enrollment, check_enrollments, initialize_enrollments),
+    'payments': (Payment, parse_payment, check_student_references, record_payment_rows),
+}
+
+
+class ImportReport:
+    """Resultado de una importación con errores por fila (acotados a MAX_REPORTED_ERRORS)"""
+
+    def __init__(self, entity):
+        self.entity = entity
+        self.processed = 0
+        self.inserted = 0
+        self.error_count = 0
+        self.errors = []
+
+    def add_error(self, row_number, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': row_number, 'error': message})
+
+    def to_dict(self):
+        return {
+            'entity': self.entity,
+            'processed': self.processed,
+            'inserted': self.inserted,
+            'error_count': self.error_count,
+            'errors': sorted(self.errors, key=lambda e: e['row']),
+            'errors_truncated': self.error_count > len(self.errors)
+        }
+
+
+def import_records(entity, records, chunk_size=CHUNK_SIZE):
+    """Validar e insertar registros por lotes, con un commit por lote.
+
+    ``records`` es un iterable (normalmente iter_records) que se consume en
+    lotes, así que la memoria no depende del tamaño del archivo.
+    """
+    model, parse_row, check_chunk, after_insert = IMPORTERS[entity]
+    report = ImportReport(entity)
+
+    def insert_rows(valid):
+        """Insertar el lote en un savepoint; si otra escritura concurrente provoca un
+        conflicto, reintentar fila por fila y reportar solo las que chocan."""
+        try:
+            with db.session.begin_nested():
+                db.session.execute(model.__table__.insert(), [row for _, row in valid])
+            return [row for _, row in valid]
+        except IntegrityError:
+            pass
+        inserted = []
+        for row_number, row in valid:
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(model.__table__.insert(), [row])
+            except IntegrityError:
+                report.add_error(row_number, 'La fila entra en conflicto con un registro existente')
+            else:
+                inserted.append(row)
+        return inserted
+
+    def flush(chunk):
+        valid = []
+        for (row_number, row), error in zip(chunk, check_chunk(chunk)):
+            if error:
+                report.add_error(row_number, error)
+            else:
+                valid.append((row_number, row))
+        inserted = insert_rows(valid) if valid else []
+        if inserted and after_insert:
+            after_insert(inserted)
+        db.session.commit()
+        report.inserted += len(inserted)
+
+    chunk = []
+    for row_number, record in enumerate(records, start=1):
+        report.processed += 1
+        try:
+            if isinstance(record, Exception):
+                raise record
+            chunk.append((row_number, parse_row(record)))
+        except ValueError as e:
+            report.add_error(row_number, str(e))
+            continue
+        if len(chunk) >= chunk_size:
+            flush(chunk)
+            chunk = []
+    if chunk:
+        flush(chunk)
+
+    return report
@@ -0,0 +1,281 @@
+import json
+import logging
+import smtplib
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+from flask import current_app
+from flask_mail import Message, BadHeaderError
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+from models import db, Job, Notification
+from extensions import mail
+from events import prune_events
+
+# Filas por INSERT (executemany) al repartir emails y notificaciones
+JOB_INSERT_CHUNK = 1000
+
+# Cada cuántos segundos el worker retoma trabajos abandonados y borra los trabajos terminados
+# y los eventos del dashboard vencidos (haya o no streams SSE abiertos)
+JOB_MAINTENANCE_INTERVAL = 60
+
+logger = logging.getLogger(__name__)
+
+ClaimedJob = namedtuple('ClaimedJob', 'id type payload attempts')
+
+
+def enqueue(job_type, payload, unique=False):
+    """Agregar un trabajo a la cola en la transacción actual; se ejecuta solo si la escritura se confirma.
+
+    Con ``unique`` no se agrega otro si ya hay uno del mismo tipo sin
+    terminar, y se devuelve ese.
+    """
+    if unique:
+        existing = Job.query.filter(Job.type == job_type, Job.status.in_(('pendiente', 'en_proceso'))).first()
+        if existing:
+            return existing
+    job = Job(type=job_type, payload=json.dumps(payload, ensure_ascii=False))
+    db.session.add(job)
+    db.session.flush()
+    return job
+
+
+def enqueue_emails(messages):
+    """Encolar emails ``{'to', 'subject', 'body'}`` con inserciones masivas; devuelve cuántos"""
+    now = datetime.utcnow()
+    return _insert(Job, ({
+        'type': 'email',
+        'payload': json.dumps(message, ensure_ascii=False),
+        'status': 'pendiente',
+        'attempts': 0,
+        'run_at': now,
+        'created_at': now
+    } for message in messages if message['to']))
+
+
+def notify_users(user_ids, title, message, notification_type='info'):
+    """Crear la misma notificación para varios usuarios con inserciones masivas"""
+    now = datetime.utcnow()
+    return _insert(Notification, ({
+        'user_id': user_id,
+        'title': title[:100],
+        'message': message,
+        'type': notification_type,
+        'is_read': False,
+        'created_at': now
+    } for user_id in user_ids))
+
+
+def _insert(model, rows):
+    count = 0
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= JOB_INSERT_CHUNK:
+            db.session.execute(model.__table__.insert(), chunk)
+            count += len(chunk)
+            chunk = []
+    if chunk:
+        db.session.execute(model.__table__.insert(), chunk)
+        count += len(chunk)
+    return count
+
+
+def job_dict(job):
+    return {
+        'id': job.id,
+        'type': job.type,
+        'status': job.status,
+        'attempts': job.attempts,
+        'run_at': job.run_at.isoformat() if job.run_at else None,
+        'last_error': job.last_error,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None
+    }
+
+
+def claim_jobs(types, limit):
+    """Tomar hasta ``limit`` trabajos pendientes de ``types`` y confirmarlos como en_proceso.
+
+    En PostgreSQL los workers concurrentes se saltan las filas que otro ya
+    está tomando (SKIP LOCKED); en SQLite el UPDATE ya es atómico.
+    """
+    now = datetime.utcnow()
+    table = Job.__table__
+    candidates = select(table.c.id).where(
+        table.c.status == 'pendiente', table.c.type.in_(types), table.c.run_at <= now
+    ).order_by(table.c.run_at, table.c.id).limit(limit).with_for_update(skip_locked=True)
+    rows = db.session.execute(
+        table.update().where(table.c.id.in_(candidates.scalar_subquery())).values(
+            status='en_proceso', locked_at=now, attempts=table.c.attempts + 1
+        ).returning(table.c.id, table.c.type, table.c.payload, table.c.attempts)
+    ).all()
+    db.session.commit()
+    return sorted((ClaimedJob(row.id, row.type, json.loads(row.payload), row.attempts) for row in rows),
+                  key=lambda job: job.id)
+
+
+def complete_jobs(ids):
+    if ids:
+        db.session.execute(Job.__table__.update().where(Job.__table__.c.id.in_(ids)).values(
+            status='completado', finished_at=datetime.utcnow(), last_error=None))
+
+
+def retry_jobs(failures):
+    """Reprogramar trabajos fallidos ``[(job, error, permanente)]`` con espera exponencial.
+
+    Tras JOB_MAX_ATTEMPTS intentos, o si el error es permanente, quedan como fallido.
+    """
+    if not failures:
+        return
+    config = current_app.config
+    now = datetime.utcnow()
+    table = Job.__table__
+    for job, error, permanent in failures:
+        values = {'last_error': str(error)[:1000]}
+        if permanent or job.attempts >= config['JOB_MAX_ATTEMPTS']:
+            values.update(status='fallido', finished_at=now)
+            logger.warning('Trabajo fallido', extra={'job_id': job.id, 'job_type': job.type, 'error': str(error)})
+        else:
+            delay = config['JOB_RETRY_DELAY'] * 2 ** (job.attempts - 1)
+            values.update(status='pendiente', run_at=now + timedelta(seconds=delay))
+        db.session.execute(table.update().where(table.c.id == job.id).values(**values))
+
+
+def release_stale_jobs():
+    """Devolver a la cola los trabajos en_proceso de un worker que murió sin terminarlos"""
+    cutoff = datetime.utcnow() - timedelta(seconds=current_app.config['JOB_LOCK_TIMEOUT'])
+    released = Job.query.filter(Job.status == 'en_proceso', Job.locked_at < cutoff).update(
+        {'status': 'pendiente'}, synchronize_session=False)
+    db.session.commit()
+    return released
+
+
+def prune_jobs():
+    """Borrar los trabajos terminados hace más de JOB_RETENTION_DAYS días"""
+    cutoff = datetime.utcnow() - timedelta(days=current_app.config['JOB_RETENTION_DAYS'])
+    deleted = Job.query.filter(Job.status.in_(('completado', 'fallido')), Job.finished_at < cutoff).delete(
+        synchronize_session=False)
+    db.session.commit()
+    return deleted
+
+
+def run_job(job):
+    """Ejecutar un trabajo de reparto; lo que inserte se confirma junto con el trabajo completado"""
+    from notifications import JOB_HANDLERS
+    try:
+        JOB_HANDLERS[job.type](job.payload)
+        complete_jobs([job.id])
+        db.session.commit()
+        return True
+    except Exception as e:
+        db.session.rollback()
+        logger.exception('Error en el trabajo', extra={'job_id': job.id, 'job_type': job.type})
+        retry_jobs([(job, e, False)])
+        db.session.commit()
+        return False
+
+
+def _message(job):
+    return Message(subject=job.payload['subject'], recipients=job.payload['to'], body=job.payload['body'])
+
+
+def _send_batch(connection, jobs):
+    """Enviar un lote por una conexión abierta y guardar el resultado de cada email.
+
+    Los rechazos de un destinatario o mensaje fallan solo ese email; si se
+    pierde la conexión, los que faltan se reintentan. Devuelve (enviados,
+    fallidos, error de conexión o None).
+    """
+    sent, failures = [], []
+    error = None
+    for index, job in enumerate(jobs):
+        try:
+            connection.send(_message(job))
+            sent.append(job.id)
+        except smtplib.SMTPRecipientsRefused as e:
+            failures.append((job, e, True))
+        except smtplib.SMTPResponseException as e:
+            # 5xx es un rechazo definitivo; 4xx, temporal
+            failures.append((job, e, e.smtp_code >= 500))
+        except (BadHeaderError, KeyError) as e:
+            failures.append((job, e, True))
+        except (smtplib.SMTPException, OSError) as e:
+            error = e
+            failures.extend((pending, e, False) for pending in jobs[index:])
+            break
+    complete_jobs(sent)
+    retry_jobs(failures)
+    db.session.commit()
+    return len(sent), len(failures), error
+
+
+def send_pending_emails(batch_size):
+    """Enviar los emails pendientes por lotes, reutilizando una conexión SMTP mientras haya trabajo"""
+    jobs = claim_jobs(('email',), batch_size)
+    sent = failed = 0
+    if not jobs:
+        return sent, failed
+    try:
+        with mail.connect() as connection:
+            while jobs:
+                batch_sent, batch_failed, error = _send_batch(connection, jobs)
+                sent += batch_sent
+                failed += batch_failed
+                if error:
+                    jobs = []
+                    raise error
+                jobs = claim_jobs(('email',), batch_size)
+    except (smtplib.SMTPException, OSError) as e:
+        if jobs:
+            # No se pudo abrir la conexión: el lote tomado vuelve a la cola con espera
+            retry_jobs([(job, e, False) for job in jobs])
+            db.session.commit()
+            failed += len(jobs)
+        logger.warning('Error de conexión SMTP', extra={'error': str(e)})
+    return sent, failed
+
+
+def run_pending_jobs(batch_size):
+    """Ejecutar los repartos pendientes y luego enviar los emails; devuelve los totales"""
+    from notifications import JOB_HANDLERS
+    totals = {'jobs': 0, 'emails_sent': 0, 'emails_failed': 0}
+    while True:
+        claimed = claim_jobs(tuple(JOB_HANDLERS), 1)
+        if not claimed:
+            break
+        run_job(claimed[0])
+        totals['jobs'] += 1
+    totals['emails_sent'], totals['emails_failed'] = send_pending_emails(batch_size)
+    return totals
+
+
+def run_worker(once=False, progress=None):
+    """Procesar la cola hasta que se detenga el proceso (o hasta vaciarla con ``once``).
+
+    ``progress`` recibe los totales de cada vuelta que hizo algún trabajo.
+    """
+    config = current_app.config
+    last_maintenance = 0
+    while True:
+        try:
+            if time.monotonic() - last_maintenance > JOB_MAINTENANCE_INTERVAL:
+                last_maintenance = time.monotonic()
+                release_stale_jobs()
+                prune_jobs()
+                prune_events(config['SSE_EVENT_RETENTION'])
+            totals = run_pending_jobs(config['JOB_BATCH_SIZE'])
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            logger.warning('No se pudo leer la cola de trabajos', extra={'error': str(e)})
+            totals = None
+        finally:
+            db.session.remove()
+        if totals and any(totals.values()) and progress:
+            progress(totals)
+        if totals and (totals['jobs'] or totals['emails_sent']):
+            continue
+        # Cola vacía, o solo fallos (ej. servidor SMTP caído): esperar antes de volver a intentar
+        if once:
+            return
+        time.sleep(config['JOB_POLL_INTERVAL'])
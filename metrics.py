@@ -0,0 +1,380 @@
+import atexit
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import tempfile
+import threading
+import time
+import uuid
+from flask import g, request, has_request_context, Response
+from sqlalchemy import event
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos
+    fcntl = None
+
+# Límites de los histogramas
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+STATEMENT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+# Segundos entre escrituras del snapshot de cada worker
+METRICS_FLUSH_INTERVAL = 5
+
+# Snapshot con la suma de los procesos terminados y archivo de bloqueo para actualizarlo
+CUMULATIVE_FILE = 'cumulative.json'
+LOCK_FILE = '.lock'
+WORKER_FILE_PATTERN = re.compile(r'^worker-(\d+)-[0-9a-f]+\.json$')
+
+PROFILE_HEADER = 'X-Profile'
+PROFILE_LINES = 40
+
+# (tipo, descripción) de cada métrica expuesta en /api/metrics
+METRICS = {
+    'http_requests_total': ('counter', 'Peticiones atendidas por endpoint, método y código de estado'),
+    'http_request_duration_seconds': ('histogram', 'Latencia de las peticiones por endpoint'),
+    'http_response_size_bytes': ('histogram', 'Tamaño de las respuestas (sin contar las transmitidas) por endpoint'),
+    'db_statements_per_request': ('histogram', 'Sentencias SQL ejecutadas por petición'),
+    'db_statements_total': ('counter', 'Sentencias SQL ejecutadas por endpoint'),
+    'db_statement_seconds_total': ('counter', 'Tiempo total en sentencias SQL por endpoint'),
+    'db_pool_wait_seconds': ('histogram', 'Espera por una conexión del pool (incluye abrirla)'),
+    'db_pool_timeouts_total': ('counter', 'Checkouts que agotaron DB_POOL_TIMEOUT'),
+    'db_reads_routed_total': ('counter', 'Peticiones de solo lectura por destino (réplica o primario y motivo)'),
+}
+
+
+class MetricsRegistry:
+    """Contadores e histogramas del proceso, indexados por (métrica, etiquetas)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    def inc(self, name, labels, value=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, labels, value, buckets):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = {
+                    'buckets': list(buckets), 'counts': [0] * len(buckets), 'sum': 0, 'count': 0}
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    histogram['counts'][i] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counters': [[name, list(labels), value] for (name, labels), value in self.counters.items()],
+                'histograms': [[name, list(labels), dict(h, counts=list(h['counts']))]
+                               for (name, labels), h in self.histograms.items()]
+            }
+
+
+registry = MetricsRegistry()
+snapshot_writer = None
+
+
+class SnapshotWriter:
+    """Escribe el snapshot del worker en METRICS_DIR para sumarlo entre workers de gunicorn.
+
+    Cada proceso usa su propio archivo, y solo si atendió alguna petición.
+    Los de procesos terminados se suman a cumulative.json y se borran
+    (compact), así los contadores nunca retroceden y el directorio no crece
+    con cada worker reciclado o comando de flask.
+    """
+
+    def __init__(self, directory, interval=METRICS_FLUSH_INTERVAL):
+        self.directory = directory
+        self.interval = interval
+        self.path = os.path.join(directory, f'worker-{os.getpid()}-{uuid.uuid4().hex[:8]}.json')
+        self._stopped = threading.Event()
+        os.makedirs(directory, exist_ok=True)
+
+    def flush(self):
+        snapshot = registry.snapshot()
+        if not snapshot['counters'] and not snapshot['histograms'] and not os.path.exists(self.path):
+            return
+        _write_json(self.path, snapshot)
+
+    def start(self):
+        def loop():
+            while not self._stopped.wait(self.interval):
+                try:
+                    self.flush()
+                except OSError:
+                    pass
+        threading.Thread(target=loop, name='metrics-flush', daemon=True).start()
+        atexit.register(self.flush)
+        try:
+            compact(self.directory, self.interval)
+        except OSError:
+            pass
+
+    def stop(self):
+        self._stopped.set()
+        atexit.unregister(self.flush)
+        self.flush()
+
+
+def _write_json(path, data):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+class _DirectoryLock:
+    """Bloqueo entre procesos (flock) sobre METRICS_DIR; compartido para leer, exclusivo para compactar"""
+
+    def __init__(self, directory, exclusive):
+        self.path = os.path.join(directory, LOCK_FILE)
+        self.exclusive = exclusive
+        self.file = None
+
+    def __enter__(self):
+        if fcntl is not None:
+            self.file = open(self.path, 'a')
+            fcntl.flock(self.file, fcntl.LOCK_EX if self.exclusive else fcntl.LOCK_SH)
+        return self
+
+    def __exit__(self, *exc):
+        if self.file is not None:
+            self.file.close()
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _load_snapshot(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _load_snapshots(directory):
+    for name in os.listdir(directory):
+        if not name.endswith('.json'):
+            continue
+        snapshot = _load_snapshot(os.path.join(directory, name))
+        if snapshot is not None:
+            yield snapshot
+
+
+def _sum_snapshots(snapshots):
+    counters = {}
+    histograms = {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot['counters']:
+            key = (name, tuple(tuple(l) for l in labels))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, h in snapshot['histograms']:
+            key = (name, tuple(tuple(l) for l in labels))
+            total = histograms.get(key)
+            if total is None:
+                histograms[key] = dict(h, counts=list(h['counts']))
+                continue
+            total['counts'] = [a + b for a, b in zip(total['counts'], h['counts'])]
+            total['sum'] += h['sum']
+            total['count'] += h['count']
+    return counters, histograms
+
+
+def compact(directory, stale_after=METRICS_FLUSH_INTERVAL):
+    """Sumar en cumulative.json los snapshots de procesos terminados y borrarlos; devuelve cuántos.
+
+    Un archivo es de un proceso terminado si su PID ya no existe y no se
+    escribió en los últimos ``3 * stale_after`` segundos (un worker vivo de
+    otro contenedor con el mismo directorio lo sigue actualizando). Los
+    nombres sumados quedan en ``merged``: si el proceso se interrumpe antes
+    de borrarlos, la siguiente compactación los borra sin volver a sumarlos.
+    """
+    cumulative_path = os.path.join(directory, CUMULATIVE_FILE)
+    with _DirectoryLock(directory, exclusive=True):
+        now = time.time()
+        dead = []
+        for name in os.listdir(directory):
+            match = WORKER_FILE_PATTERN.match(name)
+            if not match or _pid_alive(int(match.group(1))):
+                continue
+            try:
+                if now - os.path.getmtime(os.path.join(directory, name)) < 3 * stale_after:
+                    continue
+            except OSError:
+                continue
+            dead.append(name)
+        if not dead:
+            return 0
+
+        cumulative = _load_snapshot(cumulative_path) or {'counters': [], 'histograms': [], 'merged': []}
+        merged = set(cumulative.get('merged', ()))
+        snapshots = [cumulative]
+        for name in dead:
+            if name not in merged:
+                snapshot = _load_snapshot(os.path.join(directory, name))
+                if snapshot is not None:
+                    snapshots.append(snapshot)
+        counters, histograms = _sum_snapshots(snapshots)
+        _write_json(cumulative_path, {
+            'counters': [[name, labels, value] for (name, labels), value in counters.items()],
+            'histograms': [[name, labels, h] for (name, labels), h in histograms.items()],
+            'merged': dead
+        })
+        for name in dead:
+            try:
+                os.remove(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
+        return len(snapshots) - 1
+
+
+def aggregate(directory):
+    """Sumar los snapshots de todos los workers y el acumulado de los terminados"""
+    with _DirectoryLock(directory, exclusive=False):
+        return _sum_snapshots(_load_snapshots(directory))
+
+
+def _labels(labels, extra=()):
+    items = list(labels) + list(extra)
+    if not items:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in items)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(items, escaped)) + '}'
+
+
+def render_prometheus(counters, histograms):
+    """Formato de texto de Prometheus (versión 0.0.4)"""
+    lines = []
+    for name, (kind, description) in METRICS.items():
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} {kind}')
+        if kind == 'counter':
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f'{name}{_labels(labels)} {value}')
+            continue
+        for (metric, labels), h in sorted(histograms.items()):
+            if metric != name:
+                continue
+            for bound, count in zip(h['buckets'], h['counts']):
+                lines.append(f'{name}_bucket{_labels(labels, [("le", bound)])} {count}')
+            lines.append(f'{name}_bucket{_labels(labels, [("le", "+Inf")])} {h["count"]}')
+            lines.append(f'{name}_sum{_labels(labels)} {h["sum"]}')
+            lines.append(f'{name}_count{_labels(labels)} {h["count"]}')
+    return '\n'.join(lines) + '\n'
+
+
+class RequestStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.statements = 0
+        self.statement_seconds = 0.0
+
+
+def _record(stats, endpoint, method, status, size):
+    labels = {'endpoint': endpoint}
+    registry.inc('http_requests_total', {'endpoint': endpoint, 'method': method, 'status': str(status)})
+    registry.observe('http_request_duration_seconds', labels, time.perf_counter() - stats.started, LATENCY_BUCKETS)
+    if size is not None:
+        registry.observe('http_response_size_bytes', labels, size, SIZE_BUCKETS)
+    registry.observe('db_statements_per_request', labels, stats.statements, STATEMENT_BUCKETS)
+    registry.inc('db_statements_total', labels, stats.statements)
+    registry.inc('db_statement_seconds_total', labels, stats.statement_seconds)
+
+
+def _profile_response(profiler, response):
+    output = io.StringIO()
+    pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(PROFILE_LINES)
+    profiled = Response(output.getvalue(), mimetype='text/plain')
+    profiled.headers['X-Profile-Status'] = str(response.status_code)
+    return profiled
+
+
+def init_metrics(app, db):
+    """Instrumentar peticiones y sentencias SQL, y publicar el snapshot del worker"""
+    global snapshot_writer
+    directory = app.config.get('METRICS_DIR') or os.path.join(tempfile.gettempdir(), 'crm_metrics')
+    interval = app.config.get('METRICS_FLUSH_INTERVAL', METRICS_FLUSH_INTERVAL)
+    # Un solo archivo e hilo por proceso aunque create_app se llame varias veces
+    writer = snapshot_writer
+    if writer is None or (writer.directory, writer.interval) != (directory, interval):
+        if writer is not None:
+            writer.stop()
+        writer = SnapshotWriter(directory, interval)
+        writer.start()
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context.query_started = time.perf_counter()
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        stats = g.get('request_stats') if has_request_context() else None
+        if stats is not None:
+            stats.statements += 1
+            started = getattr(context, 'query_started', None)
+            if started is not None:
+                stats.statement_seconds += time.perf_counter() - started
+
+    # Primaria y réplicas: las lecturas desviadas a una réplica también cuentan
+    with app.app_context():
+        engines = list(db.engines.values())
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', after_cursor_execute)
+
+    @app.before_request
+    def start_request_metrics():
+        g.request_stats = RequestStats()
+        token = app.config.get('PROFILE_TOKEN')
+        if token and request.headers.get(PROFILE_HEADER) == token:
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+
+    @app.after_request
+    def finish_request_metrics(response):
+        profiler = g.pop('profiler', None)
+        if profiler:
+            profiler.disable()
+            response = _profile_response(profiler, response)
+
+        stats = g.get('request_stats')
+        if stats is None:
+            return response
+        endpoint = request.endpoint or 'not_found'
+        method = request.method
+        size = None if response.is_streamed else response.calculate_content_length()
+        status = response.status_code
+        # Las respuestas transmitidas siguen ejecutando SQL tras after_request: se registran al cerrar
+        response.call_on_close(lambda: _record(stats, endpoint, method, status, size))
+        return response
+
+    snapshot_writer = writer
+    return writer
+
+
+def prometheus_text():
+    """Métricas de todos los workers (incluido el actual, recién escrito) en formato Prometheus"""
+    snapshot_writer.flush()
+    compact(snapshot_writer.directory, snapshot_writer.interval)
+    counters, histograms = aggregate(snapshot_writer.directory)
+    return render_prometheus(counters, histograms)
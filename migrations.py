@@ -0,0 +1,221 @@
+from datetime import datetime
+from sqlalchemy import inspect, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from sqlalchemy.schema import CreateIndex
+from models import db, SchemaVersion, Student, Class, Enrollment, Payment, Attendance, Grade, Notification, Job
+
+
+def _index(name):
+    """Índice declarado en models.py por nombre"""
+    for table in db.metadata.tables.values():
+        for index in table.indexes:
+            if index.name == name:
+                return index
+    raise KeyError(name)
+
+
+def _create_index(conn, name):
+    """Crear un índice declarado en los modelos si aún no existe.
+
+    Usa IF NOT EXISTS en lugar de checkfirst porque la reflexión de SQLite
+    no ve los índices sobre expresiones (y avisa al encontrarlos).
+    """
+    conn.execute(CreateIndex(_index(name), if_not_exists=True))
+
+
+def create_indexes(*names):
+    """Migración que crea índices declarados en los modelos si aún no existen"""
+    def migrate(conn):
+        for name in names:
+            _create_index(conn, name)
+    return migrate
+
+
+def deduplicate_attendance(conn):
+    """Conservar solo el último registro por (estudiante, clase, fecha) y crear el índice único"""
+    table = Attendance.__table__
+    latest = select(db.func.max(table.c.id)).group_by(table.c.student_id, table.c.class_id, table.c.date)
+    conn.execute(table.delete().where(table.c.id.not_in(latest.scalar_subquery())))
+    _create_index(conn, 'uq_attendance_student_class_date')
+
+
+def add_columns(table_name, *names):
+    """Migración que agrega columnas declaradas en los modelos si aún no existen"""
+    def migrate(conn):
+        table = db.metadata.tables[table_name]
+        existing = {column['name'] for column in inspect(conn).get_columns(table_name)}
+        for name in names:
+            if name in existing:
+                continue
+            column = table.c[name]
+            ddl = f'ALTER TABLE {table_name} ADD COLUMN {name} {column.type.compile(conn.dialect)}'
+            if column.server_default is not None:
+                ddl += f' DEFAULT {column.server_default.arg}'
+            if not column.nullable:
+                ddl += ' NOT NULL'
+            conn.exec_driver_sql(ddl)
+    return migrate
+
+
+def enrollment_grade_totals(conn):
+    """Acumulados de calificaciones en la matrícula, calculados desde las calificaciones existentes"""
+    from final_grades import final_grade_update
+    add_columns('enrollment', 'grade_weighted_sum', 'grade_weight_total')(conn)
+    _create_index(conn, 'ix_enrollment_student_course')
+    conn.execute(final_grade_update())
+
+
+def attendance_counters(conn):
+    """Contadores de asistencia por estudiante y matrícula, calculados desde Attendance"""
+    from attendance_counters import COUNTER_COLUMNS, student_counter_updates, enrollment_counter_updates
+    columns = [*COUNTER_COLUMNS.values(), 'attendance_total', 'attendance_rate']
+    add_columns('student', *columns)(conn)
+    add_columns('enrollment', *columns)(conn)
+    _create_index(conn, 'ix_student_attendance_rate')
+    _create_index(conn, 'ix_enrollment_course_attendance_rate')
+    for statement in student_counter_updates() + enrollment_counter_updates():
+        conn.execute(statement)
+
+
+def student_search_index(conn):
+    """Índice de búsqueda de estudiantes (FTS5 en SQLite, trigramas en PostgreSQL)"""
+    from search import create_search_index
+    create_search_index(conn)
+
+
+def student_search_unaccent(conn):
+    """Búsqueda sin distinguir acentos también en PostgreSQL (SQLite ya los ignora)"""
+    from search import unaccent_search_index
+    unaccent_search_index(conn)
+
+
+def dashboard_rollups(conn):
+    """Poblar las tablas de resumen y los contadores por estado del dashboard desde los datos existentes"""
+    from rollups import rebuild_rollups
+    # La sesión se une a la transacción de la migración: su commit no la cierra
+    with Session(bind=conn) as session:
+        rebuild_rollups(session)
+
+
+# Migraciones en orden: (versión, descripción, función que recibe la conexión)
+MIGRATIONS = [
+    (1, 'Índices compuestos para las consultas frecuentes', create_indexes(
+        'ix_payment_status_date',
+        'ix_payment_date',
+        'ix_attendance_student_status',
+        'ix_attendance_class_date',
+        'ix_grade_student_course',
+        'ix_enrollment_course_status',
+        'ix_enrollment_enrollment_date',
+        'ix_class_schedule',
+        'ix_notification_user_read'
+    )),
+    (2, 'Asistencia única por estudiante, clase y fecha', deduplicate_attendance),
+    (3, 'Nota final ponderada acumulada en la matrícula', enrollment_grade_totals),
+    (4, 'Contadores de asistencia por estudiante y matrícula', attendance_counters),
+    (5, 'Índice de búsqueda de estudiantes', student_search_index),
+    (6, 'Índice de emails de estudiantes normalizados', create_indexes('ix_student_email_normalized')),
+    (7, 'Búsqueda de estudiantes sin acentos en PostgreSQL', student_search_unaccent),
+    (8, 'Tablas de resumen del dashboard pobladas desde los datos existentes', dashboard_rollups),
+]
+
+
+def _applied_versions(conn):
+    return set(conn.execute(select(SchemaVersion.version)).scalars())
+
+
+def run_migrations():
+    """Aplicar las migraciones pendientes, cada una en su propia transacción.
+
+    Si otro proceso (ej. otro worker de gunicorn) aplica la misma versión al
+    mismo tiempo, el error se ignora una vez que la versión quedó registrada.
+    """
+    SchemaVersion.__table__.create(db.engine, checkfirst=True)
+    with db.engine.connect() as conn:
+        applied = _applied_versions(conn)
+
+    newly_applied = []
+    for version, description, migrate in MIGRATIONS:
+        if version in applied:
+            continue
+        try:
+            with db.engine.begin() as conn:
+                migrate(conn)
+                conn.execute(SchemaVersion.__table__.insert().values(
+                    version=version, description=description, applied_at=datetime.utcnow()))
+        except SQLAlchemyError:
+            with db.engine.connect() as conn:
+                if version not in _applied_versions(conn):
+                    raise
+            continue
+        newly_applied.append(version)
+    return newly_applied
+
+
+# Consultas principales de los reportes y el índice que deben usar
+HOT_QUERIES = [
+    ('Pagos pagados por rango de fechas', 'ix_payment_status_date',
+     select(Payment.type, db.func.sum(Payment.amount)).where(
+         Payment.status == 'pagado', Payment.date >= datetime(2024, 1, 1)).group_by(Payment.type)),
+    ('Asistencia presente por estudiante', 'ix_attendance_student_status',
+     select(db.func.count(Attendance.id)).where(
+         Attendance.student_id == 1, Attendance.status == 'presente')),
+    ('Asistencia por clase y fecha', 'ix_attendance_class_date',
+     select(Attendance.id, Attendance.status).where(
+         Attendance.class_id == 1, Attendance.date == datetime(2024, 1, 1).date())),
+    ('Calificaciones por estudiante y curso', 'ix_grade_student_course',
+     select(Grade.grade, Grade.weight).where(Grade.student_id == 1, Grade.course_id == 1)),
+    ('Matrículas activas por curso', 'ix_enrollment_course_status',
+     select(db.func.count(Enrollment.id)).where(
+         Enrollment.course_id == 1, Enrollment.status == 'activo')),
+    ('Matrículas de un estudiante en un curso', 'ix_enrollment_student_course',
+     select(Enrollment.id, Enrollment.final_grade).where(
+         Enrollment.student_id == 1, Enrollment.course_id == 1)),
+    ('Estudiantes por email normalizado', 'ix_student_email_normalized',
+     select(Student.id).where(db.func.lower(db.func.trim(Student.email)) == 'ana@example.com')),
+    ('Estudiantes bajo un porcentaje de asistencia', 'ix_student_attendance_rate',
+     select(Student.id, Student.name).where(Student.attendance_rate < 80)),
+    ('Matrículas de un curso bajo un porcentaje de asistencia', 'ix_enrollment_course_attendance_rate',
+     select(Enrollment.id, Enrollment.student_id).where(
+         Enrollment.course_id == 1, Enrollment.attendance_rate < 80)),
+    ('Clases por rango de horario', 'ix_class_schedule',
+     select(Class.id, Class.title).where(
+         Class.schedule >= datetime(2024, 1, 1), Class.schedule < datetime(2024, 1, 8))),
+    ('Notificaciones no leídas', 'ix_notification_user_read',
+     select(Notification.id, Notification.title).where(
+         Notification.user_id == 1, Notification.is_read.is_(False))),
+    ('Trabajos pendientes de la cola', 'ix_job_status_type_run_at',
+     select(Job.id).where(
+         Job.status == 'pendiente', Job.type == 'email', Job.run_at <= datetime(2024, 1, 1)
+     ).order_by(Job.run_at, Job.id).limit(50)),
+]
+
+
+def explain_hot_queries():
+    """Ejecutar EXPLAIN sobre HOT_QUERIES y verificar que cada una usa su índice.
+
+    En PostgreSQL se desactiva el seq scan durante la verificación para que
+    el planner no prefiera recorrer tablas pequeñas de desarrollo.
+    Devuelve una lista de (descripción, índice, usa_índice, plan).
+    """
+    results = []
+    with db.engine.connect() as conn:
+        is_postgres = conn.dialect.name == 'postgresql'
+        if is_postgres:
+            conn.exec_driver_sql('SET enable_seqscan = off')
+        try:
+            for description, index_name, query in HOT_QUERIES:
+                compiled = query.compile(dialect=conn.dialect)
+                params = compiled.params
+                if compiled.positional:
+                    params = tuple(params[name] for name in compiled.positiontup)
+
+                prefix = 'EXPLAIN' if is_postgres else 'EXPLAIN QUERY PLAN'
+                rows = conn.exec_driver_sql(f'{prefix} {compiled}', params).fetchall()
+                plan = '\n'.join(str(row[-1]) for row in rows)
+                results.append((description, index_name, index_name in plan, plan))
+        finally:
+            if is_postgres:
+                conn.exec_driver_sql('RESET enable_seqscan')
+    return results
@@ -1,7 +1,8 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+from replicas import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -27,12 +28,24 @@ class Student(db.Model):
     status = db.Column(db.String(20), default='activo')  # activo, inactivo, graduado
     enrollment_date = db.Column(db.DateTime, default=datetime.utcnow)
     notes = db.Column(db.Text)
+    # Contadores de asistencia, mantenidos por attendance_counters.py
+    attendance_present = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    attendance_absent = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    attendance_justified = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    attendance_late = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    attendance_total = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    attendance_rate = db.Column(db.Float)  # % de 'presente', nulo sin registros
     
     # Relaciones
     enrollments = db.relationship('Enrollment', backref='student', lazy=True)
     payments = db.relationship('Payment', backref='student', lazy=True)
     attendance = db.relationship('Attendance', backref='student', lazy=True)
     grades = db.relationship('Grade', backref='student', lazy=True)
+    
+    __table_args__ = (
+        db.Index('ix_student_attendance_rate', 'attendance_rate'),
+        db.Index('ix_student_email_normalized', db.func.lower(db.func.trim(email))),
+    )
 
 class Course(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -64,6 +77,10 @@ class Class(db.Model):
     
     # Relaciones
     attendance = db.relationship('Attendance', backref='class_session', lazy=True)
+    
+    __table_args__ = (
+        db.Index('ix_class_schedule', 'schedule'),
+    )
 
 class Enrollment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -71,8 +88,24 @@ class Enrollment(db.Model):
     course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=False)
     enrollment_date = db.Column(db.DateTime, default=datetime.utcnow)
     status = db.Column(db.String(20), default='activo')  # activo, completado, cancelado
-    final_grade = db.Column(db.Float)
+    final_grade = db.Column(db.Float)  # promedio ponderado, mantenido por final_grades.py
     notes = db.Column(db.Text)
+    grade_weighted_sum = db.Column(db.Float, nullable=False, default=0, server_default='0')  # Σ calificación × peso
+    grade_weight_total = db.Column(db.Float, nullable=False, default=0, server_default='0')  # Σ peso
+    # Asistencia a las clases del curso, mantenida por attendance_counters.py
+    attendance_present = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    attendance_absent = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    attendance_justified = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    attendance_late = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    attendance_total = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    attendance_rate = db.Column(db.Float)  # % de 'presente', nulo sin registros
+    
+    __table_args__ = (
+        db.Index('ix_enrollment_course_status', 'course_id', 'status'),
+        db.Index('ix_enrollment_enrollment_date', 'enrollment_date'),
+        db.Index('ix_enrollment_student_course', 'student_id', 'course_id'),
+        db.Index('ix_enrollment_course_attendance_rate', 'course_id', 'attendance_rate'),
+    )
 
 class Payment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -84,6 +117,11 @@ class Payment(db.Model):
     status = db.Column(db.String(20), default='pendiente')  # pendiente, pagado, cancelado
     payment_method = db.Column(db.String(50))  # efectivo, tarjeta, transferencia
     reference = db.Column(db.String(100))
+    
+    __table_args__ = (
+        db.Index('ix_payment_status_date', 'status', 'date'),
+        db.Index('ix_payment_date', 'date'),
+    )
 
 class Attendance(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -92,6 +130,12 @@ class Attendance(db.Model):
     date = db.Column(db.Date, nullable=False)
     status = db.Column(db.String(20), default='presente')  # presente, ausente, justificado, tardanza
     notes = db.Column(db.Text)
+    
+    __table_args__ = (
+        db.Index('ix_attendance_student_status', 'student_id', 'status'),
+        db.Index('ix_attendance_class_date', 'class_id', 'date'),
+        db.Index('uq_attendance_student_class_date', 'student_id', 'class_id', 'date', unique=True),
+    )
 
 class Grade(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -102,6 +146,10 @@ class Grade(db.Model):
     description = db.Column(db.String(200))
     date = db.Column(db.DateTime, default=datetime.utcnow)
     weight = db.Column(db.Float, default=1.0)  # peso de la calificación
+    
+    __table_args__ = (
+        db.Index('ix_grade_student_course', 'student_id', 'course_id'),
+    )
 
 class Notification(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -113,4 +161,85 @@ class Notification(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relación
-    user = db.relationship('User', backref='notifications') 
\ No newline at end of file
+    user = db.relationship('User', backref='notifications')
+    
+    __table_args__ = (
+        db.Index('ix_notification_user_read', 'user_id', 'is_read'),
+    ) 
+
+# ==================== TABLAS DE RESUMEN (ROLLUPS) ====================
+
+class AttendanceDailyRollup(db.Model):
+    """Conteo diario de asistencia por curso"""
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False)
+    course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=False)
+    total = db.Column(db.Integer, nullable=False, default=0)
+    present = db.Column(db.Integer, nullable=False, default=0)
+    absent = db.Column(db.Integer, nullable=False, default=0)
+    justified = db.Column(db.Integer, nullable=False, default=0)
+    late = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (db.UniqueConstraint('day', 'course_id'),)
+
+class IncomeDailyRollup(db.Model):
+    """Ingresos pagados por día y tipo de pago"""
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False)
+    type = db.Column(db.String(20), nullable=False)
+    amount = db.Column(db.Float, nullable=False, default=0)
+    payment_count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (db.UniqueConstraint('day', 'type'),)
+
+class RollupCounter(db.Model):
+    """Contadores globales (ej. asistencia histórica) leídos en O(1)"""
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.Float, nullable=False, default=0)
+
+
+# ==================== EVENTOS ====================
+
+class DashboardEvent(db.Model):
+    """Registro de cambios para los streams SSE del dashboard (ver events.py)"""
+    __tablename__ = 'dashboard_event'
+    id = db.Column(db.Integer, primary_key=True)  # id del evento SSE, siempre creciente
+    type = db.Column(db.String(20), nullable=False)  # payment, enrollment, attendance, class, stats, reset
+    data = db.Column(db.Text, nullable=False)  # JSON con el cambio
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_dashboard_event_created_at', 'created_at'),
+        # AUTOINCREMENT: SQLite no reutiliza ids aunque se borren los eventos más nuevos
+        {'sqlite_autoincrement': True},
+    )
+
+
+# ==================== COLA DE TRABAJOS ====================
+
+class Job(db.Model):
+    """Trabajo en segundo plano que ejecuta ``flask run-worker`` (ver jobs.py)"""
+    id = db.Column(db.Integer, primary_key=True)
+    type = db.Column(db.String(30), nullable=False)  # email, payment_reminders, class_cancelled
+    payload = db.Column(db.Text, nullable=False)  # JSON con los datos del trabajo
+    status = db.Column(db.String(20), nullable=False, default='pendiente')  # pendiente, en_proceso, completado, fallido
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # no antes de esta hora (reintentos)
+    locked_at = db.Column(db.DateTime)  # cuándo lo tomó un worker
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('ix_job_status_type_run_at', 'status', 'type', 'run_at'),
+    )
+
+
+# ==================== MIGRACIONES ====================
+
+class SchemaVersion(db.Model):
+    """Migraciones de esquema aplicadas (ver migrations.py)"""
+    __tablename__ = 'schema_version'
+    version = db.Column(db.Integer, primary_key=True)
+    description = db.Column(db.String(200), nullable=False)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
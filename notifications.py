@@ -0,0 +1,80 @@
+from itertools import groupby
+from models import db, User, Student, Course, Class, Enrollment, Payment
+from jobs import enqueue_emails, notify_users
+
+# Roles que reciben el resumen de cada envío masivo
+SUMMARY_ROLES = ('superadmin', 'admin')
+
+
+def _admin_ids():
+    return [id_ for (id_,) in db.session.query(User.id).filter(User.role.in_(SUMMARY_ROLES), User.is_active)]
+
+
+def _payment_line(payment):
+    description = payment.description or payment.type
+    return f'- {description}: ${payment.amount:.2f} (desde {payment.date:%d/%m/%Y})'
+
+
+def payment_reminders(payload):
+    """Reparto: un email por estudiante con todos sus pagos pendientes y un resumen para los administradores"""
+    rows = db.session.query(
+        Payment.student_id, Payment.amount, Payment.type, Payment.description, Payment.date,
+        Student.name, Student.email
+    ).join(Student, Student.id == Payment.student_id).filter(
+        Payment.status == 'pendiente'
+    ).order_by(Payment.student_id, Payment.date).all()
+
+    def messages():
+        for _, payments in groupby(rows, key=lambda row: row.student_id):
+            payments = list(payments)
+            student = payments[0]
+            total = sum(payment.amount for payment in payments)
+            yield {
+                'to': [student.email],
+                'subject': 'Recordatorio de pago pendiente',
+                'body': (f'Hola {student.name},\n\n'
+                         f'Tienes {len(payments)} pago(s) pendiente(s) por un total de ${total:.2f}:\n\n'
+                         + '\n'.join(_payment_line(payment) for payment in payments)
+                         + '\n\nSi ya realizaste el pago, ignora este mensaje.\n')
+            }
+
+    sent = enqueue_emails(messages())
+    notify_users(_admin_ids(), 'Recordatorios de pago enviados',
+                 f'Se enviaron recordatorios a {sent} estudiante(s) con pagos pendientes.')
+    return sent
+
+
+def class_cancelled(payload):
+    """Reparto: avisar a los estudiantes activos del curso y notificar al profesor de la clase"""
+    class_session = db.session.get(Class, payload['class_id'])
+    if class_session is None:
+        return 0
+    course_name = db.session.query(Course.name).filter(Course.id == class_session.course_id).scalar()
+    reason = payload.get('reason')
+    when = f'{class_session.schedule:%d/%m/%Y %H:%M}'
+
+    students = db.session.query(Student.name, Student.email).join(
+        Enrollment, Enrollment.student_id == Student.id
+    ).filter(
+        Enrollment.course_id == class_session.course_id,
+        Enrollment.status == 'activo'
+    ).all()
+    sent = enqueue_emails({
+        'to': [student.email],
+        'subject': f'Clase cancelada: {course_name}',
+        'body': (f'Hola {student.name},\n\n'
+                 f'La clase "{class_session.title}" de {course_name} del {when} fue cancelada.\n'
+                 + (f'\nMotivo: {reason}\n' if reason else ''))
+    } for student in students)
+
+    notify_users([class_session.teacher_id], 'Clase cancelada',
+                 f'"{class_session.title}" de {course_name} del {when}: se avisó a {sent} estudiante(s).',
+                 'warning')
+    return sent
+
+
+# Trabajos de reparto por tipo; el worker envía los emails resultantes por lotes
+JOB_HANDLERS = {
+    'payment_reminders': payment_reminders,
+    'class_cancelled': class_cancelled
+}
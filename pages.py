@@ -0,0 +1,44 @@
+from flask import Blueprint, render_template, redirect, url_for, current_app
+
+pages = Blueprint('pages', __name__)
+
+
+@pages.route('/')
+def index():
+    return redirect(url_for('pages.login_page'))
+
+@pages.route('/login')
+def login_page():
+    return render_template('login.html')
+
+@pages.route('/dashboard')
+def dashboard():
+    return render_template('dashboard.html')
+
+@pages.route('/estudiantes')
+def estudiantes():
+    return render_template('estudiantes.html')
+
+@pages.route('/cursos')
+def cursos():
+    return render_template('cursos.html')
+
+@pages.route('/finanzas')
+def finanzas():
+    return render_template('finanzas.html')
+
+@pages.route('/reportes')
+def reportes():
+    return render_template('reportes.html')
+
+@pages.route('/configuracion')
+def configuracion():
+    return render_template('configuracion.html')
+
+@pages.route('/usuarios')
+def usuarios():
+    return render_template('usuarios.html')
+
+@pages.route('/favicon.ico')
+def favicon():
+    return current_app.send_static_file('favicon.ico')
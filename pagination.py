@@ -0,0 +1,220 @@
+import base64
+import json
+from urllib.parse import urlencode
+from datetime import date, datetime
+from flask import request, jsonify
+from sqlalchemy import and_, or_
+from models import db
+
+# Límites de paginación
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+
+class PaginationError(ValueError):
+    """Parámetros de paginación o proyección inválidos"""
+
+
+def serialize_value(value):
+    """Convertir fechas a ISO 8601 para la respuesta JSON"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def encode_cursor(values):
+    """Codificar los valores de la clave de orden en un cursor opaco"""
+    raw = json.dumps([serialize_value(v) for v in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, columns):
+    """Decodificar un cursor opaco a los valores tipados de cada columna de orden"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+    except (ValueError, UnicodeDecodeError):
+        raise PaginationError('Cursor inválido')
+
+    if not isinstance(values, list) or len(values) != len(columns):
+        raise PaginationError('Cursor inválido')
+
+    decoded = []
+    for column, value in zip(columns, values):
+        python_type = column.type.python_type
+        try:
+            if value is None:
+                decoded.append(None)
+            elif python_type is datetime:
+                decoded.append(datetime.fromisoformat(value))
+            elif python_type is date:
+                decoded.append(date.fromisoformat(value))
+            else:
+                decoded.append(python_type(value))
+        except (TypeError, ValueError):
+            raise PaginationError('Cursor inválido')
+    return decoded
+
+
+def parse_fields(default_fields, allowed_fields):
+    """Leer el parámetro ?fields= y validar contra las columnas permitidas"""
+    raw = request.args.get('fields')
+    if not raw:
+        return list(default_fields)
+
+    fields = []
+    for field in raw.split(','):
+        field = field.strip()
+        if not field or field in fields:
+            continue
+        if field not in allowed_fields:
+            raise PaginationError(f'Campo no permitido: {field}')
+        fields.append(field)
+
+    if not fields:
+        raise PaginationError('El parámetro fields está vacío')
+    return fields
+
+
+def parse_filters(columns):
+    """Criterios ?nombre=valor para las columnas permitidas ``{nombre: columna}``.
+
+    Acepta varios valores separados por coma (``?status=activo,graduado``).
+    """
+    criteria = []
+    for name, column in columns.items():
+        raw = request.args.get(name)
+        if not raw:
+            continue
+        python_type = column.type.python_type
+        try:
+            values = [python_type(v.strip()) for v in raw.split(',') if v.strip()]
+        except ValueError:
+            raise PaginationError(f'El parámetro {name} es inválido')
+        if not values:
+            continue
+        criteria.append(column == values[0] if len(values) == 1 else column.in_(values))
+    return criteria
+
+
+def parse_limit():
+    """Leer el parámetro ?limit= acotado a MAX_LIMIT"""
+    raw = request.args.get('limit')
+    if raw is None:
+        return DEFAULT_LIMIT
+    try:
+        limit = int(raw)
+    except ValueError:
+        raise PaginationError('El parámetro limit debe ser un entero')
+    if limit < 1:
+        raise PaginationError('El parámetro limit debe ser mayor que 0')
+    return min(limit, MAX_LIMIT)
+
+
+def _keyset_condition(key_columns, values, descending):
+    """Construir (k1, k2) > (v1, v2) como OR/AND para aprovechar el índice en cualquier motor"""
+    conditions = []
+    for i, column in enumerate(key_columns):
+        comparison = column < values[i] if descending else column > values[i]
+        equals = [key_columns[j] == values[j] for j in range(i)]
+        conditions.append(and_(*equals, comparison) if equals else comparison)
+    return or_(*conditions)
+
+
+def _keyset_page(query, key_columns, values, descending, count):
+    """Hasta ``count`` filas después del cursor ``values`` (o desde el inicio si es None).
+
+    Si la columna de orden admite NULL, las filas con NULL van siempre al
+    final (en SQLite y en PostgreSQL): primero se recorren las no nulas por
+    el índice de (columna, id) y después las nulas por id. El cursor de una
+    fila nula lleva None en la columna de orden.
+    """
+    order = [c.desc() if descending else c.asc() for c in key_columns]
+    sort_column = key_columns[0]
+    if len(key_columns) == 1 or not sort_column.nullable:
+        if values is not None:
+            query = query.filter(_keyset_condition(key_columns, values, descending))
+        return query.order_by(*order).limit(count).all()
+
+    # Explícito porque PostgreSQL ordena los NULL primero en DESC y SQLite al final
+    order[0] = order[0].nulls_last()
+
+    rows = []
+    if values is None or values[0] is not None:
+        page = query.filter(sort_column.isnot(None))
+        if values is not None:
+            page = page.filter(_keyset_condition(key_columns, values, descending))
+        rows = page.order_by(*order).limit(count).all()
+        values = None
+    if len(rows) < count:
+        nulls = query.filter(sort_column.is_(None))
+        if values is not None:
+            nulls = nulls.filter(_keyset_condition(key_columns[1:], values[1:], descending))
+        rows += nulls.order_by(*order[1:]).limit(count - len(rows)).all()
+    return rows
+
+
+def list_response(model, default_fields, allowed_fields=None, sort_column=None,
+                  descending=False, filters=None, exclude=()):
+    """Respuesta de listado con proyección de columnas y paginación por cursor.
+
+    Solo se consultan las columnas pedidas (nunca se hidratan objetos ORM).
+    Sin ?limit ni ?after se devuelve la lista completa como antes; con
+    cualquiera de los dos se devuelve una página
+    ``{'items': [...], 'next_cursor': ..., 'next': ...}`` ordenada por
+    ``sort_column`` y la clave primaria.
+    """
+    if allowed_fields is None:
+        allowed_fields = [c.key for c in model.__table__.columns if c.key not in exclude]
+
+    try:
+        fields = parse_fields(default_fields, allowed_fields)
+        paginate = 'limit' in request.args or 'after' in request.args
+        limit = parse_limit() if paginate else None
+
+        key_columns = [model.id]
+        if sort_column is not None:
+            key_columns.insert(0, sort_column)
+
+        selected = [getattr(model, f) for f in fields]
+        extra = [c for c in key_columns if c.key not in fields]
+        query = db.session.query(*selected, *extra)
+
+        for criterion in filters or ():
+            query = query.filter(criterion)
+
+        values = None
+        if paginate and request.args.get('after'):
+            values = decode_cursor(request.args['after'], key_columns)
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
+
+    if not paginate:
+        order = [c.desc() if descending else c.asc() for c in key_columns]
+        if sort_column is not None and sort_column.nullable:
+            # Mismo orden que las páginas: las fechas nulas al final en cualquier motor
+            order[0] = order[0].nulls_last()
+        query = query.order_by(*order)
+        return jsonify([{f: serialize_value(row._mapping[f]) for f in fields} for row in query])
+
+    rows = _keyset_page(query, key_columns, values, descending, limit + 1)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = None
+    next_url = None
+    if has_more:
+        last = rows[-1]._mapping
+        next_cursor = encode_cursor([last[c.key] for c in key_columns])
+        args = request.args.to_dict()
+        args.update({'after': next_cursor, 'limit': str(limit)})
+        next_url = request.base_url + '?' + urlencode(args)
+
+    response = jsonify({
+        'items': [{f: serialize_value(row._mapping[f]) for f in fields} for row in rows],
+        'next_cursor': next_cursor,
+        'next': next_url
+    })
+    if next_url:
+        response.headers['Link'] = f'<{next_url}>; rel="next"'
+    return response
@@ -0,0 +1,154 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Valores por defecto: hilos dedicados a bcrypt, hilos de gunicorn por worker y fracción
+# de esos hilos que pueden estar ocupados con bcrypt (en curso o esperando turno)
+PASSWORD_HASH_WORKERS = 2
+WEB_THREADS = 12
+PASSWORD_HASH_THREAD_SHARE = 4
+
+# Límites (segundos) del histograma de duración
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+class PasswordHasherBusy(Exception):
+    """Todas las posiciones del executor de contraseñas están ocupadas"""
+
+
+class HashingMetrics:
+    """Conteo, duración y espera en cola de las operaciones de bcrypt por tipo"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.operations = {}
+        self.rejected = 0
+
+    def observe(self, operation, duration, wait):
+        with self._lock:
+            stats = self.operations.setdefault(operation, {
+                'count': 0,
+                'total_seconds': 0.0,
+                'max_seconds': 0.0,
+                'wait_seconds': 0.0,
+                'buckets': {str(b): 0 for b in DURATION_BUCKETS + ('+Inf',)}
+            })
+            stats['count'] += 1
+            stats['total_seconds'] += duration
+            stats['max_seconds'] = max(stats['max_seconds'], duration)
+            stats['wait_seconds'] += wait
+            for bound in DURATION_BUCKETS:
+                if duration <= bound:
+                    stats['buckets'][str(bound)] += 1
+            stats['buckets']['+Inf'] += 1
+
+    def reject(self):
+        with self._lock:
+            self.rejected += 1
+
+    def to_dict(self):
+        with self._lock:
+            operations = {}
+            for name, stats in self.operations.items():
+                operations[name] = dict(stats, buckets=dict(stats['buckets']),
+                                        avg_seconds=round(stats['total_seconds'] / stats['count'], 4))
+            return {'operations': operations, 'rejected': self.rejected}
+
+
+class PasswordHasher:
+    """Ejecuta bcrypt en un pool acotado con control de admisión.
+
+    Como máximo ``workers + queue`` operaciones pueden estar en curso o en
+    espera; las demás fallan de inmediato con PasswordHasherBusy (429) en
+    lugar de encolarse detrás de los hilos que atienden el resto de rutas.
+    Sin PASSWORD_HASH_QUEUE, ese máximo es la cuarta parte de WEB_THREADS
+    (y nunca menos que ``workers``).
+    """
+
+    def __init__(self):
+        self.bcrypt = None
+        self.rounds = None
+        self.metrics = HashingMetrics()
+        self._executor = None
+        self._slots = None
+        self._size = None
+
+    def init_app(self, app, bcrypt):
+        """Configurar el pool; si cambia el tamaño, el anterior termina lo que tiene y se cierra"""
+        self.bcrypt = bcrypt
+        self.rounds = app.config.get('BCRYPT_LOG_ROUNDS', 12)
+        workers = app.config.get('PASSWORD_HASH_WORKERS', PASSWORD_HASH_WORKERS)
+        queue = app.config.get('PASSWORD_HASH_QUEUE')
+        if queue is None:
+            threads = app.config.get('WEB_THREADS', WEB_THREADS)
+            queue = max(threads // PASSWORD_HASH_THREAD_SHARE - workers, 0)
+        if self._size == (workers, queue):
+            return
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bcrypt')
+        self._slots = threading.BoundedSemaphore(workers + queue)
+        self._size = (workers, queue)
+
+    def _run(self, operation, func, *args):
+        # Las referencias locales mantienen el par executor/semáforo aunque init_app los reemplace
+        executor, slots = self._executor, self._slots
+        if not slots.acquire(blocking=False):
+            self.metrics.reject()
+            raise PasswordHasherBusy()
+
+        submitted = time.perf_counter()
+
+        def task():
+            started = time.perf_counter()
+            try:
+                return func(*args)
+            finally:
+                finished = time.perf_counter()
+                slots.release()
+                self.metrics.observe(operation, finished - started, started - submitted)
+
+        try:
+            future = executor.submit(task)
+        except RuntimeError:
+            slots.release()
+            raise
+        return future.result()
+
+    def hash(self, password):
+        return self._run('hash', self.bcrypt.generate_password_hash, password, self.rounds).decode('utf-8')
+
+    def verify(self, password_hash, password):
+        return self._run('verify', self.bcrypt.check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """True si el hash se generó con un costo distinto al configurado ($2b$<costo>$...)"""
+        try:
+            return int(password_hash.split('$')[2]) != self.rounds
+        except (IndexError, ValueError):
+            return False
+
+
+password_hasher = PasswordHasher()
+
+
+def hash_password(password):
+    return password_hasher.hash(password)
+
+
+def check_password(password_hash, password):
+    return password_hasher.verify(password_hash, password)
+
+
+def rehash_if_needed(user, password):
+    """Actualizar el hash tras un login exitoso si cambió BCRYPT_LOG_ROUNDS.
+
+    Si el executor está saturado se omite y se intentará en el próximo login.
+    """
+    if not password_hasher.needs_rehash(user.password_hash):
+        return False
+    try:
+        user.password_hash = hash_password(password)
+    except PasswordHasherBusy:
+        return False
+    return True
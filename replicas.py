@@ -0,0 +1,147 @@
+import itertools
+import logging
+import threading
+import time
+from functools import wraps
+from flask import g, request, has_request_context
+from flask_jwt_extended import get_jwt_identity
+from flask_sqlalchemy.session import Session
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.sql.dml import UpdateBase
+from metrics import registry
+
+# Prefijo de las claves de SQLALCHEMY_BINDS que son réplicas de lectura (replica0, replica1, ...)
+REPLICA_BIND_PREFIX = 'replica'
+
+# Cookie con el momento de la última escritura, para leer lo propio en cualquier worker
+LAST_WRITE_COOKIE = 'crm_last_write'
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+logger = logging.getLogger(__name__)
+
+
+class RoutingSession(Session):
+    """Sesión que lee desde la conexión de réplica de la petición, si la hay.
+
+    Las escrituras (flush y sentencias INSERT/UPDATE/DELETE) siempre van al
+    primario, aunque ocurran durante una petición enviada a una réplica.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and not isinstance(clause, UpdateBase) and has_request_context():
+            connection = g.get('replica_connection')
+            if connection is not None:
+                return connection
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+class ReplicaRouter:
+    """Elige la réplica de cada petición de solo lectura.
+
+    Las réplicas se recorren en turno rotativo; la que falla al conectar se
+    omite durante ``REPLICA_RETRY_INTERVAL`` segundos y, si ninguna responde,
+    la petición se atiende en el primario. Durante ``REPLICA_READ_YOUR_WRITES``
+    segundos después de una escritura del mismo usuario (o del mismo
+    navegador, por la cookie) también se lee del primario.
+    """
+
+    def __init__(self):
+        self.db = None
+        self.keys = []
+        self.window = 5
+        self.retry_interval = 30
+        self._cycle = None
+        self._lock = threading.Lock()
+        self._down_until = {}
+        self._recent_writers = {}
+
+    def init_app(self, app, db):
+        self.db = db
+        self.keys = sorted(k for k in app.config.get('SQLALCHEMY_BINDS', {})
+                           if k and k.startswith(REPLICA_BIND_PREFIX))
+        self.window = app.config.get('REPLICA_READ_YOUR_WRITES', self.window)
+        self.retry_interval = app.config.get('REPLICA_RETRY_INTERVAL', self.retry_interval)
+        self._cycle = itertools.cycle(self.keys)
+        if self.keys:
+            app.after_request(self.track_write)
+            app.teardown_request(self.release)
+
+    def _user_id(self):
+        try:
+            return get_jwt_identity()
+        except RuntimeError:
+            return None
+
+    def recently_wrote(self):
+        now = time.time()
+        try:
+            if now - float(request.cookies.get(LAST_WRITE_COOKIE, 0)) < self.window:
+                return True
+        except ValueError:
+            pass
+        user_id = self._user_id()
+        return user_id is not None and now - self._recent_writers.get(user_id, 0) < self.window
+
+    def track_write(self, response):
+        if request.method in SAFE_METHODS or response.status_code >= 400:
+            return response
+        now = time.time()
+        user_id = self._user_id()
+        if user_id is not None:
+            with self._lock:
+                self._recent_writers[user_id] = now
+                if len(self._recent_writers) > 10000:
+                    self._recent_writers = {k: v for k, v in self._recent_writers.items()
+                                            if now - v < self.window}
+        response.set_cookie(LAST_WRITE_COOKIE, f'{now:.3f}', max_age=max(int(self.window), 1),
+                            httponly=True, samesite='Lax')
+        return response
+
+    def connect(self):
+        """Conexión a la siguiente réplica disponible, o None si ninguna responde"""
+        for _ in range(len(self.keys)):
+            with self._lock:
+                key = next(self._cycle)
+            if self._down_until.get(key, 0) > time.monotonic():
+                continue
+            try:
+                return self.db.engines[key].connect()
+            except DBAPIError as e:
+                self._down_until[key] = time.monotonic() + self.retry_interval
+                logger.warning('Réplica no disponible', extra={'replica': key, 'error': str(e.orig)})
+        return None
+
+    def route(self):
+        """Decidir dónde se leen los datos de la petición actual"""
+        if not self.keys or g.get('replica_connection') is not None:
+            return
+        if self.recently_wrote():
+            target = 'primary_read_your_writes'
+        else:
+            g.replica_connection = self.connect()
+            target = 'replica' if g.replica_connection is not None else 'primary_fallback'
+        registry.inc('db_reads_routed_total', {'target': target})
+
+    def release(self, error=None):
+        connection = g.pop('replica_connection', None)
+        if connection is not None:
+            # La sesión se cierra antes que la conexión que estaba usando
+            self.db.session.remove()
+            connection.close()
+
+    def status(self):
+        now = time.monotonic()
+        return {key: 'down' if self._down_until.get(key, 0) > now else 'up' for key in self.keys}
+
+
+replica_router = ReplicaRouter()
+
+
+def replica_read(view):
+    """Atender la ruta desde una réplica de lectura (va después de @jwt_required)"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        replica_router.route()
+        return view(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,447 @@
+import json
+from datetime import datetime, timedelta
+from sqlalchemy import and_, or_, select, func, case, cast, Integer
+from models import db, Student, Class, Enrollment, Payment, Attendance, Grade
+
+# Secciones disponibles en /api/reports/summary
+SECTIONS = ('performance', 'financial', 'attendance', 'enrollment')
+
+# Granularidades del reporte financiero y límite de periodos por consulta
+GRANULARITIES = ('day', 'week', 'month', 'quarter')
+MAX_PERIODS = 1000
+
+# Estudiantes destacados en cada sección del resumen (la lista completa va por student-performance)
+SUMMARY_TOP_N = 10
+
+
+class ReportFilters:
+    """Filtros comunes de los reportes: rango de fechas (inclusivo) y curso"""
+
+    def __init__(self, date_from=None, date_to=None, course_id=None):
+        self.date_from = date_from
+        self.date_to = date_to
+        self.course_id = course_id
+
+    @classmethod
+    def from_args(cls, args):
+        """Construir los filtros desde request.args; lanza ValueError si son inválidos"""
+        def parse_date(name):
+            value = args.get(name)
+            if not value:
+                return None
+            try:
+                return datetime.strptime(value, '%Y-%m-%d').date()
+            except ValueError:
+                raise ValueError(f'El parámetro {name} debe tener formato YYYY-MM-DD')
+
+        date_from = parse_date('date_from')
+        date_to = parse_date('date_to')
+        if date_from and date_to and date_from > date_to:
+            raise ValueError('date_from no puede ser posterior a date_to')
+
+        course_id = args.get('course_id')
+        if course_id:
+            try:
+                course_id = int(course_id)
+            except ValueError:
+                raise ValueError('El parámetro course_id debe ser un entero')
+        else:
+            course_id = None
+
+        return cls(date_from, date_to, course_id)
+
+    def date_range(self, column):
+        """Criterios de rango sobre una columna Date o DateTime.
+
+        El límite superior es exclusivo sobre el día siguiente para no perder
+        registros del último día posteriores a las 00:00.
+        """
+        criteria = []
+        is_datetime = column.type.python_type is datetime
+        if self.date_from:
+            start = datetime.combine(self.date_from, datetime.min.time()) if is_datetime else self.date_from
+            criteria.append(column >= start)
+        if self.date_to:
+            end = self.date_to + timedelta(days=1)
+            if is_datetime:
+                end = datetime.combine(end, datetime.min.time())
+            criteria.append(column < end)
+        return criteria
+
+    def enrolled_students(self):
+        """Subconsulta con los estudiantes matriculados en el curso filtrado"""
+        return db.session.query(Enrollment.student_id).filter(Enrollment.course_id == self.course_id)
+
+    def to_dict(self):
+        return {
+            'date_from': self.date_from.isoformat() if self.date_from else None,
+            'date_to': self.date_to.isoformat() if self.date_to else None,
+            'course_id': self.course_id
+        }
+
+
+def month_bucket(column):
+    """Expresión SQL 'YYYY-MM' para agrupar por mes según el motor de base de datos"""
+    if db.session.get_bind().dialect.name == 'postgresql':
+        return func.to_char(column, 'YYYY-MM')
+    return func.strftime('%Y-%m', column)
+
+
+def period_bucket(column, granularity):
+    """Expresión SQL con el inicio ('YYYY-MM-DD') del periodo calendario que contiene column.
+
+    Las semanas empiezan en lunes (ISO) en ambos motores.
+    """
+    if db.session.get_bind().dialect.name == 'postgresql':
+        if granularity == 'day':
+            return func.to_char(column, 'YYYY-MM-DD')
+        return func.to_char(func.date_trunc(granularity, column), 'YYYY-MM-DD')
+
+    if granularity == 'day':
+        return func.strftime('%Y-%m-%d', column)
+    if granularity == 'week':
+        return func.date(column, 'weekday 0', '-6 days')
+    if granularity == 'month':
+        return func.strftime('%Y-%m-01', column)
+    month = cast(func.strftime('%m', column), Integer)
+    return func.printf('%s-%02d-01', func.strftime('%Y', column), (month - 1) // 3 * 3 + 1)
+
+
+def period_start(day, granularity):
+    """Inicio del periodo calendario que contiene day (equivalente a period_bucket)"""
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    if granularity == 'quarter':
+        return day.replace(month=(day.month - 1) // 3 * 3 + 1, day=1)
+    return day
+
+
+def shift_period(start, granularity, count=1):
+    """Desplazar el inicio de un periodo count periodos (meses y trimestres calendario)"""
+    if granularity == 'day':
+        return start + timedelta(days=count)
+    if granularity == 'week':
+        return start + timedelta(weeks=count)
+    months = count * (3 if granularity == 'quarter' else 1)
+    year, month = divmod(start.year * 12 + start.month - 1 + months, 12)
+    return start.replace(year=year, month=month + 1)
+
+
+def _rate(part, total):
+    return round((part / total) * 100, 2) if total else 0
+
+
+def _present_count():
+    return func.sum(case((Attendance.status == 'presente', 1), else_=0))
+
+
+def weighted_average(value, weight):
+    """Promedio ponderado SQL; los pesos nulos cuentan como 1"""
+    weight = func.coalesce(weight, 1.0)
+    return func.sum(value * weight) / func.nullif(func.sum(weight), 0)
+
+
+def student_rows_query(filters):
+    """Promedio ponderado y asistencia por estudiante en una sola consulta agrupada.
+
+    Columnas: id, name, status, average_grade, total y present. Sin rango de
+    fechas la asistencia sale de los contadores de Student (o de la
+    matrícula, con ``course_id``) en lugar de agrupar Attendance.
+    """
+    grade_query = db.session.query(
+        Grade.student_id.label('student_id'),
+        weighted_average(Grade.grade, Grade.weight).label('average_grade')
+    ).filter(*filters.date_range(Grade.date))
+    if filters.course_id:
+        grade_query = grade_query.filter(Grade.course_id == filters.course_id)
+    grades = grade_query.group_by(Grade.student_id).subquery()
+
+    if filters.date_from or filters.date_to:
+        attendance_query = db.session.query(
+            Attendance.student_id.label('student_id'),
+            func.count(Attendance.id).label('total'),
+            _present_count().label('present')
+        ).filter(*filters.date_range(Attendance.date))
+        if filters.course_id:
+            attendance_query = attendance_query.join(Class, Attendance.class_id == Class.id).filter(
+                Class.course_id == filters.course_id)
+        attendance_query = attendance_query.group_by(Attendance.student_id)
+    elif filters.course_id:
+        # Sin rango de fechas basta con los contadores de la matrícula en el curso
+        attendance_query = db.session.query(
+            Enrollment.student_id.label('student_id'),
+            func.max(Enrollment.attendance_total).label('total'),
+            func.max(Enrollment.attendance_present).label('present')
+        ).filter(Enrollment.course_id == filters.course_id).group_by(Enrollment.student_id)
+    else:
+        attendance_query = None
+
+    if attendance_query is None:
+        # Sin filtros se leen los contadores del estudiante, sin recorrer Attendance
+        query = db.session.query(
+            Student.id, Student.name, Student.status, grades.c.average_grade,
+            Student.attendance_total.label('total'), Student.attendance_present.label('present')
+        ).outerjoin(grades, grades.c.student_id == Student.id)
+    else:
+        attendance = attendance_query.subquery()
+        query = db.session.query(
+            Student.id, Student.name, Student.status,
+            grades.c.average_grade, attendance.c.total, attendance.c.present
+        ).outerjoin(grades, grades.c.student_id == Student.id
+        ).outerjoin(attendance, attendance.c.student_id == Student.id)
+    if filters.course_id:
+        query = query.filter(Student.id.in_(filters.enrolled_students()))
+    return query
+
+
+def _student_row(row):
+    return {
+        'student_id': row.id,
+        'student_name': row.name,
+        'status': row.status,
+        'average_grade': round(row.average_grade or 0, 2),
+        'present': int(row.present or 0),
+        'total': row.total or 0,
+        'attendance_rate': _rate(row.present or 0, row.total or 0)
+    }
+
+
+def iter_student_rows(filters, batch_size=1000):
+    """Filas de student_rows_query en orden de id, leídas por lotes con ``yield_per``.
+
+    El costo en memoria depende del lote y no del número de estudiantes.
+    """
+    for row in student_rows_query(filters).order_by(Student.id).yield_per(batch_size):
+        yield _student_row(row)
+
+
+def stream_json_array(items):
+    """Serializar un iterable como arreglo JSON, un elemento a la vez"""
+    yield '['
+    for i, item in enumerate(items):
+        yield (',' if i else '') + json.dumps(item, ensure_ascii=False)
+    yield ']'
+
+
+def student_highlights(filters):
+    """Totales de student_rows_query, los SUMMARY_TOP_N mejores promedios y las SUMMARY_TOP_N asistencias más bajas.
+
+    Una sola consulta con funciones de ventana: la subconsulta agrupada se
+    evalúa una vez y solo vuelven a Python las filas destacadas.
+    """
+    students = student_rows_query(filters).subquery()
+    graded = students.c.average_grade.isnot(None)
+    recorded = students.c.total > 0
+    rate = func.coalesce(students.c.present, 0) * 1.0 / students.c.total
+    ranked = select(
+        students,
+        func.row_number().over(partition_by=graded, order_by=(students.c.average_grade.desc(), students.c.id)
+                               ).label('grade_rank'),
+        func.row_number().over(partition_by=recorded, order_by=(rate, students.c.id)).label('attendance_rank'),
+        func.count().over().label('count_all'),
+        func.count(func.nullif(students.c.average_grade, 0)).over().label('graded_all'),
+        func.avg(func.nullif(students.c.average_grade, 0)).over().label('average_all'),
+        func.sum(students.c.present).over().label('present_all'),
+        func.sum(students.c.total).over().label('total_all'),
+        func.count(case((recorded, 1))).over().label('recorded_all')
+    ).subquery()
+    top_grade = and_(ranked.c.average_grade.isnot(None), ranked.c.grade_rank <= SUMMARY_TOP_N)
+    low_attendance = and_(ranked.c.total > 0, ranked.c.attendance_rank <= SUMMARY_TOP_N)
+    rows = db.session.execute(select(ranked, top_grade.label('is_top'), low_attendance.label('is_low')).where(
+        or_(ranked.c.grade_rank == 1, top_grade, low_attendance))).all()
+
+    first = rows[0] if rows else None
+    return {
+        'count': first.count_all if first else 0,
+        'graded': first.graded_all if first else 0,
+        'average': first.average_all if first else None,
+        'present': int(first.present_all or 0) if first else 0,
+        'total': int(first.total_all or 0) if first else 0,
+        'with_records': first.recorded_all if first else 0,
+        'top': [_student_row(row) for row in sorted(
+            (row for row in rows if row.is_top), key=lambda row: row.grade_rank)],
+        'lowest': [_student_row(row) for row in sorted(
+            (row for row in rows if row.is_low), key=lambda row: row.attendance_rank)]
+    }
+
+
+def performance_summary(filters, highlights=None):
+    """Rendimiento académico: promedios generales y los SUMMARY_TOP_N mejores promedios.
+
+    Las filas de cada estudiante se obtienen de /api/reports/student-performance.
+    """
+    highlights = student_highlights(filters) if highlights is None else highlights
+    return {
+        'student_count': highlights['count'],
+        'graded_students': highlights['graded'],
+        'average_grade': round(highlights['average'], 2) if highlights['average'] else 0,
+        'attendance_rate': _rate(highlights['present'], highlights['total']),
+        'top_students': [{
+            key: row[key] for key in ('student_id', 'student_name', 'status', 'average_grade', 'attendance_rate')
+        } for row in highlights['top']]
+    }
+
+
+def payment_criteria(filters):
+    """Criterios de pagos según rango de fechas y estudiantes del curso"""
+    criteria = filters.date_range(Payment.date)
+    if filters.course_id:
+        criteria.append(Payment.student_id.in_(filters.enrolled_students()))
+    return criteria
+
+
+def income_by_type(filters):
+    """Ingresos pagados agrupados por tipo de pago"""
+    return {payment_type: amount for payment_type, amount in db.session.query(
+        Payment.type, func.sum(Payment.amount)
+    ).filter(*payment_criteria(filters), Payment.status == 'pagado').group_by(Payment.type)}
+
+
+def monthly_income(filters):
+    """Ingresos pagados agrupados por mes calendario ('YYYY-MM')"""
+    month = month_bucket(Payment.date)
+    return {key: amount for key, amount in db.session.query(
+        month, func.sum(Payment.amount)
+    ).filter(*payment_criteria(filters), Payment.status == 'pagado').group_by(month).order_by(month)}
+
+
+def financial_report(filters, granularity='month'):
+    """Ingresos pagados por periodo calendario, tipo y método de pago.
+
+    Una sola consulta agrupada por (periodo, tipo, método); los periodos sin
+    pagos dentro del rango se completan con cero.
+    """
+    def empty_period(key):
+        return {'period': key, 'total': 0, 'count': 0, 'by_type': {}, 'by_method': {}}
+
+    periods = {}
+    start = period_start(filters.date_from, granularity)
+    while start <= filters.date_to:
+        if len(periods) >= MAX_PERIODS:
+            raise ValueError(f'El rango excede {MAX_PERIODS} periodos; usa una granularidad mayor')
+        periods[start.isoformat()] = empty_period(start.isoformat())
+        start = shift_period(start, granularity)
+
+    bucket = period_bucket(Payment.date, granularity)
+    rows = db.session.query(
+        bucket, Payment.type, Payment.payment_method, func.sum(Payment.amount), func.count(Payment.id)
+    ).filter(*payment_criteria(filters), Payment.status == 'pagado').group_by(
+        bucket, Payment.type, Payment.payment_method)
+
+    totals = {'total_income': 0, 'payment_count': 0, 'income_by_type': {}, 'income_by_method': {}}
+    for period, payment_type, method, amount, count in rows:
+        method = method or 'no_especificado'
+        entry = periods.setdefault(period, empty_period(period))
+        entry['total'] += amount
+        entry['count'] += count
+        entry['by_type'][payment_type] = entry['by_type'].get(payment_type, 0) + amount
+        entry['by_method'][method] = entry['by_method'].get(method, 0) + amount
+        totals['total_income'] += amount
+        totals['payment_count'] += count
+        totals['income_by_type'][payment_type] = totals['income_by_type'].get(payment_type, 0) + amount
+        totals['income_by_method'][method] = totals['income_by_method'].get(method, 0) + amount
+
+    return {
+        'granularity': granularity,
+        **filters.to_dict(),
+        **totals,
+        'periods': list(periods.values())
+    }
+
+
+def financial_summary(filters):
+    """Totales de ingresos por estado, tipo y mes agrupados en SQL"""
+    totals = {status: (count, amount or 0) for status, count, amount in db.session.query(
+        Payment.status, func.count(Payment.id), func.sum(Payment.amount)
+    ).filter(*payment_criteria(filters)).group_by(Payment.status)}
+    payment_count = sum(count for count, _ in totals.values())
+    paid_count, total_income = totals.get('pagado', (0, 0))
+    _, pending_income = totals.get('pendiente', (0, 0))
+
+    if filters.course_id:
+        total_students = db.session.query(func.count(func.distinct(Enrollment.student_id))).filter(
+            Enrollment.course_id == filters.course_id).scalar()
+    else:
+        total_students = db.session.query(func.count(Student.id)).scalar()
+
+    return {
+        'total_income': total_income,
+        'pending_income': pending_income,
+        'paid_count': paid_count,
+        'payment_count': payment_count,
+        'average_payment': round(total_income / paid_count, 2) if paid_count else 0,
+        'income_by_type': income_by_type(filters),
+        'monthly_income': monthly_income(filters),
+        'total_students': total_students
+    }
+
+
+def attendance_summary(filters, highlights=None):
+    """Conteos de asistencia por estado y los SUMMARY_TOP_N estudiantes con menor asistencia"""
+    query = db.session.query(Attendance.status, func.count(Attendance.id)).filter(
+        *filters.date_range(Attendance.date))
+    if filters.course_id:
+        query = query.join(Class, Attendance.class_id == Class.id).filter(Class.course_id == filters.course_id)
+    by_status = {'presente': 0, 'ausente': 0, 'justificado': 0, 'tardanza': 0}
+    by_status.update({status: count for status, count in query.group_by(Attendance.status)})
+    total = sum(by_status.values())
+
+    highlights = student_highlights(filters) if highlights is None else highlights
+    return {
+        'by_status': by_status,
+        'total': total,
+        'attendance_rate': _rate(by_status['presente'], total),
+        'students_with_records': highlights['with_records'],
+        'lowest_attendance': [{
+            'student_id': row['student_id'],
+            'student_name': row['student_name'],
+            'present': row['present'],
+            'total': row['total'],
+            'rate': row['attendance_rate']
+        } for row in highlights['lowest']]
+    }
+
+
+def enrollment_summary(filters):
+    """Matrículas por estado y por mes"""
+    criteria = filters.date_range(Enrollment.enrollment_date)
+    if filters.course_id:
+        criteria.append(Enrollment.course_id == filters.course_id)
+
+    by_status = {status: count for status, count in db.session.query(
+        Enrollment.status, func.count(Enrollment.id)
+    ).filter(*criteria).group_by(Enrollment.status)}
+    total = sum(by_status.values())
+
+    month = month_bucket(Enrollment.enrollment_date)
+    monthly = {key: count for key, count in db.session.query(
+        month, func.count(Enrollment.id)
+    ).filter(*criteria).group_by(month).order_by(month)}
+
+    return {
+        'total': total,
+        'by_status': by_status,
+        'active': by_status.get('activo', 0),
+        'completed': by_status.get('completado', 0),
+        'retention_rate': _rate(by_status.get('activo', 0), total),
+        'monthly': monthly
+    }
+
+
+def build_summary(filters, sections=SECTIONS):
+    """Reporte agregado con las secciones pedidas"""
+    summary = {'filters': filters.to_dict()}
+    highlights = None
+    if 'performance' in sections or 'attendance' in sections:
+        highlights = student_highlights(filters)
+    if 'performance' in sections:
+        summary['performance'] = performance_summary(filters, highlights)
+    if 'financial' in sections:
+        summary['financial'] = financial_summary(filters)
+    if 'attendance' in sections:
+        summary['attendance'] = attendance_summary(filters, highlights)
+    if 'enrollment' in sections:
+        summary['enrollment'] = enrollment_summary(filters)
+    return summary
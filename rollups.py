@@ -0,0 +1,161 @@
+from datetime import date, datetime
+from sqlalchemy import func, case
+from database import dialect_insert
+from attendance_counters import rebuild_attendance_counters
+from models import db, Class, Payment, Attendance, AttendanceDailyRollup, IncomeDailyRollup, RollupCounter
+
+# Columna del rollup de asistencia para cada estado
+ATTENDANCE_COLUMNS = {
+    'presente': 'present',
+    'ausente': 'absent',
+    'justificado': 'justified',
+    'tardanza': 'late'
+}
+
+
+def _upsert_increment(model, keys, increments):
+    """INSERT ... ON CONFLICT DO UPDATE SET col = col + n.
+
+    El incremento ocurre en la base de datos, así que varios workers pueden
+    escribir la misma fila sin carreras de lectura-modificación-escritura.
+    """
+    table = model.__table__
+    stmt = dialect_insert(table).values(**keys, **increments)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={column: table.c[column] + stmt.excluded[column] for column in increments}
+    )
+    db.session.execute(stmt)
+
+
+def increment_counter(name, value=1):
+    """Incrementar un contador de RollupCounter (lo crea si no existe)"""
+    _upsert_increment(RollupCounter, {'name': name}, {'value': value})
+
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    return value
+
+
+def apply_attendance_deltas(day, course_id, deltas):
+    """Aplicar cambios netos por estado ({'presente': 3, 'ausente': -1}) a los rollups de un día"""
+    deltas = {status: delta for status, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    total = sum(deltas.values())
+    if course_id is not None:
+        increments = {'total': total} if total else {}
+        for status, delta in deltas.items():
+            column = ATTENDANCE_COLUMNS.get(status)
+            if column:
+                increments[column] = increments.get(column, 0) + delta
+        if increments:
+            _upsert_increment(AttendanceDailyRollup, {'day': day, 'course_id': course_id}, increments)
+
+    if total:
+        increment_counter('attendance:total', total)
+    for status, delta in deltas.items():
+        if status in ATTENDANCE_COLUMNS:
+            increment_counter(f'attendance:{status}', delta)
+
+
+def record_attendance(attendance, course_id=None):
+    """Sumar un registro de asistencia a los rollups (en la transacción actual)"""
+    if course_id is None:
+        course_id = db.session.query(Class.course_id).filter(Class.id == attendance.class_id).scalar()
+    apply_attendance_deltas(attendance.date, course_id, {attendance.status: 1})
+
+
+def record_payment(payment):
+    """Sumar un pago pagado al rollup de ingresos (en la transacción actual)"""
+    if payment.status != 'pagado':
+        return
+    _upsert_increment(
+        IncomeDailyRollup,
+        {'day': _as_date(payment.date), 'type': payment.type},
+        {'amount': payment.amount, 'payment_count': 1}
+    )
+
+
+def record_payment_rows(rows):
+    """Sumar lotes de pagos (diccionarios de columnas) al rollup, una fila por (día, tipo)"""
+    totals = {}
+    for row in rows:
+        if row.get('status') != 'pagado':
+            continue
+        key = (_as_date(row['date']), row['type'])
+        amount, count = totals.get(key, (0, 0))
+        totals[key] = (amount + row['amount'], count + 1)
+
+    for (day, payment_type), (amount, count) in totals.items():
+        _upsert_increment(IncomeDailyRollup, {'day': day, 'type': payment_type},
+                          {'amount': amount, 'payment_count': count})
+
+
+def attendance_counts():
+    """Registros de asistencia por estado y 'total', leídos de los contadores"""
+    names = [f'attendance:{status}' for status in (*ATTENDANCE_COLUMNS, 'total')]
+    counters = dict(db.session.query(RollupCounter.name, RollupCounter.value).filter(RollupCounter.name.in_(names)))
+    return {name.split(':', 1)[1]: counters.get(name, 0) for name in names}
+
+
+def attendance_rate(counts=None):
+    """Tasa de asistencia histórica leída de los contadores"""
+    counts = attendance_counts() if counts is None else counts
+    return (counts['presente'] / counts['total']) * 100 if counts['total'] else 0
+
+
+def income_since(start_day):
+    """Ingresos pagados desde start_day sumando las filas diarias del rollup"""
+    return db.session.query(func.coalesce(func.sum(IncomeDailyRollup.amount), 0)).filter(
+        IncomeDailyRollup.day >= start_day).scalar()
+
+
+def rebuild_rollups(session=None):
+    """Recalcular todos los rollups desde las tablas originales para reparar desvíos.
+
+    ``session`` permite ejecutarlo dentro de una migración (por defecto, db.session).
+    """
+    session = session or db.session
+    session.query(AttendanceDailyRollup).delete()
+    session.query(IncomeDailyRollup).delete()
+    session.query(RollupCounter).filter(RollupCounter.name.like('attendance:%')).delete(synchronize_session=False)
+
+    status_sums = [
+        func.sum(case((Attendance.status == status, 1), else_=0)).label(column)
+        for status, column in ATTENDANCE_COLUMNS.items()
+    ]
+    attendance_rows = session.query(
+        Attendance.date, Class.course_id, func.count(Attendance.id).label('total'), *status_sums
+    ).join(Class, Attendance.class_id == Class.id).group_by(Attendance.date, Class.course_id).all()
+    session.bulk_insert_mappings(AttendanceDailyRollup, [{
+        'day': row.date,
+        'course_id': row.course_id,
+        'total': row.total,
+        **{column: getattr(row, column) for column in ATTENDANCE_COLUMNS.values()}
+    } for row in attendance_rows])
+
+    session.add(RollupCounter(name='attendance:total', value=sum(row.total for row in attendance_rows)))
+    for status, column in ATTENDANCE_COLUMNS.items():
+        session.add(RollupCounter(name=f'attendance:{status}',
+                                  value=sum(getattr(row, column) for row in attendance_rows)))
+
+    day = func.date(Payment.date)
+    income_rows = session.query(
+        day, Payment.type, func.sum(Payment.amount), func.count(Payment.id)
+    ).filter(Payment.status == 'pagado').group_by(day, Payment.type).all()
+    session.bulk_insert_mappings(IncomeDailyRollup, [{
+        'day': _as_date(row_day),
+        'type': payment_type,
+        'amount': amount,
+        'payment_count': count
+    } for row_day, payment_type, amount, count in income_rows])
+
+    rebuild_attendance_counters(session)
+    session.commit()
+    return {'attendance_days': len(attendance_rows), 'income_days': len(income_rows)}
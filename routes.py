@@ -1,13 +1,43 @@
-from flask import request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity, create_access_token
-from app import app, bcrypt, mail
-from models import db, User, Student, Course, Class, Enrollment, Payment, Attendance, Grade, Notification
-from datetime import datetime, timedelta
-import json
+from flask import Blueprint, current_app, request, jsonify, Response, stream_with_context
+from flask_jwt_extended import jwt_required, verify_jwt_in_request, get_jwt_identity, get_current_user, create_access_token
+from models import db, User, Student, Course, Class, Enrollment, Payment, Attendance, Grade, Job
+from pagination import PaginationError, list_response, parse_fields, parse_filters, serialize_value
+from reports import (ReportFilters, SECTIONS, GRANULARITIES, build_summary, iter_student_rows,
+                     stream_json_array, financial_report, period_start, shift_period)
+from activities import ACTIVITY_TYPES, recent_activities, activity_cursor, decode_activity_cursor
+from rollups import (record_attendance, record_payment, apply_attendance_deltas, attendance_counts, attendance_rate,
+                     income_since)
+from imports import IMPORTERS, IMPORT_FORMATS, detect_format, iter_records, import_records
+from exports import EXPORTS, EXPORT_FORMATS, MIMETYPES, export_columns, iter_export
+from identity import invalidate_user
+from http_cache import conditional, invalidates, bump_versions
+from passwords import PasswordHasherBusy, hash_password, check_password, rehash_if_needed, password_hasher
+from metrics import prometheus_text
+from database import dialect_insert, pool_status
+from replicas import replica_read, replica_router
+from schedule import class_filters, upcoming_limit
+from final_grades import record_grade, recompute_final_grades
+from events import (publish_event, publish_stats, publish_activity, publish_payment, publish_class,
+                    publish_attendance, event_broker, latest_event_id, read_events, replay_available, format_event)
+from jobs import enqueue, job_dict
+from search import parse_search_args, find_students, index_students, unindex_student
+from attendance_counters import (apply_attendance_counts, record_student_attendance, recompute_attendance_counters,
+                                 student_attendance_filters, enrollment_attendance_filters)
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime
+from urllib.parse import urlencode
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+api = Blueprint('api', __name__)
 
 # ==================== AUTENTICACIÓN ====================
 
-@app.route('/api/auth/register', methods=['POST'])
+@api.route('/api/auth/register', methods=['POST'])
+@invalidates('user')
 def register():
     data = request.get_json()
     
@@ -22,7 +52,7 @@ def register():
         return jsonify({'error': 'El email ya está registrado'}), 400
     
     # Crear nuevo usuario
-    hashed_password = bcrypt.generate_password_hash(data['password']).decode('utf-8')
+    hashed_password = hash_password(data['password'])
     new_user = User(
         email=data['email'],
         password_hash=hashed_password,
@@ -47,28 +77,29 @@ def register():
         }
     }), 201
 
-@app.route('/api/auth/login', methods=['POST'])
+@api.route('/api/auth/login', methods=['POST'])
 def login():
     try:
         data = request.get_json()
-        print(f"Login attempt for email: {data.get('email') if data else 'No data'}")
         
         # Validar campos requeridos
         if not data or 'email' not in data or 'password' not in data:
-            print("Missing required fields")
+            logger.info('Login rechazado', extra={'reason': 'missing_fields'})
             return jsonify({'error': 'Email y contraseña son requeridos'}), 400
         
         user = User.query.filter_by(email=data['email']).first()
-        print(f"User found: {user is not None}")
         
-        if user and bcrypt.check_password_hash(user.password_hash, data['password']):
+        if user and check_password(user.password_hash, data['password']):
             # Verificar que el usuario esté activo
             if hasattr(user, 'is_active') and not user.is_active:
-                print("User is inactive")
+                logger.info('Login rechazado', extra={'reason': 'inactive', 'user_id': user.id})
                 return jsonify({'error': 'Usuario inactivo'}), 401
+            
+            # Actualizar el hash si cambió el costo de bcrypt
+            if rehash_if_needed(user, data['password']):
+                db.session.commit()
                 
             access_token = create_access_token(identity=user.id)
-            print(f"Token created for user {user.id}: {access_token[:20]}...")
             
             response_data = {
                 'message': 'Login exitoso',
@@ -80,28 +111,25 @@ def login():
                     'role': user.role
                 }
             }
-            print(f"Login successful for user: {user.name}")
-            print(f"Returning response with status 200")
+            logger.info('Login exitoso', extra={'user_id': user.id})
             response = jsonify(response_data)
             response.headers.add('Access-Control-Allow-Origin', 'https://web-production-668e6.up.railway.app')
             response.headers.add('Access-Control-Allow-Credentials', 'true')
             return response, 200
         
-        print("Invalid credentials")
+        logger.info('Login rechazado', extra={'reason': 'invalid_credentials'})
         return jsonify({'error': 'Credenciales inválidas'}), 401
-    except Exception as e:
-        print(f"Error en login: {e}")
+    except PasswordHasherBusy:
+        raise
+    except Exception:
+        logger.exception('Error en login')
         return jsonify({'error': 'Error interno del servidor'}), 500
 
-@app.route('/api/auth/profile', methods=['GET'])
+@api.route('/api/auth/profile', methods=['GET'])
 @jwt_required()
 def get_profile():
     try:
-        user_id = get_jwt_identity()
-        print(f"Profile request for user_id: {user_id}")
-        
-        user = User.query.get(user_id)
-        print(f"User found: {user is not None}")
+        user = get_current_user()
         
         if not user:
             return jsonify({'error': 'Usuario no encontrado'}), 404
@@ -113,19 +141,17 @@ def get_profile():
             'role': user.role,
             'created_at': user.created_at.isoformat()
         }
-        print(f"Profile returned for user: {user.name}")
         return jsonify(response_data)
-    except Exception as e:
-        print(f"Error in get_profile: {e}")
+    except Exception:
+        logger.exception('Error en get_profile')
         return jsonify({'error': 'Error interno del servidor'}), 500
 
-@app.route('/api/test', methods=['GET'])
+@api.route('/api/test', methods=['GET'])
 def test_api():
     """Endpoint de prueba para verificar que la API esté funcionando"""
     try:
         # Crear un token de prueba
-        test_token = create_access_token(identity=1)
-        print(f"Test token created: {test_token[:20]}...")
+        create_access_token(identity=1)
         
         response = jsonify({
             'message': 'API funcionando correctamente',
@@ -133,14 +159,14 @@ def test_api():
             'status': 'ok',
             'version': '1.0.0',
             'test_token_created': True,
-            'jwt_secret_set': bool(app.config.get('JWT_SECRET_KEY')),
-            'jwt_secret_length': len(app.config.get('JWT_SECRET_KEY', ''))
+            'jwt_secret_set': bool(current_app.config.get('JWT_SECRET_KEY')),
+            'jwt_secret_length': len(current_app.config.get('JWT_SECRET_KEY', ''))
         })
         response.headers.add('Access-Control-Allow-Origin', '*')
         response.headers.add('Access-Control-Allow-Credentials', 'true')
         return response
     except Exception as e:
-        print(f"Error in test_api: {e}")
+        logger.exception('Error en test_api')
         response = jsonify({
             'message': 'Error en API',
             'error': str(e),
@@ -151,18 +177,21 @@ def test_api():
         response.headers.add('Access-Control-Allow-Credentials', 'true')
         return response, 500
 
-@app.route('/api/health', methods=['GET'])
+@api.route('/api/health', methods=['GET'])
 def health_check():
     """Endpoint de salud para verificar que el servidor esté funcionando"""
     try:
         # Verificar que la base de datos esté accesible
-        db.session.execute('SELECT 1')
+        db.session.execute(text('SELECT 1'))
         return jsonify({
             'status': 'healthy',
             'message': 'Servidor funcionando correctamente',
             'timestamp': datetime.now().isoformat(),
             'database': 'connected',
-            'server': 'running'
+            'server': 'running',
+            'database_pool': pool_status(),
+            'database_replicas': replica_router.status(),
+            'password_hashing': password_hasher.metrics.to_dict()
         })
     except Exception as e:
         return jsonify({
@@ -174,37 +203,49 @@ def health_check():
             'error': str(e)
         }), 500
 
-@app.route('/api/status', methods=['GET'])
+@api.route('/api/status', methods=['GET'])
 def server_status():
     """Endpoint simple para verificar que el servidor esté respondiendo"""
     response = jsonify({
         'status': 'online',
         'message': 'Servidor en línea',
         'timestamp': datetime.now().isoformat(),
-        'jwt_secret_set': bool(app.config.get('JWT_SECRET_KEY')),
-        'jwt_secret_length': len(app.config.get('JWT_SECRET_KEY', ''))
+        'jwt_secret_set': bool(current_app.config.get('JWT_SECRET_KEY')),
+        'jwt_secret_length': len(current_app.config.get('JWT_SECRET_KEY', ''))
     })
     response.headers.add('Access-Control-Allow-Origin', '*')
     response.headers.add('Access-Control-Allow-Credentials', 'true')
     return response
 
-@app.route('/api/auth/verify', methods=['GET'])
+@api.route('/api/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Métricas de todos los workers en formato de texto de Prometheus.
+
+    Con METRICS_TOKEN se exige ese token; sin él, solo administradores con sesión.
+    """
+    token = current_app.config.get('METRICS_TOKEN')
+    if token:
+        if request.headers.get('Authorization') != f'Bearer {token}':
+            return jsonify({'error': 'Token de métricas inválido'}), 401
+    else:
+        verify_jwt_in_request()
+        current_user = get_current_user()
+        if not current_user or current_user.role not in ['superadmin', 'admin']:
+            return jsonify({'error': 'No tienes permisos para ver las métricas'}), 403
+    return Response(prometheus_text(), mimetype='text/plain; version=0.0.4')
+
+@api.route('/api/auth/verify', methods=['GET'])
 @jwt_required()
 def verify_token():
     """Verificar si el token es válido y obtener información del usuario"""
     try:
-        print("Verifying token...")
-        print(f"JWT Secret Key: {app.config.get('JWT_SECRET_KEY', 'NOT SET')[:10]}...")
-        user_id = get_jwt_identity()
-        print(f"User ID from token: {user_id}")
-        user = User.query.get(user_id)
-        print(f"User found: {user is not None}")
+        user = get_current_user()
         
         if not user:
-            print("User not found in database")
+            logger.warning('Usuario del token no encontrado', extra={'user_id': get_jwt_identity()})
             return jsonify({'error': 'Usuario no encontrado'}), 404
-            
-        print(f"Token verification successful for user: {user.name}")
+        
+        logger.debug('Token verificado', extra={'user_id': user.id})
         response = jsonify({
             'valid': True,
             'user': {
@@ -217,11 +258,8 @@ def verify_token():
         response.headers.add('Access-Control-Allow-Origin', '*')
         response.headers.add('Access-Control-Allow-Credentials', 'true')
         return response
-    except Exception as e:
-        print(f"Error in token verification: {e}")
-        print(f"Error type: {type(e)}")
-        import traceback
-        print(f"Traceback: {traceback.format_exc()}")
+    except Exception:
+        logger.exception('Error en la verificación del token')
         response = jsonify({'error': 'Token inválido'})
         response.headers.add('Access-Control-Allow-Origin', '*')
         response.headers.add('Access-Control-Allow-Credentials', 'true')
@@ -229,11 +267,13 @@ def verify_token():
 
 # ==================== USUARIOS ====================
 
-@app.route('/api/users', methods=['GET'])
+USER_FIELDS = ['id', 'email', 'name', 'role', 'is_active', 'created_at']
+
+@api.route('/api/users', methods=['GET'])
 @jwt_required()
 def get_users():
     try:
-        current_user = User.query.get(get_jwt_identity())
+        current_user = get_current_user()
         
         if not current_user:
             return jsonify({'error': 'Usuario no encontrado'}), 404
@@ -242,23 +282,16 @@ def get_users():
         if current_user.role not in ['superadmin', 'admin']:
             return jsonify({'error': 'No tienes permisos para ver usuarios'}), 403
         
-        users = User.query.all()
-        return jsonify([{
-            'id': u.id,
-            'email': u.email,
-            'name': u.name,
-            'role': u.role,
-            'is_active': u.is_active if hasattr(u, 'is_active') else True,
-            'created_at': u.created_at.isoformat()
-        } for u in users])
-    except Exception as e:
-        print(f"Error en get_users: {e}")
+        return list_response(User, USER_FIELDS, exclude=('password_hash',))
+    except Exception:
+        logger.exception('Error en get_users')
         return jsonify({'error': 'Error interno del servidor'}), 500
 
-@app.route('/api/users', methods=['POST'])
+@api.route('/api/users', methods=['POST'])
 @jwt_required()
+@invalidates('user')
 def create_user():
-    current_user = User.query.get(get_jwt_identity())
+    current_user = get_current_user()
     
     # Solo superadmin puede crear usuarios
     if current_user.role != 'superadmin':
@@ -277,7 +310,7 @@ def create_user():
         return jsonify({'error': 'El email ya está registrado'}), 400
     
     # Crear nuevo usuario
-    hashed_password = bcrypt.generate_password_hash(data['password']).decode('utf-8')
+    hashed_password = hash_password(data['password'])
     new_user = User(
         email=data['email'],
         password_hash=hashed_password,
@@ -298,10 +331,11 @@ def create_user():
         }
     }), 201
 
-@app.route('/api/users/<int:user_id>', methods=['PUT'])
+@api.route('/api/users/<int:user_id>', methods=['PUT'])
 @jwt_required()
+@invalidates('user')
 def update_user(user_id):
-    current_user = User.query.get(get_jwt_identity())
+    current_user = get_current_user()
     
     # Solo superadmin puede actualizar usuarios
     if current_user.role != 'superadmin':
@@ -316,16 +350,18 @@ def update_user(user_id):
     user.is_active = data.get('is_active', user.is_active)
     
     if data.get('password'):
-        user.password_hash = bcrypt.generate_password_hash(data['password']).decode('utf-8')
+        user.password_hash = hash_password(data['password'])
     
     db.session.commit()
+    invalidate_user(user_id)
     
     return jsonify({'message': 'Usuario actualizado exitosamente'})
 
-@app.route('/api/users/<int:user_id>', methods=['DELETE'])
+@api.route('/api/users/<int:user_id>', methods=['DELETE'])
 @jwt_required()
+@invalidates('user')
 def delete_user(user_id):
-    current_user = User.query.get(get_jwt_identity())
+    current_user = get_current_user()
     
     # Solo superadmin puede eliminar usuarios
     if current_user.role != 'superadmin':
@@ -338,27 +374,52 @@ def delete_user(user_id):
     user = User.query.get_or_404(user_id)
     db.session.delete(user)
     db.session.commit()
+    invalidate_user(user_id)
     
     return jsonify({'message': 'Usuario eliminado exitosamente'})
 
 # ==================== ESTUDIANTES ====================
 
-@app.route('/api/students', methods=['GET'])
+STUDENT_FIELDS = ['id', 'name', 'email', 'phone', 'parent_phone', 'status', 'enrollment_date', 'attendance_rate']
+
+@api.route('/api/students', methods=['GET'])
 @jwt_required()
+@replica_read
+@conditional('student', 'attendance', 'enrollment')
 def get_students():
-    students = Student.query.all()
-    return jsonify([{
-        'id': s.id,
-        'name': s.name,
-        'email': s.email,
-        'phone': s.phone,
-        'parent_phone': s.parent_phone,
-        'status': s.status,
-        'enrollment_date': s.enrollment_date.isoformat() if s.enrollment_date else None
-    } for s in students])
-
-@app.route('/api/students', methods=['POST'])
+    """Listado de estudiantes; acepta ?id=, ?status=, ?course_id= y ?attendance_below="""
+    try:
+        criteria = student_attendance_filters(request.args) + student_filters()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return list_response(Student, STUDENT_FIELDS, filters=criteria)
+
+def student_filters():
+    """Filtros del listado y la búsqueda de estudiantes: ?id=1,2, ?status= y ?course_id="""
+    criteria = parse_filters({'id': Student.id, 'status': Student.status})
+    course_ids = parse_filters({'course_id': Enrollment.course_id})
+    if course_ids:
+        criteria.append(Student.id.in_(db.session.query(Enrollment.student_id).filter(*course_ids)))
+    return criteria
+
+@api.route('/api/students/search', methods=['GET'])
 @jwt_required()
+@replica_read
+@conditional('student', 'enrollment')
+def search_students():
+    """Búsqueda por prefijo en nombre, email, teléfonos y notas, ordenada por relevancia"""
+    try:
+        query, limit = parse_search_args(request.args)
+        fields = parse_fields(STUDENT_FIELDS, [c.key for c in Student.__table__.columns])
+        criteria = student_filters()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    rows = find_students(query, fields, limit, criteria)
+    return jsonify([{f: serialize_value(row._mapping[f]) for f in fields} for row in rows])
+
+@api.route('/api/students', methods=['POST'])
+@jwt_required()
+@invalidates('student')
 def create_student():
     data = request.get_json()
     
@@ -374,6 +435,9 @@ def create_student():
     )
     
     db.session.add(new_student)
+    db.session.flush()
+    index_students(Student.id == new_student.id)
+    publish_stats(total_students=1 if new_student.status == 'activo' else 0)
     db.session.commit()
     
     return jsonify({
@@ -385,7 +449,7 @@ def create_student():
         }
     }), 201
 
-@app.route('/api/students/<int:student_id>', methods=['GET'])
+@api.route('/api/students/<int:student_id>', methods=['GET'])
 @jwt_required()
 def get_student(student_id):
     student = Student.query.get_or_404(student_id)
@@ -399,14 +463,24 @@ def get_student(student_id):
         'birth_date': student.birth_date.isoformat() if student.birth_date else None,
         'status': student.status,
         'enrollment_date': student.enrollment_date.isoformat(),
-        'notes': student.notes
+        'notes': student.notes,
+        'attendance': {
+            'present': student.attendance_present,
+            'absent': student.attendance_absent,
+            'justified': student.attendance_justified,
+            'late': student.attendance_late,
+            'total': student.attendance_total,
+            'rate': student.attendance_rate
+        }
     })
 
-@app.route('/api/students/<int:student_id>', methods=['PUT'])
+@api.route('/api/students/<int:student_id>', methods=['PUT'])
 @jwt_required()
+@invalidates('student')
 def update_student(student_id):
     student = Student.query.get_or_404(student_id)
     data = request.get_json()
+    was_active = student.status == 'activo'
     
     student.name = data.get('name', student.name)
     student.email = data.get('email', student.email)
@@ -419,39 +493,39 @@ def update_student(student_id):
     if data.get('birth_date'):
         student.birth_date = datetime.strptime(data['birth_date'], '%Y-%m-%d').date()
     
+    db.session.flush()
+    index_students(Student.id == student_id)
+    publish_stats(total_students=(student.status == 'activo') - was_active)
     db.session.commit()
     
     return jsonify({'message': 'Estudiante actualizado exitosamente'})
 
-@app.route('/api/students/<int:student_id>', methods=['DELETE'])
+@api.route('/api/students/<int:student_id>', methods=['DELETE'])
 @jwt_required()
+@invalidates('student')
 def delete_student(student_id):
     student = Student.query.get_or_404(student_id)
     db.session.delete(student)
+    unindex_student(student_id)
+    publish_stats(total_students=-1 if student.status == 'activo' else 0)
     db.session.commit()
     
     return jsonify({'message': 'Estudiante eliminado exitosamente'})
 
 # ==================== CURSOS ====================
 
-@app.route('/api/courses', methods=['GET'])
+COURSE_FIELDS = ['id', 'name', 'description', 'duration', 'price', 'max_students', 'teacher_id', 'status', 'created_at']
+
+@api.route('/api/courses', methods=['GET'])
 @jwt_required()
+@replica_read
+@conditional('course')
 def get_courses():
-    courses = Course.query.all()
-    return jsonify([{
-        'id': c.id,
-        'name': c.name,
-        'description': c.description,
-        'duration': c.duration,
-        'price': c.price,
-        'max_students': c.max_students,
-        'teacher_id': c.teacher_id,
-        'status': c.status,
-        'created_at': c.created_at.isoformat()
-    } for c in courses])
-
-@app.route('/api/courses', methods=['POST'])
+    return list_response(Course, COURSE_FIELDS)
+
+@api.route('/api/courses', methods=['POST'])
 @jwt_required()
+@invalidates('course')
 def create_course():
     data = request.get_json()
     
@@ -466,6 +540,7 @@ def create_course():
     )
     
     db.session.add(new_course)
+    publish_stats(total_courses=1 if new_course.status == 'activo' else 0)
     db.session.commit()
     
     return jsonify({
@@ -477,7 +552,7 @@ def create_course():
         }
     }), 201
 
-@app.route('/api/courses/<int:course_id>', methods=['GET'])
+@api.route('/api/courses/<int:course_id>', methods=['GET'])
 @jwt_required()
 def get_course(course_id):
     course = Course.query.get_or_404(course_id)
@@ -493,11 +568,13 @@ def get_course(course_id):
         'created_at': course.created_at.isoformat()
     })
 
-@app.route('/api/courses/<int:course_id>', methods=['PUT'])
+@api.route('/api/courses/<int:course_id>', methods=['PUT'])
 @jwt_required()
+@invalidates('course')
 def update_course(course_id):
     course = Course.query.get_or_404(course_id)
     data = request.get_json()
+    was_active = course.status == 'activo'
     
     course.name = data.get('name', course.name)
     course.description = data.get('description', course.description)
@@ -506,40 +583,61 @@ def update_course(course_id):
     course.max_students = data.get('max_students', course.max_students)
     course.teacher_id = data.get('teacher_id', course.teacher_id)
     course.status = data.get('status', course.status)
+    publish_stats(total_courses=(course.status == 'activo') - was_active)
     
     db.session.commit()
     
     return jsonify({'message': 'Curso actualizado exitosamente'})
 
-@app.route('/api/courses/<int:course_id>', methods=['DELETE'])
+@api.route('/api/courses/<int:course_id>', methods=['DELETE'])
 @jwt_required()
+@invalidates('course')
 def delete_course(course_id):
     course = Course.query.get_or_404(course_id)
     db.session.delete(course)
+    publish_stats(total_courses=-1 if course.status == 'activo' else 0)
     db.session.commit()
     
     return jsonify({'message': 'Curso eliminado exitosamente'})
 
 # ==================== CLASES ====================
 
-@app.route('/api/classes', methods=['GET'])
+CLASS_FIELDS = ['id', 'course_id', 'teacher_id', 'title', 'description', 'schedule', 'duration', 'room', 'status']
+
+@api.route('/api/classes', methods=['GET'])
 @jwt_required()
+@replica_read
+@conditional('class')
 def get_classes():
-    classes = Class.query.all()
-    return jsonify([{
-        'id': c.id,
-        'course_id': c.course_id,
-        'teacher_id': c.teacher_id,
-        'title': c.title,
-        'description': c.description,
-        'schedule': c.schedule.isoformat(),
-        'duration': c.duration,
-        'room': c.room,
-        'status': c.status
-    } for c in classes])
-
-@app.route('/api/classes', methods=['POST'])
+    try:
+        criteria = class_filters(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return list_response(Class, CLASS_FIELDS, sort_column=Class.schedule, filters=criteria)
+
+@api.route('/api/classes/upcoming', methods=['GET'])
+@jwt_required()
+@replica_read
+def get_upcoming_classes():
+    """Próximas clases no canceladas, en orden de horario (recorre solo ?limit= filas del índice)"""
+    try:
+        limit = upcoming_limit(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    columns = [getattr(Class, f) for f in CLASS_FIELDS]
+    rows = db.session.query(*columns, Course.name.label('course_name')).join(
+        Course, Course.id == Class.course_id
+    ).filter(
+        Class.schedule >= datetime.now(),
+        Class.status != 'cancelada'
+    ).order_by(Class.schedule, Class.id).limit(limit)
+
+    return jsonify([{key: serialize_value(value) for key, value in row._mapping.items()} for row in rows])
+
+@api.route('/api/classes', methods=['POST'])
 @jwt_required()
+@invalidates('class')
 def create_class():
     data = request.get_json()
     
@@ -555,6 +653,8 @@ def create_class():
     )
     
     db.session.add(new_class)
+    db.session.flush()
+    publish_class(new_class)
     db.session.commit()
     
     return jsonify({
@@ -566,23 +666,49 @@ def create_class():
         }
     }), 201
 
+@api.route('/api/classes/<int:class_id>/cancel', methods=['POST'])
+@jwt_required()
+@invalidates('class')
+def cancel_class(class_id):
+    """Cancelar una clase y avisar por email a los estudiantes activos del curso (desde la cola de trabajos)"""
+    class_session = Class.query.get_or_404(class_id)
+    if class_session.status == 'cancelada':
+        return jsonify({'error': 'La clase ya está cancelada'}), 409
+    if class_session.status == 'completada':
+        return jsonify({'error': 'No se puede cancelar una clase completada'}), 400
+    
+    data = request.get_json(silent=True) or {}
+    previous_status = class_session.status
+    class_session.status = 'cancelada'
+    publish_class(class_session, previous_status)
+    job = enqueue('class_cancelled', {'class_id': class_id, 'reason': data.get('reason')})
+    db.session.commit()
+    
+    return jsonify({
+        'message': 'Clase cancelada; los avisos se enviarán en segundo plano',
+        'class': {'id': class_session.id, 'status': class_session.status},
+        'job': job_dict(job)
+    })
+
 # ==================== MATRÍCULAS ====================
 
-@app.route('/api/enrollments', methods=['GET'])
+ENROLLMENT_FIELDS = ['id', 'student_id', 'course_id', 'enrollment_date', 'status', 'final_grade', 'attendance_rate']
+
+@api.route('/api/enrollments', methods=['GET'])
 @jwt_required()
+@replica_read
+@conditional('enrollment', 'attendance')
 def get_enrollments():
-    enrollments = Enrollment.query.all()
-    return jsonify([{
-        'id': e.id,
-        'student_id': e.student_id,
-        'course_id': e.course_id,
-        'enrollment_date': e.enrollment_date.isoformat(),
-        'status': e.status,
-        'final_grade': e.final_grade
-    } for e in enrollments])
-
-@app.route('/api/enrollments', methods=['POST'])
+    try:
+        criteria = enrollment_attendance_filters(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return list_response(Enrollment, ENROLLMENT_FIELDS, sort_column=Enrollment.enrollment_date, descending=True,
+                         filters=criteria)
+
+@api.route('/api/enrollments', methods=['POST'])
 @jwt_required()
+@invalidates('enrollment')
 def create_enrollment():
     data = request.get_json()
     
@@ -593,6 +719,11 @@ def create_enrollment():
     )
     
     db.session.add(new_enrollment)
+    db.session.flush()
+    # Calificaciones y asistencia registradas antes de la matrícula
+    recompute_final_grades(Enrollment.id == new_enrollment.id)
+    recompute_attendance_counters(Enrollment.id == new_enrollment.id)
+    publish_activity('enrollment', new_enrollment)
     db.session.commit()
     
     return jsonify({
@@ -606,23 +737,23 @@ def create_enrollment():
 
 # ==================== PAGOS ====================
 
-@app.route('/api/payments', methods=['GET'])
+PAYMENT_FIELDS = ['id', 'student_id', 'amount', 'type', 'description', 'date', 'status', 'payment_method']
+
+@api.route('/api/payments', methods=['GET'])
 @jwt_required()
+@replica_read
+@conditional('payment')
 def get_payments():
-    payments = Payment.query.all()
-    return jsonify([{
-        'id': p.id,
-        'student_id': p.student_id,
-        'amount': p.amount,
-        'type': p.type,
-        'description': p.description,
-        'date': p.date.isoformat(),
-        'status': p.status,
-        'payment_method': p.payment_method
-    } for p in payments])
-
-@app.route('/api/payments', methods=['POST'])
+    """Listado de pagos, más recientes primero; acepta ?status=, ?type= y ?student_id="""
+    try:
+        criteria = parse_filters({'status': Payment.status, 'type': Payment.type, 'student_id': Payment.student_id})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return list_response(Payment, PAYMENT_FIELDS, sort_column=Payment.date, descending=True, filters=criteria)
+
+@api.route('/api/payments', methods=['POST'])
 @jwt_required()
+@invalidates('payment')
 def create_payment():
     data = request.get_json()
     
@@ -637,6 +768,9 @@ def create_payment():
     )
     
     db.session.add(new_payment)
+    db.session.flush()
+    record_payment(new_payment)
+    publish_payment(new_payment)
     db.session.commit()
     
     return jsonify({
@@ -648,23 +782,33 @@ def create_payment():
         }
     }), 201
 
+@api.route('/api/payments/reminders', methods=['POST'])
+@jwt_required()
+def send_payment_reminders():
+    """Encolar recordatorios por email para todos los pagos pendientes (un email por estudiante)"""
+    current_user = get_current_user()
+    if current_user.role not in ['superadmin', 'admin']:
+        return jsonify({'error': 'No tienes permisos para enviar recordatorios'}), 403
+    
+    # Si ya hay un envío en cola, se devuelve ese en lugar de duplicar los emails
+    job = enqueue('payment_reminders', {'requested_by': current_user.id}, unique=True)
+    db.session.commit()
+    return jsonify({'message': 'Recordatorios en cola', 'job': job_dict(job)}), 202
+
 # ==================== ASISTENCIA ====================
 
-@app.route('/api/attendance', methods=['GET'])
+ATTENDANCE_FIELDS = ['id', 'student_id', 'class_id', 'date', 'status', 'notes']
+
+@api.route('/api/attendance', methods=['GET'])
 @jwt_required()
+@replica_read
+@conditional('attendance')
 def get_attendance():
-    attendance = Attendance.query.all()
-    return jsonify([{
-        'id': a.id,
-        'student_id': a.student_id,
-        'class_id': a.class_id,
-        'date': a.date.isoformat(),
-        'status': a.status,
-        'notes': a.notes
-    } for a in attendance])
-
-@app.route('/api/attendance', methods=['POST'])
+    return list_response(Attendance, ATTENDANCE_FIELDS, sort_column=Attendance.date, descending=True)
+
+@api.route('/api/attendance', methods=['POST'])
 @jwt_required()
+@invalidates('attendance')
 def create_attendance():
     data = request.get_json()
     
@@ -677,6 +821,15 @@ def create_attendance():
     )
     
     db.session.add(new_attendance)
+    try:
+        db.session.flush()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({'error': 'La asistencia de este estudiante ya está registrada para esa clase y fecha'}), 409
+    course_id = db.session.query(Class.course_id).filter(Class.id == new_attendance.class_id).scalar()
+    record_attendance(new_attendance, course_id)
+    record_student_attendance(new_attendance, course_id)
+    publish_attendance(course_id, {new_attendance.status: 1})
     db.session.commit()
     
     return jsonify({
@@ -688,28 +841,131 @@ def create_attendance():
         }
     }), 201
 
+ATTENDANCE_STATUSES = ('presente', 'ausente', 'justificado', 'tardanza')
+
+@api.route('/api/classes/<int:class_id>/attendance', methods=['POST'])
+@jwt_required()
+@invalidates('attendance')
+def record_class_attendance(class_id):
+    """Pasar lista: registrar la asistencia de toda la clase en una sola transacción.
+
+    Espera ``{"date": "YYYY-MM-DD", "records": [{"student_id", "status", "notes"}]}``.
+    Reenviar la misma clase y fecha actualiza los registros existentes.
+    """
+    class_session = Class.query.get_or_404(class_id)
+    data = request.get_json() or {}
+    
+    try:
+        attendance_date = datetime.strptime(data.get('date', ''), '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({'error': 'El campo date es requerido con formato YYYY-MM-DD'}), 400
+    
+    records = data.get('records')
+    if not isinstance(records, list) or not records:
+        return jsonify({'error': 'El campo records debe ser una lista no vacía'}), 400
+    
+    # Validar filas y detectar estudiantes inexistentes con una sola consulta
+    student_ids = {r.get('student_id') for r in records if isinstance(r, dict) and isinstance(r.get('student_id'), int)}
+    known_students = {sid for (sid,) in db.session.query(Student.id).filter(Student.id.in_(student_ids))}
+    existing = {a.student_id: a for a in db.session.query(
+        Attendance.student_id, Attendance.status, Attendance.notes
+    ).filter(Attendance.class_id == class_id, Attendance.date == attendance_date,
+             Attendance.student_id.in_(known_students))}
+    
+    results = []
+    rows = {}
+    for index, record in enumerate(records):
+        student_id = record.get('student_id') if isinstance(record, dict) else None
+        status = record.get('status', 'presente') if isinstance(record, dict) else None
+        
+        if not isinstance(student_id, int):
+            error = 'student_id es requerido'
+        elif student_id not in known_students:
+            error = 'Estudiante no encontrado'
+        elif status not in ATTENDANCE_STATUSES:
+            error = f'Estado inválido: {status}'
+        elif student_id in rows:
+            error = 'Estudiante duplicado en la lista'
+        else:
+            error = None
+        
+        if error:
+            results.append({'index': index, 'student_id': student_id, 'result': 'error', 'error': error})
+            continue
+        
+        notes = record.get('notes')
+        previous = existing.get(student_id)
+        if previous is None:
+            outcome = 'created'
+        elif previous.status == status and previous.notes == notes:
+            outcome = 'unchanged'
+        else:
+            outcome = 'updated'
+        
+        rows[student_id] = {'student_id': student_id, 'class_id': class_id, 'date': attendance_date,
+                            'status': status, 'notes': notes}
+        results.append({'index': index, 'student_id': student_id, 'result': outcome, 'status': status})
+    
+    # Inserción por lotes con upsert sobre (student_id, class_id, date)
+    changed = [rows[r['student_id']] for r in results if r['result'] in ('created', 'updated')]
+    if changed:
+        stmt = dialect_insert(Attendance.__table__).values(changed)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['student_id', 'class_id', 'date'],
+            set_={'status': stmt.excluded.status, 'notes': stmt.excluded.notes}
+        )
+        db.session.execute(stmt)
+        
+        deltas = {}
+        student_deltas = {}
+        for row in changed:
+            previous = existing.get(row['student_id'])
+            counts = student_deltas.setdefault(row['student_id'], {})
+            if previous is not None:
+                deltas[previous.status] = deltas.get(previous.status, 0) - 1
+                counts[previous.status] = counts.get(previous.status, 0) - 1
+            deltas[row['status']] = deltas.get(row['status'], 0) + 1
+            counts[row['status']] = counts.get(row['status'], 0) + 1
+        apply_attendance_deltas(attendance_date, class_session.course_id, deltas)
+        apply_attendance_counts(class_session.course_id, student_deltas)
+        publish_attendance(class_session.course_id, deltas)
+    
+    db.session.commit()
+    
+    summary = {outcome: sum(1 for r in results if r['result'] == outcome)
+               for outcome in ('created', 'updated', 'unchanged', 'error')}
+    return jsonify({
+        'message': 'Asistencia registrada exitosamente',
+        'class_id': class_id,
+        'date': attendance_date.isoformat(),
+        'summary': summary,
+        'results': results
+    })
+
 # ==================== CALIFICACIONES ====================
 
-@app.route('/api/grades', methods=['GET'])
+GRADE_FIELDS = ['id', 'student_id', 'course_id', 'grade', 'type', 'description', 'date', 'weight']
+
+@api.route('/api/grades', methods=['GET'])
 @jwt_required()
+@replica_read
+@conditional('grade')
 def get_grades():
-    grades = Grade.query.all()
-    return jsonify([{
-        'id': g.id,
-        'student_id': g.student_id,
-        'course_id': g.course_id,
-        'grade': g.grade,
-        'type': g.type,
-        'description': g.description,
-        'date': g.date.isoformat(),
-        'weight': g.weight
-    } for g in grades])
-
-@app.route('/api/grades', methods=['POST'])
+    return list_response(Grade, GRADE_FIELDS, sort_column=Grade.date, descending=True)
+
+@api.route('/api/grades', methods=['POST'])
 @jwt_required()
+@invalidates('grade', 'enrollment')
 def create_grade():
     data = request.get_json()
     
+    try:
+        float(data['grade'])
+        if data.get('weight') is not None:
+            float(data['weight'])
+    except (TypeError, ValueError):
+        return jsonify({'error': 'La calificación y el peso deben ser numéricos'}), 400
+    
     new_grade = Grade(
         student_id=data['student_id'],
         course_id=data['course_id'],
@@ -720,6 +976,8 @@ def create_grade():
     )
     
     db.session.add(new_grade)
+    # Nota final de la matrícula actualizada en la misma transacción
+    record_grade(new_grade)
     db.session.commit()
     
     return jsonify({
@@ -733,127 +991,276 @@ def create_grade():
 
 # ==================== DASHBOARD ====================
 
-@app.route('/api/dashboard/stats', methods=['GET'])
+@api.route('/api/dashboard/stats', methods=['GET'])
 @jwt_required()
+@replica_read
+@conditional('student', 'course', 'class', 'payment', 'attendance')
 def get_dashboard_stats():
+    """Totales del dashboard y ``event_id``, el último evento ya incluido en ellos.
+
+    El cliente abre el stream con ese id como Last-Event-ID. Si se registró
+    un evento mientras se calculaban los totales, se vuelven a calcular para
+    que no se pierda ni se cuente dos veces.
+    """
+    for _ in range(3):
+        event_id = latest_event_id()
+        stats = dashboard_stats()
+        if latest_event_id() == event_id:
+            break
+    return jsonify(dict(stats, event_id=event_id))
+
+def dashboard_stats():
     # Estadísticas generales
     total_students = Student.query.filter_by(status='activo').count()
     total_courses = Course.query.filter_by(status='activo').count()
     total_classes = Class.query.filter_by(status='programada').count()
     
-    # Ingresos del mes actual
-    current_month = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    monthly_payments = Payment.query.filter(
-        Payment.date >= current_month,
-        Payment.status == 'pagado'
-    ).all()
-    monthly_income = sum(p.amount for p in monthly_payments)
-    
-    # Asistencia promedio
-    attendance_records = Attendance.query.all()
-    if attendance_records:
-        present_count = sum(1 for a in attendance_records if a.status == 'presente')
-        attendance_rate = (present_count / len(attendance_records)) * 100
-    else:
-        attendance_rate = 0
+    # Ingresos del mes actual (rollup diario de ingresos)
+    current_month = datetime.now().date().replace(day=1)
+    monthly_income = income_since(current_month)
     
-    return jsonify({
+    # Asistencia por estado y promedio (contadores del rollup de asistencia)
+    attendance = attendance_counts()
+    return {
         'total_students': total_students,
         'total_courses': total_courses,
         'total_classes': total_classes,
         'monthly_income': monthly_income,
-        'attendance_rate': round(attendance_rate, 2)
-    })
+        'attendance': attendance,
+        'attendance_rate': round(attendance_rate(attendance), 2)
+    }
 
-@app.route('/api/dashboard/recent-activities', methods=['GET'])
+@api.route('/api/dashboard/recent-activities', methods=['GET'])
 @jwt_required()
+@replica_read
+@conditional('enrollment', 'payment', 'student', 'course')
 def get_recent_activities():
-    # Actividades recientes
-    recent_enrollments = Enrollment.query.order_by(Enrollment.enrollment_date.desc()).limit(5).all()
-    recent_payments = Payment.query.order_by(Payment.date.desc()).limit(5).all()
-    
-    activities = []
-    
-    for enrollment in recent_enrollments:
-        student = Student.query.get(enrollment.student_id)
-        course = Course.query.get(enrollment.course_id)
-        activities.append({
-            'type': 'enrollment',
-            'message': f'{student.name} se matriculó en {course.name}',
-            'date': enrollment.enrollment_date.isoformat()
-        })
-    
-    for payment in recent_payments:
-        student = Student.query.get(payment.student_id)
-        activities.append({
-            'type': 'payment',
-            'message': f'{student.name} realizó un pago de ${payment.amount}',
-            'date': payment.date.isoformat()
-        })
-    
-    # Ordenar por fecha
-    activities.sort(key=lambda x: x['date'], reverse=True)
-    
-    return jsonify(activities[:10])
+    """Actividades recientes; acepta ?limit, ?before (ISO 8601), ?after (cursor del header Link) y ?type=enrollment,payment"""
+    try:
+        limit = min(int(request.args.get('limit', 10)), 100)
+        if limit < 1:
+            raise ValueError
+    except ValueError:
+        return jsonify({'error': 'El parámetro limit debe ser un entero mayor que 0'}), 400
+    
+    before = None
+    if request.args.get('after'):
+        try:
+            before = decode_activity_cursor(request.args['after'])
+        except PaginationError as e:
+            return jsonify({'error': str(e)}), 400
+    elif request.args.get('before'):
+        try:
+            before = (datetime.fromisoformat(request.args['before']), None, None)
+        except ValueError:
+            return jsonify({'error': 'El parámetro before debe ser una fecha ISO 8601'}), 400
+    
+    types = ACTIVITY_TYPES
+    if request.args.get('type'):
+        types = [t.strip() for t in request.args['type'].split(',')]
+        invalid = [t for t in types if t not in ACTIVITY_TYPES]
+        if invalid:
+            return jsonify({'error': f'Tipo de actividad inválido: {invalid[0]}'}), 400
+    
+    activities = recent_activities(limit, before, types)
+    
+    response = jsonify(activities)
+    if len(activities) == limit and activities[-1]['date']:
+        args = request.args.to_dict()
+        args.pop('before', None)
+        args['after'] = activity_cursor(activities[-1])
+        response.headers['Link'] = f'<{request.base_url}?{urlencode(args)}>; rel="next"'
+    return response
+
+# ==================== STREAM DEL DASHBOARD ====================
+
+def _last_event_id():
+    raw = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        return int(raw) if raw else None
+    except ValueError:
+        return None
+
+@api.route('/api/stream/dashboard', methods=['GET'])
+@jwt_required(locations=['headers', 'query_string'])
+def stream_dashboard():
+    """Server-sent events con los cambios del dashboard (pagos, matrículas, asistencia, clases y totales).
+
+    EventSource no puede enviar headers, así que el token también se acepta
+    como ``?jwt=``. Al reconectar con ``Last-Event-ID`` se reenvían los
+    eventos perdidos; si ya no están en el registro se envía ``reset`` para
+    que el cliente recargue todo. El stream se cierra tras
+    ``SSE_STREAM_TIMEOUT`` segundos y el navegador reconecta solo, lo que
+    reparte los streams entre los workers.
+    """
+    if not event_broker.subscribe():
+        response = jsonify({'error': 'Demasiados streams abiertos en este servidor, reintente en unos segundos'})
+        response.headers['Retry-After'] = '10'
+        return response, 503
+    
+    config = current_app.config
+    heartbeat = config['SSE_HEARTBEAT_INTERVAL']
+    timeout = config['SSE_STREAM_TIMEOUT']
+    retry_ms = config['SSE_RETRY_MS']
+    last_id = _last_event_id()
+    
+    def stream():
+        after = last_id
+        yield f'retry: {retry_ms}\n\n'
+        if after is not None and not replay_available(after):
+            after = latest_event_id()
+            yield f'id: {after}\nevent: reset\ndata: {{"reason": "replay"}}\n\n'
+        elif after is None:
+            after = latest_event_id()
+        db.session.close()
+        
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            events = event_broker.wait(after, min(heartbeat, max(deadline - time.monotonic(), 0)))
+            if events is None:
+                # El stream quedó atrás de lo que el broker guarda en memoria
+                events = read_events(after)
+                db.session.close()
+            if not events:
+                yield ': ping\n\n'
+                continue
+            for event in events:
+                yield format_event(event)
+                after = event.id
+    
+    response = Response(stream_with_context(stream()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.call_on_close(event_broker.unsubscribe)
+    return response
 
 # ==================== REPORTES ====================
 
-@app.route('/api/reports/student-performance', methods=['GET'])
+@api.route('/api/reports/summary', methods=['GET'])
 @jwt_required()
+@replica_read
+@conditional('student', 'class', 'enrollment', 'payment', 'attendance', 'grade')
+def get_reports_summary():
+    """Reporte agregado (rendimiento, finanzas, asistencia, matrículas) calculado en SQL"""
+    try:
+        filters = ReportFilters.from_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    sections = SECTIONS
+    if request.args.get('section'):
+        sections = [section.strip() for section in request.args['section'].split(',')]
+        invalid = [section for section in sections if section not in SECTIONS]
+        if invalid:
+            return jsonify({'error': f'Sección de reporte inválida: {invalid[0]}'}), 400
+    
+    return jsonify(build_summary(filters, sections))
+
+@api.route('/api/reports/student-performance', methods=['GET'])
+@jwt_required()
+@replica_read
+@conditional('student', 'class', 'enrollment', 'attendance', 'grade')
 def get_student_performance():
-    students = Student.query.all()
-    performance_data = []
+    """Promedio ponderado y asistencia por estudiante, transmitido fila por fila"""
+    try:
+        filters = ReportFilters.from_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    performance_data = ({
+        'student_id': row['student_id'],
+        'student_name': row['student_name'],
+        'status': row['status'],
+        'average_grade': row['average_grade'],
+        'attendance_rate': row['attendance_rate']
+    } for row in iter_student_rows(filters))
+    
+    return Response(stream_with_context(stream_json_array(performance_data)), mimetype='application/json')
+
+@api.route('/api/reports/financial', methods=['GET'])
+@jwt_required()
+@replica_read
+@conditional('payment', 'enrollment')
+def get_financial_report():
+    """Reporte financiero por periodos calendario (day, week, month, quarter)"""
+    granularity = request.args.get('granularity', 'month')
+    if granularity not in GRANULARITIES:
+        return jsonify({'error': f'Granularidad inválida: {granularity}'}), 400
     
-    for student in students:
-        grades = Grade.query.filter_by(student_id=student.id).all()
-        if grades:
-            avg_grade = sum(g.grade for g in grades) / len(grades)
-        else:
-            avg_grade = 0
+    try:
+        filters = ReportFilters.from_args(request.args)
         
-        attendance_records = Attendance.query.filter_by(student_id=student.id).all()
-        if attendance_records:
-            present_count = sum(1 for a in attendance_records if a.status == 'presente')
-            attendance_rate = (present_count / len(attendance_records)) * 100
-        else:
-            attendance_rate = 0
+        # Por defecto: los últimos 6 periodos hasta hoy
+        if not filters.date_to:
+            filters.date_to = datetime.now().date()
+        if not filters.date_from:
+            filters.date_from = shift_period(period_start(filters.date_to, granularity), granularity, -5)
+        if filters.date_from > filters.date_to:
+            return jsonify({'error': 'date_from no puede ser posterior a date_to'}), 400
         
-        performance_data.append({
-            'student_id': student.id,
-            'student_name': student.name,
-            'average_grade': round(avg_grade, 2),
-            'attendance_rate': round(attendance_rate, 2)
-        })
+        report = financial_report(filters, granularity)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    return jsonify(performance_data)
+    if granularity == 'month':
+        report['monthly_income'] = {p['period'][:7]: p['total'] for p in report['periods']}
+    return jsonify(report)
 
-@app.route('/api/reports/financial', methods=['GET'])
+# ==================== IMPORTACIÓN MASIVA ====================
+
+@api.route('/api/import/<entity>', methods=['POST'])
 @jwt_required()
-def get_financial_report():
-    # Reporte financiero
-    payments = Payment.query.filter_by(status='pagado').all()
-    
-    total_income = sum(p.amount for p in payments)
-    
-    # Ingresos por tipo
-    income_by_type = {}
-    for payment in payments:
-        if payment.type not in income_by_type:
-            income_by_type[payment.type] = 0
-        income_by_type[payment.type] += payment.amount
-    
-    # Ingresos por mes (últimos 6 meses)
-    monthly_income = {}
-    for i in range(6):
-        month_start = datetime.now().replace(day=1) - timedelta(days=30*i)
-        month_end = month_start.replace(day=28) + timedelta(days=4)
-        month_end = month_end.replace(day=1) - timedelta(days=1)
-        
-        month_payments = [p for p in payments if month_start <= p.date <= month_end]
-        monthly_income[month_start.strftime('%Y-%m')] = sum(p.amount for p in month_payments)
+def import_data(entity):
+    """Importar estudiantes, matrículas o pagos desde CSV o NDJSON por lotes"""
+    if entity not in IMPORTERS:
+        return jsonify({'error': f'Entidad no importable: {entity}'}), 400
+    
+    upload = request.files.get('file')
+    if upload:
+        stream, filename, content_type = upload.stream, upload.filename, upload.content_type
+    else:
+        stream, filename, content_type = request.stream, None, request.content_type
+    
+    fmt = request.args.get('format') or detect_format(filename, content_type)
+    if fmt not in IMPORT_FORMATS:
+        return jsonify({'error': 'Formato no soportado, use csv o ndjson'}), 400
+    
+    report = import_records(entity, iter_records(stream, fmt))
+    if report.inserted:
+        # Una importación cambia demasiado para describirla con deltas: el dashboard se recarga
+        publish_event('reset', {'reason': 'import', 'entity': entity})
+        bump_versions(IMPORTERS[entity][0].__tablename__)
+    return jsonify(report.to_dict())
+
+# ==================== TRABAJOS EN SEGUNDO PLANO ====================
+
+@api.route('/api/jobs/<int:job_id>', methods=['GET'])
+@jwt_required()
+def get_job(job_id):
+    """Estado de un trabajo de la cola (ej. el de un envío de recordatorios)"""
+    return jsonify(job_dict(Job.query.get_or_404(job_id)))
+
+# ==================== EXPORTACIÓN ====================
+
+@api.route('/api/export/<entity>', methods=['GET'])
+@jwt_required()
+@replica_read
+def export_data(entity):
+    """Exportar una entidad completa como CSV o NDJSON, transmitida por lotes"""
+    if entity not in EXPORTS:
+        return jsonify({'error': f'Entidad no exportable: {entity}'}), 400
     
-    return jsonify({
-        'total_income': total_income,
-        'income_by_type': income_by_type,
-        'monthly_income': monthly_income
-    }) 
\ No newline at end of file
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': 'Formato no soportado, use csv o ndjson'}), 400
+    
+    try:
+        filters = ReportFilters.from_args(request.args)
+        columns = export_columns(entity)
+        fields = parse_fields(columns, columns)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    response = Response(stream_with_context(iter_export(entity, filters, fields, fmt)), mimetype=MIMETYPES[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename={entity}.{fmt}'
+    return response
@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta
+from models import Class
+
+# Clases devueltas por /api/classes/upcoming si no se indica ?limit=
+UPCOMING_DEFAULT_LIMIT = 5
+UPCOMING_MAX_LIMIT = 50
+
+
+def _parse_datetime(name, value):
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'El parámetro {name} debe tener formato YYYY-MM-DD o YYYY-MM-DDTHH:MM')
+    if parsed.tzinfo is not None:
+        raise ValueError(f'El parámetro {name} debe ser una hora local, sin zona horaria')
+    return parsed
+
+
+def _parse_int(name, value):
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f'El parámetro {name} debe ser un entero')
+
+
+def class_filters(args):
+    """Criterios de ?from=&to=&teacher_id=&room=&course_id= para el listado de clases.
+
+    ``from`` y ``to`` aceptan fecha o fecha y hora; ``to`` con solo fecha
+    incluye el día completo y con hora es exclusivo. El rango se resuelve
+    con el índice ix_class_schedule. Lanza ValueError si algún parámetro es
+    inválido.
+    """
+    criteria = []
+    start = end = None
+    if args.get('from'):
+        start = _parse_datetime('from', args['from'])
+        criteria.append(Class.schedule >= start)
+    if args.get('to'):
+        end = _parse_datetime('to', args['to'])
+        if len(args['to']) == 10:
+            end += timedelta(days=1)
+        criteria.append(Class.schedule < end)
+    if start and end and start >= end:
+        raise ValueError('from debe ser anterior a to')
+
+    for name, column in (('teacher_id', Class.teacher_id), ('course_id', Class.course_id)):
+        if args.get(name):
+            criteria.append(column == _parse_int(name, args[name]))
+    if args.get('room'):
+        criteria.append(Class.room == args['room'])
+    return criteria
+
+
+def upcoming_limit(args):
+    """Leer ?limit= de /api/classes/upcoming acotado a UPCOMING_MAX_LIMIT"""
+    if not args.get('limit'):
+        return UPCOMING_DEFAULT_LIMIT
+    limit = _parse_int('limit', args['limit'])
+    if limit < 1:
+        raise ValueError('El parámetro limit debe ser mayor que 0')
+    return min(limit, UPCOMING_MAX_LIMIT)
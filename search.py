@@ -0,0 +1,152 @@
+import re
+from sqlalchemy import column, func, literal_column, select, table
+from models import db, Student
+
+# Resultados de /api/students/search si no se indica ?limit=
+SEARCH_DEFAULT_LIMIT = 10
+SEARCH_MAX_LIMIT = 50
+
+# Columnas indexadas y su peso en el ranking bm25 de SQLite (el nombre pesa más que las notas)
+SEARCH_COLUMNS = ('name', 'email', 'phone', 'parent_phone', 'notes')
+SEARCH_WEIGHTS = (10.0, 5.0, 2.0, 2.0, 1.0)
+
+# Coincidencias que se ordenan por relevancia en SQLite; con prefijos muy cortos (ej. "m")
+# ordenar todas costaría cientos de ms con 100k estudiantes, y al escribir más letras
+# el conjunto se reduce por debajo de este límite y el orden vuelve a ser exacto
+SEARCH_CANDIDATES = 1000
+
+# Índice FTS5 de SQLite: tabla virtual propia con rowid = student.id
+SEARCH_TABLE = 'student_search'
+student_search = table(SEARCH_TABLE, column('rowid'), *(column(name) for name in SEARCH_COLUMNS))
+
+# Documento de búsqueda en minúsculas (sin índice en dialectos distintos de SQLite y PostgreSQL)
+SEARCH_DOCUMENT = "lower(" + " || ' ' || ".join(f"coalesce({name}, '')" for name in SEARCH_COLUMNS) + ")"
+
+# PostgreSQL: unaccent() es STABLE y no se puede indexar, así que se envuelve en una función
+# IMMUTABLE; el documento indexado con trigramas y el de las consultas deben coincidir
+SEARCH_UNACCENT = 'search_unaccent'
+SEARCH_INDEX = 'ix_student_search_unaccent_trgm'
+SEARCH_PG_DOCUMENT = f'{SEARCH_UNACCENT}({SEARCH_DOCUMENT})'
+
+TERM_PATTERN = re.compile(r'\w+')
+
+
+def _dialect(bind):
+    return bind.dialect.name
+
+
+def create_search_index(conn):
+    """Migración: crear el índice de búsqueda del dialecto y poblarlo con los estudiantes existentes"""
+    dialect = _dialect(conn)
+    if dialect == 'sqlite':
+        conn.exec_driver_sql(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5('
+            f'{", ".join(SEARCH_COLUMNS)}, tokenize="unicode61 remove_diacritics 2", prefix="2 3")')
+        conn.execute(student_search.delete())
+        conn.execute(_index_insert())
+    elif dialect == 'postgresql':
+        conn.exec_driver_sql('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        conn.exec_driver_sql('CREATE EXTENSION IF NOT EXISTS unaccent')
+        conn.exec_driver_sql(
+            f'CREATE OR REPLACE FUNCTION {SEARCH_UNACCENT}(text) RETURNS text '
+            "LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT "
+            "AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$")
+        conn.exec_driver_sql(
+            f'CREATE INDEX IF NOT EXISTS {SEARCH_INDEX} ON student USING gin (({SEARCH_PG_DOCUMENT}) gin_trgm_ops)')
+
+
+def unaccent_search_index(conn):
+    """Migración: reemplazar el índice de trigramas de PostgreSQL por uno que ignora acentos"""
+    if _dialect(conn) == 'postgresql':
+        conn.exec_driver_sql('DROP INDEX IF EXISTS ix_student_search_trgm')
+        create_search_index(conn)
+
+
+def _index_insert(*criteria):
+    columns = [getattr(Student, name) for name in SEARCH_COLUMNS]
+    return student_search.insert().from_select(
+        ['rowid', *SEARCH_COLUMNS], select(Student.id, *columns).where(*criteria))
+
+
+def index_students(*criteria):
+    """Reindexar los estudiantes que cumplen ``criteria`` (en la transacción actual).
+
+    Solo SQLite necesita mantener el índice a mano; en PostgreSQL el índice
+    de trigramas está sobre la propia tabla student.
+    """
+    if _dialect(db.session.get_bind()) != 'sqlite':
+        return
+    db.session.execute(student_search.delete().where(
+        student_search.c.rowid.in_(select(Student.id).where(*criteria))))
+    db.session.execute(_index_insert(*criteria))
+
+
+def index_student_rows(rows):
+    """Acción tras importar estudiantes: indexar las filas insertadas"""
+    index_students(Student.email.in_({row['email'] for row in rows}))
+
+
+def unindex_student(student_id):
+    """Quitar un estudiante del índice (en la transacción actual)"""
+    if _dialect(db.session.get_bind()) == 'sqlite':
+        db.session.execute(student_search.delete().where(student_search.c.rowid == student_id))
+
+
+def search_terms(text):
+    """Palabras de la consulta, sin operadores ni comillas"""
+    return TERM_PATTERN.findall(text.lower())
+
+
+def parse_search_args(args):
+    """Leer ?q=&limit= de /api/students/search; lanza ValueError si son inválidos"""
+    query = (args.get('q') or '').strip()
+    if not query:
+        raise ValueError('El parámetro q es requerido')
+    if not args.get('limit'):
+        return query, SEARCH_DEFAULT_LIMIT
+    try:
+        limit = int(args['limit'])
+    except ValueError:
+        raise ValueError('El parámetro limit debe ser un entero')
+    if limit < 1:
+        raise ValueError('El parámetro limit debe ser mayor que 0')
+    return query, min(limit, SEARCH_MAX_LIMIT)
+
+
+def find_students(query, fields, limit=SEARCH_DEFAULT_LIMIT, criteria=()):
+    """Estudiantes que contienen todas las palabras de ``query`` como prefijo, los más relevantes primero.
+
+    En SQLite se usa el índice FTS5 y se ordenan por bm25 las primeras
+    SEARCH_CANDIDATES coincidencias; en PostgreSQL, el índice de trigramas con
+    una expresión regular de inicio de palabra, ordenado por similitud.
+    ``criteria`` filtra además sobre Student. Devuelve filas con ``fields``.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return []
+    selected = [getattr(Student, f).label(f) for f in fields]
+    dialect = _dialect(db.session.get_bind())
+
+    if dialect == 'sqlite':
+        match = ' '.join(f'"{term}"*' for term in terms)
+        fts = literal_column(SEARCH_TABLE)
+        matches = select(
+            student_search.c.rowid.label('id'), func.bm25(fts, *SEARCH_WEIGHTS).label('score')
+        ).where(fts.op('MATCH')(match)).limit(SEARCH_CANDIDATES).subquery()
+        statement = select(*selected).select_from(matches).join(
+            Student, Student.id == matches.c.id
+        ).where(*criteria).order_by(matches.c.score, Student.id)
+    elif dialect == 'postgresql':
+        # \m es inicio de palabra: "gar" encuentra "García" pero no "Edgar"; los términos solo
+        # tienen caracteres de palabra y el índice de trigramas también resuelve expresiones regulares.
+        # Documento y términos pasan por la misma función sin acentos ("jose" encuentra "José")
+        document = literal_column(SEARCH_PG_DOCUMENT)
+        unaccent = getattr(func, SEARCH_UNACCENT)
+        statement = select(*selected).where(
+            *[document.op('~')(unaccent(r'\m' + term)) for term in terms], *criteria
+        ).order_by(func.similarity(document, unaccent(' '.join(terms))).desc(), Student.id)
+    else:
+        document = literal_column(SEARCH_DOCUMENT)
+        statement = select(*selected).where(
+            *[document.contains(term, autoescape=True) for term in terms], *criteria).order_by(Student.id)
+    return db.session.execute(statement.limit(limit)).all()
@@ -0,0 +1,234 @@
+import random
+from datetime import datetime, timedelta
+from models import db, User, Student, Course, Class, Enrollment, Payment, Attendance, Grade
+from rollups import rebuild_rollups
+from final_grades import recompute_final_grades
+from search import index_students
+
+# Filas por INSERT (executemany) y por commit
+SEED_CHUNK_SIZE = 5000
+
+# Volúmenes por defecto, pensados para una base de desarrollo
+DEFAULT_VOLUMES = {
+    'teachers': 10,
+    'courses': 20,
+    'students': 1000,
+    'classes_per_course': 40,
+    'attendance': 50000,
+    'payments': 10000,
+    'grades': 20000
+}
+
+FIRST_NAMES = ('Ana', 'Luis', 'María', 'Carlos', 'Sofía', 'Jorge', 'Valentina', 'Diego', 'Camila', 'Andrés',
+               'Lucía', 'Mateo', 'Isabella', 'Santiago', 'Daniela', 'Sebastián', 'Gabriela', 'Nicolás')
+LAST_NAMES = ('García', 'Rodríguez', 'Martínez', 'López', 'González', 'Pérez', 'Sánchez', 'Ramírez',
+              'Torres', 'Flores', 'Rivera', 'Gómez', 'Díaz', 'Morales', 'Vargas', 'Castro')
+SUBJECTS = ('Matemáticas', 'Física', 'Química', 'Inglés', 'Programación', 'Historia', 'Biología',
+            'Literatura', 'Dibujo', 'Música', 'Contabilidad', 'Francés')
+LEVELS = ('Básico', 'Intermedio', 'Avanzado')
+ROOMS = tuple(f'Aula {n}' for n in range(101, 111))
+
+# Estados con su peso relativo
+STUDENT_STATUSES = (('activo', 85), ('inactivo', 10), ('graduado', 5))
+ENROLLMENT_STATUSES = (('activo', 80), ('completado', 15), ('cancelado', 5))
+PAYMENT_STATUSES = (('pagado', 80), ('pendiente', 15), ('cancelado', 5))
+PAYMENT_TYPES = (('mensualidad', 70), ('matricula', 15), ('material', 10), ('otro', 5))
+PAYMENT_METHODS = (('efectivo', 40), ('tarjeta', 35), ('transferencia', 25))
+ATTENDANCE_STATUSES = (('presente', 80), ('ausente', 8), ('tardanza', 8), ('justificado', 4))
+GRADE_TYPES = (('evaluacion', 50), ('tarea', 30), ('proyecto', 15), ('final', 5))
+
+
+def _weighted(rng, choices):
+    values, weights = zip(*choices)
+    return rng.choices(values, weights)[0]
+
+
+def _insert(model, rows):
+    """Insertar filas (diccionarios) por lotes con executemany; devuelve cuántas se insertaron"""
+    count = 0
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= SEED_CHUNK_SIZE:
+            db.session.execute(model.__table__.insert(), chunk)
+            db.session.commit()
+            count += len(chunk)
+            chunk = []
+    if chunk:
+        db.session.execute(model.__table__.insert(), chunk)
+        db.session.commit()
+        count += len(chunk)
+    return count
+
+
+def _new_ids(model, after_id):
+    return [id_ for (id_,) in db.session.query(model.id).filter(model.id > after_id).order_by(model.id)]
+
+
+def _max_id(model):
+    return db.session.query(db.func.coalesce(db.func.max(model.id), 0)).scalar()
+
+
+def seed_database(password_hash, volumes=None, seed=None, progress=None):
+    """Generar datos sintéticos con inserciones masivas.
+
+    ``password_hash`` se usa para todos los profesores (hashear una vez por
+    usuario tomaría minutos con volúmenes grandes). ``progress`` recibe
+    (entidad, filas) al terminar cada tabla. Devuelve las filas insertadas
+    por entidad.
+    """
+    volumes = dict(DEFAULT_VOLUMES, **(volumes or {}))
+    rng = random.Random(seed)
+    now = datetime.utcnow().replace(microsecond=0)
+    start = now - timedelta(days=365)
+    tag = f'{now:%Y%m%d%H%M%S}'
+    counts = {}
+
+    def done(entity, count):
+        counts[entity] = count
+        if progress:
+            progress(entity, count)
+
+    def random_date(begin=start, end=now):
+        return begin + timedelta(seconds=rng.randint(0, int((end - begin).total_seconds())))
+
+    # Profesores
+    first_user = _max_id(User)
+    done('teachers', _insert(User, ({
+        'email': f'profesor{i}.{tag}@seed.example.com',
+        'password_hash': password_hash,
+        'name': f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+        'role': 'profesor',
+        'created_at': start,
+        'is_active': True
+    } for i in range(volumes['teachers']))))
+    teacher_ids = _new_ids(User, first_user)
+
+    # Cursos
+    first_course = _max_id(Course)
+    done('courses', _insert(Course, ({
+        'name': f'{SUBJECTS[i % len(SUBJECTS)]} {LEVELS[(i // len(SUBJECTS)) % len(LEVELS)]} {i + 1}',
+        'description': 'Curso generado para pruebas de carga',
+        'duration': rng.choice(('3 meses', '6 meses', '12 meses')),
+        'price': float(rng.randrange(50, 300, 10)),
+        'max_students': rng.choice((20, 30, 40)),
+        'teacher_id': rng.choice(teacher_ids),
+        'status': 'activo',
+        'created_at': start
+    } for i in range(volumes['courses']))))
+    course_ids = _new_ids(Course, first_course)
+
+    # Clases semanales de cada curso, la mitad en el pasado y la otra mitad por venir
+    first_class = _max_id(Class)
+    per_course = volumes['classes_per_course']
+
+    def class_rows():
+        for course_id in course_ids:
+            teacher_id = rng.choice(teacher_ids)
+            first = now - timedelta(weeks=per_course // 2, hours=rng.randint(0, 72))
+            for n in range(per_course):
+                schedule = first + timedelta(weeks=n)
+                yield {
+                    'course_id': course_id,
+                    'teacher_id': teacher_id,
+                    'title': f'Sesión {n + 1}',
+                    'schedule': schedule,
+                    'duration': rng.choice((60, 90, 120)),
+                    'room': rng.choice(ROOMS),
+                    'status': 'completada' if schedule < now else 'programada',
+                    'created_at': start
+                }
+    done('classes', _insert(Class, class_rows()))
+    classes_by_course = {}
+    for class_id, course_id, schedule in db.session.query(Class.id, Class.course_id, Class.schedule).filter(
+            Class.id > first_class):
+        if schedule < now:
+            classes_by_course.setdefault(course_id, []).append((class_id, schedule.date()))
+
+    # Estudiantes
+    first_student = _max_id(Student)
+    done('students', _insert(Student, ({
+        'name': f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {rng.choice(LAST_NAMES)}',
+        'email': f'estudiante{i}.{tag}@seed.example.com',
+        'phone': f'55{rng.randint(10000000, 99999999)}',
+        'parent_phone': f'55{rng.randint(10000000, 99999999)}',
+        'birth_date': (now - timedelta(days=rng.randint(12 * 365, 30 * 365))).date(),
+        'status': _weighted(rng, STUDENT_STATUSES),
+        'enrollment_date': random_date(),
+    } for i in range(volumes['students']))))
+    student_ids = _new_ids(Student, first_student)
+    index_students(Student.id > first_student)
+    db.session.commit()
+
+    # Matrículas: uno a tres cursos por estudiante
+    enrollments = []
+    for student_id in student_ids:
+        for course_id in rng.sample(course_ids, min(len(course_ids), rng.choice((1, 1, 2, 3)))):
+            enrollments.append((student_id, course_id))
+    done('enrollments', _insert(Enrollment, ({
+        'student_id': student_id,
+        'course_id': course_id,
+        'enrollment_date': random_date(),
+        'status': _weighted(rng, ENROLLMENT_STATUSES)
+    } for student_id, course_id in enrollments)))
+
+    # Asistencia: una fila por (estudiante, clase pasada de su curso), sin repetir la clave única
+    per_enrollment = -(-volumes['attendance'] // max(len(enrollments), 1))
+
+    def attendance_rows():
+        remaining = volumes['attendance']
+        for student_id, course_id in enrollments:
+            classes = classes_by_course.get(course_id, [])
+            for class_id, day in rng.sample(classes, min(per_enrollment, len(classes), remaining)):
+                remaining -= 1
+                yield {
+                    'student_id': student_id,
+                    'class_id': class_id,
+                    'date': day,
+                    'status': _weighted(rng, ATTENDANCE_STATUSES)
+                }
+            if remaining <= 0:
+                return
+    done('attendance', _insert(Attendance, attendance_rows()))
+
+    # Pagos y calificaciones de estudiantes matriculados
+    prices = dict(db.session.query(Course.id, Course.price).filter(Course.id.in_(course_ids)))
+
+    def payment_rows():
+        for i in range(volumes['payments'] if enrollments else 0):
+            student_id, course_id = rng.choice(enrollments)
+            payment_type = _weighted(rng, PAYMENT_TYPES)
+            if payment_type in ('mensualidad', 'matricula'):
+                amount = prices[course_id]
+            else:
+                amount = float(rng.randrange(5, 60, 5))
+            yield {
+                'student_id': student_id,
+                'amount': amount,
+                'type': payment_type,
+                'description': f'Pago de {payment_type}',
+                'date': random_date(),
+                'status': _weighted(rng, PAYMENT_STATUSES),
+                'payment_method': _weighted(rng, PAYMENT_METHODS),
+                'reference': f'SEED-{tag}-{i}'
+            }
+    done('payments', _insert(Payment, payment_rows()))
+
+    def grade_rows():
+        for _ in range(volumes['grades'] if enrollments else 0):
+            student_id, course_id = rng.choice(enrollments)
+            yield {
+                'student_id': student_id,
+                'course_id': course_id,
+                'grade': round(min(10.0, max(0.0, rng.gauss(7.2, 1.6))), 1),
+                'type': _weighted(rng, GRADE_TYPES),
+                'description': 'Calificación generada',
+                'date': random_date(),
+                'weight': rng.choice((1.0, 1.0, 2.0, 3.0))
+            }
+    done('grades', _insert(Grade, grade_rows()))
+
+    recompute_final_grades()
+    db.session.commit()
+    rebuild_rollups()
+    return counts
@@ -0,0 +1,164 @@
+import atexit
+import json
+import logging
+import queue
+import random
+import re
+import sys
+import time
+import uuid
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+from flask import g, request, has_request_context
+from flask.logging import default_handler
+
+# Registros en espera antes de descartar (el request nunca espera por la salida)
+LOG_QUEUE_SIZE = 10000
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+REQUEST_ID_PATTERN = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+# Atributos propios de LogRecord; el resto (pasados con extra=) se agregan al JSON
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'taskName'}
+
+access_logger = logging.getLogger('crm.access')
+
+# Listener activo del proceso; cada init_logging reemplaza al anterior
+_listener = None
+
+
+def parse_route_map(raw, cast):
+    """Leer 'endpoint=valor,endpoint=valor' de la configuración"""
+    result = {}
+    for item in (raw or '').split(','):
+        if '=' not in item:
+            continue
+        endpoint, value = item.split('=', 1)
+        result[endpoint.strip()] = cast(value.strip())
+    return result
+
+
+def _level(value):
+    level = logging.getLevelName(value.upper())
+    if not isinstance(level, int):
+        raise ValueError(f'Nivel de log inválido: {value}')
+    return level
+
+
+class JsonFormatter(logging.Formatter):
+    """Un objeto JSON por línea con el contexto de la petición y los campos extra"""
+
+    def format(self, record):
+        entry = {
+            'timestamp': datetime.utcfromtimestamp(record.created).isoformat(timespec='milliseconds') + 'Z',
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class RequestContextFilter(logging.Filter):
+    """Agrega request_id y endpoint, y aplica el nivel y el muestreo por ruta.
+
+    El muestreo se decide una vez por petición para conservar o descartar
+    juntos todos sus registros; advertencias y errores siempre se conservan.
+    """
+
+    def __init__(self, route_levels=None):
+        super().__init__()
+        self.route_levels = route_levels or {}
+
+    def filter(self, record):
+        if not has_request_context():
+            return True
+        record.request_id = getattr(g, 'request_id', None)
+        record.endpoint = request.endpoint
+        record.method = request.method
+        record.path = request.path
+
+        min_level = self.route_levels.get(request.endpoint)
+        if min_level is not None and record.levelno < min_level:
+            return False
+        if record.levelno < logging.WARNING and not getattr(g, 'log_sampled', True):
+            return False
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """QueueHandler que descarta registros si la cola está llena en lugar de bloquear"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def init_logging(app):
+    """Enviar los logs de la aplicación como JSON a stdout desde un hilo aparte.
+
+    El formateo ocurre en el hilo de la petición (así se conserva su
+    contexto) y la escritura en el QueueListener. Hay un solo listener por
+    proceso: si se vuelve a llamar (otra create_app), el anterior escribe lo
+    que tenga en cola y se detiene.
+    """
+    global _listener
+    log_queue = queue.Queue(maxsize=app.config.get('LOG_QUEUE_SIZE', LOG_QUEUE_SIZE))
+    queue_handler = NonBlockingQueueHandler(log_queue)
+    queue_handler.setFormatter(JsonFormatter())
+    queue_handler.addFilter(RequestContextFilter(
+        parse_route_map(app.config.get('LOG_ROUTE_LEVELS'), _level)))
+
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(logging.Formatter('%(message)s'))
+    listener = QueueListener(log_queue, output, respect_handler_level=False)
+    listener.start()
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    if _listener is None:
+        atexit.register(_stop_listener)
+    else:
+        _listener.stop()
+    _listener = listener
+    root.setLevel(_level(app.config.get('LOG_LEVEL', 'INFO')))
+    app.logger.removeHandler(default_handler)
+
+    sampling = parse_route_map(app.config.get('LOG_ROUTE_SAMPLING'), float)
+
+    @app.before_request
+    def assign_request_id():
+        incoming = request.headers.get(REQUEST_ID_HEADER, '')
+        g.request_id = incoming if REQUEST_ID_PATTERN.match(incoming) else uuid.uuid4().hex
+        g.request_started = time.perf_counter()
+        rate = sampling.get(request.endpoint)
+        g.log_sampled = rate is None or random.random() < rate
+
+    @app.after_request
+    def log_request(response):
+        response.headers[REQUEST_ID_HEADER] = g.get('request_id', '')
+        started = g.get('request_started')
+        level = logging.WARNING if response.status_code >= 500 else logging.INFO
+        access_logger.log(level, 'request', extra={
+            'status': response.status_code,
+            'duration_ms': round((time.perf_counter() - started) * 1000, 2) if started else None
+        })
+        return response
+
+    app.extensions['structured_logging'] = queue_handler
+    return listener
+
+
+def _stop_listener():
+    if _listener is not None:
+        _listener.stop()
@@ -0,0 +1,56 @@
+import os
+import sys
+from datetime import datetime
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from commands import bootstrap_database
+from config import TestingConfig
+from http_cache import response_cache
+from identity import user_cache
+from models import db, User, Course, Class
+
+
+@pytest.fixture
+def app():
+    """Aplicación con una base en memoria recién creada por bootstrap"""
+    app = create_app(TestingConfig)
+    with app.app_context():
+        bootstrap_database()
+        # Cachés por proceso: no deben arrastrar datos de otra prueba
+        user_cache.clear()
+        response_cache.clear()
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def admin(app):
+    return User.query.filter_by(role='superadmin').first()
+
+
+@pytest.fixture
+def headers(admin):
+    return {'Authorization': f'Bearer {create_access_token(identity=str(admin.id))}'}
+
+
+@pytest.fixture
+def course_class(admin):
+    """Un curso con una clase, para registrar matrículas y asistencias"""
+    course = Course(name='Matemáticas', price=100, teacher_id=admin.id)
+    db.session.add(course)
+    db.session.flush()
+    class_session = Class(course_id=course.id, teacher_id=admin.id, title='Álgebra',
+                          schedule=datetime(2026, 3, 2, 9))
+    db.session.add(class_session)
+    db.session.commit()
+    return course, class_session
@@ -0,0 +1,23 @@
+def test_etag_revalidates_until_a_write(client, headers):
+    first = client.get('/api/students?fields=id,name', headers=headers)
+    etag = first.headers['ETag']
+    assert first.status_code == 200 and first.get_json() == []
+
+    cached = client.get('/api/students?fields=id,name', headers={**headers, 'If-None-Match': etag})
+    assert cached.status_code == 304
+
+    created = client.post('/api/students', headers=headers, json={'name': 'Ana', 'email': 'ana@example.com'})
+    assert created.status_code == 201
+
+    fresh = client.get('/api/students?fields=id,name', headers={**headers, 'If-None-Match': etag})
+    assert fresh.status_code == 200
+    assert fresh.headers['ETag'] != etag
+    assert [student['name'] for student in fresh.get_json()] == ['Ana']
+
+
+def test_failed_write_keeps_the_etag(client, headers):
+    etag = client.get('/api/students/search?q=ana', headers=headers).headers['ETag']
+    missing = client.put('/api/students/999', headers=headers, json={'name': 'Nadie'})
+    assert missing.status_code == 404
+    cached = client.get('/api/students/search?q=ana', headers={**headers, 'If-None-Match': etag})
+    assert cached.status_code == 304
@@ -0,0 +1,60 @@
+from datetime import datetime
+
+from models import db, Student, Grade
+
+
+def add_students(count):
+    db.session.add_all(Student(name=f'Alumno {i}', email=f'alumno{i}@example.com') for i in range(count))
+    db.session.commit()
+
+
+def walk(client, headers, url, max_pages=20):
+    """Recorrer un listado siguiendo next_cursor; devuelve las páginas"""
+    pages = []
+    while url:
+        assert len(pages) < max_pages, 'el cursor no avanza'
+        response = client.get(url, headers=headers)
+        assert response.status_code == 200
+        body = response.get_json()
+        pages.append(body['items'])
+        url = body['next'] and body['next'].replace('http://localhost', '')
+    return pages
+
+
+def test_pages_cover_every_row_once(client, headers):
+    add_students(7)
+    pages = walk(client, headers, '/api/students?limit=3&fields=id')
+    ids = [item['id'] for page in pages for item in page]
+    assert [len(page) for page in pages] == [3, 3, 1]
+    assert ids == sorted(student.id for student in Student.query.all())
+
+
+def test_exact_multiple_has_no_empty_last_page(client, headers):
+    add_students(6)
+    pages = walk(client, headers, '/api/students?limit=3&fields=id')
+    assert [len(page) for page in pages] == [3, 3]
+
+
+def test_null_sort_values_come_last(client, headers, course_class):
+    course, _ = course_class
+    student = Student(name='Ana', email='ana@example.com')
+    db.session.add(student)
+    db.session.commit()
+    dates = [datetime(2026, 1, 5), None, datetime(2026, 1, 9), None, datetime(2026, 1, 5), datetime(2026, 1, 1)]
+    db.session.execute(Grade.__table__.insert(), [
+        {'student_id': student.id, 'course_id': course.id, 'grade': 10, 'date': date} for date in dates])
+    db.session.commit()
+
+    pages = walk(client, headers, '/api/grades?limit=2&fields=id,date')
+    ids = [item['id'] for page in pages for item in page]
+    grades = Grade.query.all()
+    dated = sorted((g for g in grades if g.date), key=lambda g: (g.date, g.id), reverse=True)
+    undated = sorted((g.id for g in grades if not g.date), reverse=True)
+    assert ids == [g.id for g in dated] + undated
+    # La lista completa (sin paginar) usa el mismo orden
+    assert [item['id'] for item in client.get('/api/grades?fields=id', headers=headers).get_json()] == ids
+
+
+def test_invalid_cursor_is_rejected(client, headers):
+    response = client.get('/api/students?limit=2&after=no-es-un-cursor', headers=headers)
+    assert response.status_code == 400
@@ -0,0 +1,46 @@
+from models import db, Student, AttendanceDailyRollup, IncomeDailyRollup, RollupCounter
+from rollups import rebuild_rollups
+
+
+def snapshot():
+    """Estado de los rollups y contadores, comparable entre el mantenimiento incremental y la reconstrucción"""
+    db.session.expire_all()
+    return {
+        'attendance': {(r.day, r.course_id): (r.total, r.present, r.absent, r.justified, r.late)
+                       for r in AttendanceDailyRollup.query if r.total},
+        'income': {(r.day, r.type): (round(r.amount, 2), r.payment_count)
+                   for r in IncomeDailyRollup.query if r.payment_count},
+        'counters': {r.name: r.value for r in RollupCounter.query.filter(RollupCounter.name.like('attendance:%'))},
+        'students': {s.id: (s.attendance_present, s.attendance_absent, s.attendance_total, s.attendance_rate)
+                     for s in Student.query},
+    }
+
+
+def test_incremental_rollups_match_rebuild(client, headers, course_class):
+    _, class_session = course_class
+    students = []
+    for i in range(3):
+        response = client.post('/api/students', headers=headers,
+                               json={'name': f'Alumno {i}', 'email': f'alumno{i}@example.com'})
+        students.append(response.get_json()['student']['id'])
+
+    for student_id, amount, status in [(students[0], 100, 'pagado'), (students[1], 50.5, 'pagado'),
+                                       (students[2], 80, 'pendiente'), (students[0], 20, 'pagado')]:
+        response = client.post('/api/payments', headers=headers, json={
+            'student_id': student_id, 'amount': amount, 'type': 'mensualidad', 'status': status})
+        assert response.status_code == 201
+
+    url = f'/api/classes/{class_session.id}/attendance'
+    records = [{'student_id': students[0], 'status': 'presente'}, {'student_id': students[1], 'status': 'ausente'}]
+    assert client.post(url, headers=headers, json={'date': '2026-03-02', 'records': records}).status_code == 200
+    # Corregir la lista del mismo día aplica deltas en lugar de sumar otra vez
+    records = [{'student_id': students[1], 'status': 'tardanza'}, {'student_id': students[2], 'status': 'presente'}]
+    assert client.post(url, headers=headers, json={'date': '2026-03-02', 'records': records}).status_code == 200
+    response = client.post('/api/attendance', headers=headers, json={
+        'student_id': students[0], 'class_id': class_session.id, 'date': '2026-03-09', 'status': 'justificado'})
+    assert response.status_code == 201
+
+    incremental = snapshot()
+    rebuild_rollups()
+    assert snapshot() == incremental
+    assert incremental['counters']['attendance:total'] == 4